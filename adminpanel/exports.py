@@ -0,0 +1,169 @@
+"""
+Streaming CSV/JSONL exports of bookings, payments and ratings.
+
+Rows are read in primary-key batches of EXPORT_CHUNK_SIZE and written out as
+they are read, so an export of any size holds one batch in memory. Under
+ASGI each batch is fetched through sync_to_async and the response is an
+async iterator; otherwise Django would buffer the whole export before
+sending it.
+"""
+import csv
+import json
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+from booking.models import Booking
+from payments.models import Payment
+from rating.models import Rating
+
+FORMATS = {
+    'csv': 'text/csv',
+    'jsonl': 'application/x-ndjson',
+}
+
+# Leading characters that make Excel and Google Sheets treat a cell as a formula
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+@dataclass(frozen=True)
+class Dataset:
+    model: type
+    columns: tuple        # (header, field path) pairs
+    date_field: str       # what the start/end range filters on
+    status_field: str     # what ?status= filters on
+
+
+DATASETS = {
+    'bookings': Dataset(
+        model=Booking,
+        columns=(
+            ('booking_id', 'booking_id'),
+            ('scheduled_time', 'scheduled_time'),
+            ('status', 'status'),
+            ('user_id', 'user_id'),
+            ('driver_id', 'driver_id'),
+            ('service_type', 'service_type__name'),
+            ('pickup_location', 'pickup_location'),
+            ('dropoff_location', 'dropoff_location'),
+            ('fare', 'fare'),
+            ('distance_km', 'distance_km'),
+            ('duration_min', 'duration_min'),
+            ('payment_mode', 'payment_mode'),
+            ('is_immediate', 'is_immediate'),
+            ('cancelled_by', 'cancelled_by'),
+            ('cancellation_reason', 'cancellation_reason'),
+            ('cancelled_at', 'cancelled_at'),
+        ),
+        date_field='scheduled_time',
+        status_field='status',
+    ),
+    'payments': Dataset(
+        model=Payment,
+        columns=(
+            ('payment_id', 'payment_id'),
+            ('booking_id', 'booking_id'),
+            ('user_id', 'user_id'),
+            ('payment_mode', 'payment_mode'),
+            ('amount', 'amount'),
+            ('status', 'status'),
+            ('created_at', 'created_at'),
+            ('paid_at', 'paid_at'),
+        ),
+        date_field='created_at',
+        status_field='status',
+    ),
+    'ratings': Dataset(
+        model=Rating,
+        columns=(
+            ('rating_id', 'rating_id'),
+            ('booking_id', 'booking_id'),
+            ('given_by', 'given_by'),
+            ('rating', 'rating'),
+            ('driver_id', 'driver_id'),
+            ('user_id', 'User_id'),
+            ('comments', 'comments'),
+            ('created_at', 'created_at'),
+        ),
+        date_field='created_at',
+        status_field='given_by',
+    ),
+}
+
+
+def _local_midnight(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def build_queryset(dataset, start=None, end=None, status=None):
+    """
+    Rows of `dataset` with `start`..`end` (local dates, inclusive) on its date
+    field and an optional status. Raises ValueError on malformed dates.
+    """
+    queryset = dataset.model.objects.all()
+    if start:
+        queryset = queryset.filter(**{f'{dataset.date_field}__gte': _local_midnight(date.fromisoformat(start))})
+    if end:
+        queryset = queryset.filter(**{f'{dataset.date_field}__lt': _local_midnight(date.fromisoformat(end) + timedelta(days=1))})
+    if status:
+        queryset = queryset.filter(**{dataset.status_field: status})
+    return queryset
+
+
+class _Echo:
+    """File-like object whose write() hands the line back to the caller."""
+    def write(self, value):
+        return value
+
+
+def _csv_cell(value):
+    """Quote text a spreadsheet would run as a formula (e.g. a name starting with '=')."""
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def _format_rows(rows, headers, fmt, writer):
+    if fmt == 'csv':
+        return ''.join(writer.writerow([_csv_cell(value) for value in row]) for row in rows)
+    return ''.join(
+        json.dumps(dict(zip(headers, row)), cls=DjangoJSONEncoder) + '\n'
+        for row in rows
+    )
+
+
+def iter_export(dataset, queryset, fmt):
+    """Sync generator of text chunks: the header (CSV only) then one chunk per batch of rows."""
+    headers = [header for header, _ in dataset.columns]
+    paths = [path for _, path in dataset.columns]
+    pk_name = dataset.model._meta.pk.name
+    chunk_size = getattr(settings, 'EXPORT_CHUNK_SIZE', 2000)
+    writer = csv.writer(_Echo())
+
+    if fmt == 'csv':
+        yield writer.writerow(headers)
+
+    rows = queryset.order_by(pk_name).values_list(pk_name, *paths)
+    last_pk = None
+    while True:
+        batch = rows.filter(**{f'{pk_name}__gt': last_pk}) if last_pk is not None else rows
+        batch = list(batch[:chunk_size])
+        if not batch:
+            return
+        last_pk = batch[-1][0]
+        yield _format_rows((row[1:] for row in batch), headers, fmt, writer)
+
+
+async def aiter_export(dataset, queryset, fmt):
+    """iter_export() for ASGI: each batch is read in the sync thread, never blocking the event loop."""
+    chunks = iter_export(dataset, queryset, fmt)
+    next_chunk = sync_to_async(next, thread_sensitive=True)
+    while True:
+        chunk = await next_chunk(chunks, None)
+        if chunk is None:
+            return
+        yield chunk
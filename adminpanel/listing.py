@@ -0,0 +1,151 @@
+"""
+Shared list handling for admin pages: server-side search/filters and keyset
+(seek) pagination.
+
+A page is fetched as "the next ADMIN_LIST_PAGE_SIZE rows after this cursor"
+instead of with OFFSET. The cursor holds the sort values of the last row
+shown. Cost therefore stays flat however deep an admin pages, provided the
+ordering columns are indexed (the primary key is always the final
+tie-breaker).
+"""
+import base64
+import binascii
+import json
+from dataclasses import dataclass
+from functools import reduce
+from operator import or_
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F, Q
+
+
+@dataclass
+class KeysetPage:
+    items: list
+    next_cursor: str | None
+    is_first: bool
+    param: str
+    query: dict          # the request's other GET parameters, kept in pager links
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def next_url(self):
+        return '?' + urlencode({**self.query, self.param: self.next_cursor})
+
+    def first_url(self):
+        return '?' + urlencode(self.query)
+
+
+def _encode(values):
+    raw = json.dumps(values, cls=DjangoJSONEncoder, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def _decode(cursor, size):
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (binascii.Error, ValueError):
+        return None
+    if not isinstance(values, list) or len(values) != size:
+        return None
+    return values
+
+
+def _parse_ordering(ordering):
+    return [(name.lstrip('-'), name.startswith('-')) for name in ordering]
+
+
+def _seek(fields, values):
+    """Rows strictly after `values` in `fields` order (NULLs sort last in either direction)."""
+    (name, descending), value = fields[0], values[0]
+    if value is None:
+        after = None
+        tie = Q(**{f'{name}__isnull': True})
+    else:
+        after = Q(**{f'{name}__lt' if descending else f'{name}__gt': value}) | Q(**{f'{name}__isnull': True})
+        tie = Q(**{name: value})
+    if len(fields) == 1:
+        return after if after is not None else Q(pk__in=[])
+    rest = tie & _seek(fields[1:], values[1:])
+    return rest if after is None else after | rest
+
+
+def keyset_page(request, queryset, ordering, param='after', page_size=None):
+    """
+    One page of `queryset` ordered by `ordering` (field names, '-' for
+    descending; the last one must be unique, normally the primary key),
+    starting after the cursor in request.GET[param]. An invalid cursor
+    restarts at the first page.
+    """
+    page_size = page_size or getattr(settings, 'ADMIN_LIST_PAGE_SIZE', 50)
+    fields = _parse_ordering(ordering)
+    order_by = [F(name).desc(nulls_last=True) if desc else F(name).asc(nulls_last=True) for name, desc in fields]
+    queryset = queryset.order_by(*order_by)
+
+    cursor = request.GET.get(param)
+    values = _decode(cursor, len(fields)) if cursor else None
+    if values is not None:
+        queryset = queryset.filter(_seek(fields, values))
+
+    items = list(queryset[:page_size + 1])
+    next_cursor = None
+    if len(items) > page_size:
+        items = items[:page_size]
+        last = items[-1]
+        next_cursor = _encode([_value(last, name) for name, _ in fields])
+
+    query = {k: v for k, v in request.GET.items() if k != param}
+    return KeysetPage(items=items, next_cursor=next_cursor, is_first=values is None, param=param, query=query)
+
+
+def _value(obj, path):
+    for part in path.split('__'):
+        obj = obj.get(part) if isinstance(obj, dict) else getattr(obj, part, None)
+        if obj is None:
+            return None
+    return obj
+
+
+def apply_search(queryset, term, fields, id_field=None):
+    """Case-insensitive match of `term` on any of `fields`; an all-digit term also matches `id_field` exactly."""
+    term = (term or '').strip()
+    if not term:
+        return queryset
+    conditions = [Q(**{f'{field}__icontains': term}) for field in fields]
+    if id_field and term.isdigit():
+        conditions.append(Q(**{id_field: int(term)}))
+    return queryset.filter(reduce(or_, conditions))
+
+
+def _lookup_field(model, lookup):
+    """The model field a `field__related_field` lookup path ends on."""
+    field = None
+    for part in lookup.split('__'):
+        if field is not None:
+            model = field.related_model
+        field = model._meta.get_field(part)
+    return field
+
+
+def apply_filters(queryset, request, allowed):
+    """
+    Apply GET parameters named in `allowed` ({param: lookup}) as exact
+    filters. Each value is converted by the target field's to_python(), so
+    'true'/'false' become booleans; empty values and values the field
+    rejects (e.g. ?rating=abc) are ignored.
+    """
+    for param, lookup in allowed.items():
+        value = request.GET.get(param, '').strip()
+        if not value:
+            continue
+        try:
+            value = _lookup_field(queryset.model, lookup).to_python(value)
+        except (ValidationError, ValueError, TypeError):
+            continue
+        queryset = queryset.filter(**{lookup: value})
+    return queryset
@@ -0,0 +1,49 @@
+import time
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+from django.utils.timezone import localtime
+
+from adminpanel.rollups import mark_days_dirty, process_dirty_days
+
+
+class Command(BaseCommand):
+    help = "Recompute hourly/daily booking rollups for days changed since the last run."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Process the dirty days once and exit (for cron).')
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=getattr(settings, 'ROLLUP_INTERVAL_SECONDS', 60),
+            help='Seconds between runs.',
+        )
+        parser.add_argument(
+            '--rebuild-from',
+            metavar='YYYY-MM-DD',
+            help='First mark every day from this date to today dirty (backfill or repair).',
+        )
+
+    def handle(self, *args, **options):
+        if options['rebuild_from']:
+            try:
+                first = date.fromisoformat(options['rebuild_from'])
+            except ValueError:
+                raise CommandError("--rebuild-from must be a date in YYYY-MM-DD format.")
+            today = localtime().date()
+            mark_days_dirty(first + timedelta(days=n) for n in range((today - first).days + 1))
+
+        try:
+            while True:
+                started = time.monotonic()
+                close_old_connections()
+                days = process_dirty_days()
+                if days:
+                    self.stdout.write(f"Rolled up {len(days)} day(s): {days[0]} .. {days[-1]}.")
+                if options['once']:
+                    return
+                time.sleep(max(options['interval'] - (time.monotonic() - started), 0))
+        except KeyboardInterrupt:
+            self.stdout.write("Rollups stopped.")
@@ -0,0 +1,97 @@
+"""
+Counters for the admin dashboards.
+
+Each table is read with one conditional-aggregation query. Results are cached
+in the shared cache for ADMIN_METRICS_TTL_SECONDS. After that a request still
+gets the cached numbers (up to ADMIN_METRICS_MAX_STALE_SECONDS old) while one
+background thread recomputes them, so ops staff reloading the dashboard never
+wait on the aggregates once the cache is warm.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from booking.models import Booking
+from driver.models import Driver
+from passenger.models import User
+from payments.models import Payment
+
+CACHE_KEY = "adminpanel:metrics"
+REFRESH_LOCK_KEY = "adminpanel:metrics:refreshing"
+
+
+def _booking_counters(today):
+    return Booking.objects.aggregate(
+        total_bookings=Count('booking_id'),
+        ongoing_bookings=Count('booking_id', filter=Q(status='Ongoing')),
+        completed_bookings=Count('booking_id', filter=Q(status='Completed')),
+        cancelled_bookings=Count('booking_id', filter=Q(status='Cancelled')),
+        daily_rides=Count('booking_id', filter=Q(service_type__name__iexact='Daily')),
+        rental_rides=Count('booking_id', filter=Q(service_type__name__iexact='Rental')),
+        outstation_rides=Count('booking_id', filter=Q(service_type__name__iexact='Outstation')),
+        scheduled_rides=Count('booking_id', filter=Q(scheduled_time__isnull=False)),
+        todays_bookings=Count('booking_id', filter=Q(scheduled_time__date=today)),
+    )
+
+
+def _payment_counters(today):
+    completed = Q(status='completed')
+    counters = Payment.objects.aggregate(
+        total_revenue=Sum('amount', filter=completed),
+        todays_revenue=Sum('amount', filter=completed & Q(paid_at__date=today)),
+        completed_payments=Count('payment_id', filter=completed),
+        pending_payments=Count('payment_id', filter=Q(status='pending')),
+        failed_payments=Count('payment_id', filter=Q(status='failed')),
+        refunded_payments=Count('payment_id', filter=Q(status='refunded')),
+    )
+    counters['total_revenue'] = counters['total_revenue'] or 0
+    counters['todays_revenue'] = counters['todays_revenue'] or 0
+    return counters
+
+
+def compute_metrics():
+    """All dashboard counters, straight from the database (four queries)."""
+    today = timezone.now().date()
+    metrics = {
+        'total_users': User.objects.count(),
+        'total_drivers': Driver.objects.count(),
+    }
+    metrics.update(_booking_counters(today))
+    metrics.update(_payment_counters(today))
+    return metrics
+
+
+def _store(metrics):
+    max_stale = getattr(settings, 'ADMIN_METRICS_MAX_STALE_SECONDS', 300)
+    cache.set(CACHE_KEY, {'computed_at': time.time(), 'metrics': metrics}, timeout=max_stale)
+    return metrics
+
+
+def _refresh_in_background():
+    # Only one process/thread recomputes at a time; the lock expires if it dies
+    if not cache.add(REFRESH_LOCK_KEY, 1, timeout=60):
+        return
+
+    def run():
+        try:
+            _store(compute_metrics())
+        finally:
+            cache.delete(REFRESH_LOCK_KEY)
+            connections.close_all()
+
+    threading.Thread(target=run, daemon=True).start()
+
+
+def get_metrics():
+    """Dashboard counters from the cache, refreshing them in the background once stale."""
+    entry = cache.get(CACHE_KEY)
+    if entry is None:
+        return _store(compute_metrics())
+    if time.time() - entry['computed_at'] >= getattr(settings, 'ADMIN_METRICS_TTL_SECONDS', 30):
+        _refresh_in_background()
+    return entry['metrics']
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.4 on 2026-10-18 17:26
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('adminpanel', '0001_initial'),
+        ('services', '0004_remove_fareslab_booking_fee'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RollupDirtyDay',
+            fields=[
+                ('day', models.DateField(primary_key=True, serialize=False)),
+                ('marked_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='BookingRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('hour', 'Hour'), ('day', 'Day')], max_length=4)),
+                ('bucket_start', models.DateTimeField()),
+                ('status', models.CharField(blank=True, max_length=20, null=True)),
+                ('city', models.CharField(blank=True, default='', max_length=100)),
+                ('bookings', models.PositiveIntegerField(default=0)),
+                ('fare_total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('service_type', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='services.servicetype')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['period', 'bucket_start'], name='adminpanel__period_e498e2_idx')],
+            },
+        ),
+    ]
@@ -77,4 +77,39 @@ class AdminUser(AbstractBaseUser, PermissionsMixin):
     # PermissionsMixin requires these methods (though AbstractBaseUser handles many via its manager)
     # You might want to define specific permissions methods if your 'role' field governs them.
     # For now, PermissionsMixin provides default `has_perm`, `has_module_perms`.
-    # You can customize if roles define specific permissions beyond Django's default permission system.
\ No newline at end of file
+    # You can customize if roles define specific permissions beyond Django's default permission system.
+
+class BookingRollup(models.Model):
+    """
+    Bookings per hour or day, split by status, service type and driver city.
+    Maintained by adminpanel.rollups; never edited by hand.
+    """
+    PERIOD_CHOICES = [
+        ('hour', 'Hour'),
+        ('day', 'Day'),
+    ]
+
+    period = models.CharField(max_length=4, choices=PERIOD_CHOICES)
+    bucket_start = models.DateTimeField()  # local start of the hour/day
+    status = models.CharField(max_length=20, blank=True, null=True)
+    service_type = models.ForeignKey('services.ServiceType', on_delete=models.SET_NULL, null=True, blank=True)
+    city = models.CharField(max_length=100, blank=True, default='')
+    bookings = models.PositiveIntegerField(default=0)
+    fare_total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['period', 'bucket_start']),
+        ]
+
+    def __str__(self):
+        return f"{self.period} {self.bucket_start:%Y-%m-%d %H:%M} {self.status}: {self.bookings}"
+
+
+class RollupDirtyDay(models.Model):
+    """A local day whose BookingRollup rows must be recomputed."""
+    day = models.DateField(primary_key=True)
+    marked_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return str(self.day)
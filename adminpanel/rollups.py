@@ -0,0 +1,139 @@
+"""
+Hourly and daily booking rollups for admin reporting.
+
+Saving or deleting a booking marks its local day dirty, and the day it was
+stored under if its time moved (see adminpanel/signals.py); the rollup_bookings command recomputes dirty days
+from Booking with one grouped query per day. Time-series queries then read
+BookingRollup, a few rows per bucket, instead of scanning bookings. City is
+the assigned driver's city, the only city recorded for a ride.
+"""
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncHour
+from django.utils import timezone
+from django.utils.timezone import localtime
+
+from booking.models import Booking
+from .models import BookingRollup, RollupDirtyDay
+
+CANCELLED_STATUSES = ('Cancelled', 'CancelledByDriver', 'CancelledByPassenger')
+MAX_SPAN_DAYS = {'hour': 31, 'day': 731}
+CENT = Decimal('0.01')
+
+
+def _local_midnight(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def mark_days_dirty(days):
+    RollupDirtyDay.objects.bulk_create(
+        [RollupDirtyDay(day=day) for day in set(days)],
+        ignore_conflicts=True,
+    )
+
+
+def booking_days(*times):
+    """The local days of the given booking times, skipping empty ones."""
+    return {localtime(value).date() for value in times if value}
+
+
+def rebuild_day(day):
+    """Replace the hourly and daily rollup rows of one local day. Returns the number of rows written."""
+    start, end = _local_midnight(day), _local_midnight(day + timedelta(days=1))
+    rows = (
+        Booking.objects
+        .filter(scheduled_time__gte=start, scheduled_time__lt=end)
+        .annotate(hour=TruncHour('scheduled_time'))
+        .values('hour', 'status', 'service_type_id', 'driver__city')
+        .annotate(n=Count('booking_id'), fare=Sum('fare'))
+    )
+
+    rollups = []
+    daily = {}
+    for row in rows:
+        city = (row['driver__city'] or '').strip()
+        fare = row['fare'] or 0
+        rollups.append(BookingRollup(
+            period='hour',
+            bucket_start=row['hour'],
+            status=row['status'],
+            service_type_id=row['service_type_id'],
+            city=city,
+            bookings=row['n'],
+            fare_total=fare,
+        ))
+        totals = daily.setdefault((row['status'], row['service_type_id'], city), [0, 0])
+        totals[0] += row['n']
+        totals[1] += fare
+    for (status, service_type_id, city), (n, fare) in daily.items():
+        rollups.append(BookingRollup(
+            period='day',
+            bucket_start=start,
+            status=status,
+            service_type_id=service_type_id,
+            city=city,
+            bookings=n,
+            fare_total=fare,
+        ))
+
+    with transaction.atomic():
+        BookingRollup.objects.filter(bucket_start__gte=start, bucket_start__lt=end).delete()
+        BookingRollup.objects.bulk_create(rollups)
+    return len(rollups)
+
+
+def process_dirty_days(limit=None):
+    """Recompute every dirty day (oldest first, at most `limit`) and return the days done."""
+    days = list(RollupDirtyDay.objects.order_by('day').values_list('day', flat=True)[:limit])
+    # Clear the marks first: a booking saved while a day is being rebuilt marks it again
+    RollupDirtyDay.objects.filter(day__in=days).delete()
+    for day in days:
+        rebuild_day(day)
+    return days
+
+
+def timeseries(period, start_day, end_day, service_type_id=None, city=None):
+    """
+    Per-bucket totals between two local dates (inclusive): bookings, completed,
+    cancelled and revenue (fares of completed bookings). Raises ValueError for
+    an unknown period or a span longer than MAX_SPAN_DAYS allows.
+    """
+    if period not in MAX_SPAN_DAYS:
+        raise ValueError("period must be 'hour' or 'day'")
+    if end_day < start_day or (end_day - start_day).days >= MAX_SPAN_DAYS[period]:
+        raise ValueError(f"date range must cover 1 to {MAX_SPAN_DAYS[period]} days for period '{period}'")
+
+    rollups = BookingRollup.objects.filter(
+        period=period,
+        bucket_start__gte=_local_midnight(start_day),
+        bucket_start__lt=_local_midnight(end_day + timedelta(days=1)),
+    )
+    if service_type_id:
+        rollups = rollups.filter(service_type_id=service_type_id)
+    if city:
+        rollups = rollups.filter(city__iexact=city)
+
+    rows = (
+        rollups
+        .values('bucket_start')
+        .annotate(
+            total=Sum('bookings'),
+            completed=Sum('bookings', filter=Q(status='Completed')),
+            cancelled=Sum('bookings', filter=Q(status__in=CANCELLED_STATUSES)),
+            revenue=Sum('fare_total', filter=Q(status='Completed')),
+        )
+        .order_by('bucket_start')
+    )
+    return [
+        {
+            'bucket': localtime(row['bucket_start']).isoformat(),
+            'bookings': row['total'] or 0,
+            'completed': row['completed'] or 0,
+            'cancelled': row['cancelled'] or 0,
+            'revenue': str(Decimal(row['revenue'] or 0).quantize(CENT)),
+        }
+        for row in rows
+    ]
@@ -0,0 +1,26 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from booking.models import Booking
+from . import rollups
+
+
+@receiver([pre_save, pre_delete], sender=Booking)
+def remember_booking_rollup_time(sender, instance, update_fields=None, **kwargs):
+    # The stored time, not the in-memory one: that is the day whose rollup counts the booking
+    instance._rollup_stored_time = None
+    if instance._state.adding or instance.pk is None:
+        return
+    if update_fields is not None and 'scheduled_time' not in update_fields:
+        return
+    instance._rollup_stored_time = (
+        Booking.objects.filter(pk=instance.pk).values_list('scheduled_time', flat=True).first()
+    )
+
+
+@receiver([post_save, post_delete], sender=Booking)
+def mark_booking_rollup_dirty(sender, instance, **kwargs):
+    days = rollups.booking_days(instance.scheduled_time, getattr(instance, '_rollup_stored_time', None))
+    # Mark after commit so the rollup command cannot rebuild the day before the change is visible
+    transaction.on_commit(lambda: rollups.mark_days_dirty(days))
@@ -1,3 +1,56 @@
+import csv
+import io
+import json
+from datetime import date, datetime, time, timedelta
+
 from django.test import TestCase
+from django.utils import timezone
+
+from booking.models import Booking
+
+from .exports import DATASETS, build_queryset, iter_export
+from .models import BookingRollup
+from .rollups import process_dirty_days
+
+
+class BookingRollupTests(TestCase):
+    def _daily_bookings(self, day):
+        start = timezone.make_aware(datetime.combine(day, time.min))
+        return sum(BookingRollup.objects.filter(period='day', bucket_start=start).values_list('bookings', flat=True))
+
+    def test_moving_a_booking_to_another_day_drops_it_from_the_old_day(self):
+        old_day, new_day = date(2026, 3, 10), date(2026, 3, 12)
+        with self.captureOnCommitCallbacks(execute=True):
+            booking = Booking.objects.create(
+                status='Completed', fare=120,
+                scheduled_time=timezone.make_aware(datetime.combine(old_day, time(9))),
+            )
+        process_dirty_days()
+        self.assertEqual(self._daily_bookings(old_day), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            booking.scheduled_time += timedelta(days=2)
+            booking.save(update_fields=['scheduled_time'])
+        self.assertEqual(sorted(process_dirty_days()), [old_day, new_day])
+        self.assertEqual(self._daily_bookings(old_day), 0)
+        self.assertEqual(self._daily_bookings(new_day), 1)
+
+
+class ExportTests(TestCase):
+    def test_csv_quotes_formula_cells_and_jsonl_keeps_them(self):
+        Booking.objects.create(
+            status='Completed', fare=-5, pickup_location='=HYPERLINK("http://x")',
+            dropoff_location='@SUM(A1)', cancellation_reason='\tnote', payment_mode='Cash',
+        )
+        dataset = DATASETS['bookings']
+        queryset = build_queryset(dataset)
+
+        rows = list(csv.DictReader(io.StringIO(''.join(iter_export(dataset, queryset, 'csv')))))
+        self.assertEqual(rows[0]['pickup_location'], '\'=HYPERLINK("http://x")')
+        self.assertEqual(rows[0]['dropoff_location'], "'@SUM(A1)")
+        self.assertEqual(rows[0]['cancellation_reason'], "'\tnote")
+        self.assertEqual(rows[0]['payment_mode'], 'Cash')
+        self.assertEqual(rows[0]['fare'], '-5.00')
 
-# Create your tests here.
+        record = json.loads(''.join(iter_export(dataset, queryset, 'jsonl')))
+        self.assertEqual(record['pickup_location'], '=HYPERLINK("http://x")')
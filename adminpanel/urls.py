@@ -87,6 +87,11 @@ urlpatterns = [
     path("payments/<int:payment_id>/", views.view_payment, name="view_payment"),
     path("payments/<int:payment_id>/refund/", views.refund_payment, name="refund_payment"),
 
+    # Reporting
+    path('api/bookings/timeseries/', views.api_booking_timeseries, name='api_booking_timeseries'),
+    path('api/dispatch/forecast/', views.api_driver_forecast, name='api_driver_forecast'),
+    path('exports/<str:dataset>/', views.export_data, name='admin_export'),
+
     # Feedback URLs
     path('feedback/', views.feedback_dashboard, name='feedback_dashboard'),
     #path('feedback/edit/<int:feedback_id>/', views.edit_feedback, name='edit_feedback'),
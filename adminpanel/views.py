@@ -12,43 +12,38 @@ from django.utils.timezone import now
 from django.contrib import messages
 from .forms import DriverForm
 from vehicle.forms import VehicleForm 
-from rating.models import Rating
+from rating.models import DriverRatingSummary, Rating
 from faq.models import FAQ, MainTopic, SubTopic
-from django.db.models import Count, Q, Avg
+from django.db.models import Count, F, Q
 from django.contrib.auth import login
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.hashers import make_password
 from .utils import admin_login_required
+from .metrics import get_metrics
+from .rollups import timeseries as rollup_timeseries
+from .listing import apply_filters, apply_search, keyset_page
+from .exports import DATASETS as EXPORT_DATASETS, FORMATS as EXPORT_FORMATS, aiter_export, build_queryset as build_export_queryset, iter_export
 from feedback.models import Feedback
-from django.views.decorators.http import require_POST
-from django.http import JsonResponse
-from django.db.models import Sum, Count, F, ExpressionWrapper, DecimalField
-from payments.models import Payment
+from dispatch.scheduler import forecast_driver_demand
+from django.views.decorators.http import require_GET, require_POST
+from django.http import JsonResponse, StreamingHttpResponse
+from django.core.handlers.asgi import ASGIRequest
+from django.db.models import Sum, Count
+from payments.models import EarningsEntry, Payment
 from django.utils import timezone
 import datetime
 
 @admin_login_required
 def adminpanel_dashboard(request):
-    total_users = User.objects.count()
-    total_drivers = Driver.objects.count()
-    total_bookings = Booking.objects.count()
-
-    # Revenue metrics
-    today = timezone.now().date()
-    completed_payments = Payment.objects.filter(status='completed')
-    total_revenue = completed_payments.aggregate(total=Sum('amount'))['total'] or 0
-    todays_revenue = completed_payments.filter(paid_at__date=today).aggregate(total=Sum('amount'))['total'] or 0
-
-    # Today's bookings (based on scheduled_time date if available)
-    todays_bookings = Booking.objects.filter(scheduled_time__date=today).count()
+    metrics = get_metrics()
 
     context = {
-        'total_users': total_users,
-        'total_drivers': total_drivers,
-        'total_bookings': total_bookings,
-        'total_revenue': total_revenue,
-        'todays_revenue': todays_revenue,
-        'todays_bookings': todays_bookings,
+        'total_users': metrics['total_users'],
+        'total_drivers': metrics['total_drivers'],
+        'total_bookings': metrics['total_bookings'],
+        'total_revenue': metrics['total_revenue'],
+        'todays_revenue': metrics['todays_revenue'],
+        'todays_bookings': metrics['todays_bookings'],
     }
 
     return render(request, 'adminpanel/dashboard.html', context)
@@ -76,8 +71,19 @@ def login_view(request):
 
 @admin_login_required
 def admin_passengers(request):
-    passengers = User.objects.all()
-    return render(request, 'adminpanel/passengers.html', {'passengers': passengers})
+    passengers = User.objects.filter(is_staff=False, is_admin=False)
+    passengers = apply_search(passengers, request.GET.get('q'), ['first_name', 'last_name', 'email', 'phone'], id_field='user_id')
+    passengers = apply_filters(passengers, request, {'status': 'status', 'verified': 'is_verified'})
+    page = keyset_page(request, passengers, ['-user_id'])
+
+    return render(request, 'adminpanel/passengers.html', {
+        'passengers': page.items,
+        'page': page,
+        'filters': [
+            ('status', 'All statuses', User.STATUS_CHOICES),
+            ('verified', 'Verified or not', [('true', 'Verified'), ('false', 'Not verified')]),
+        ],
+    })
 
 @admin_login_required
 def view_passenger(request, user_id):
@@ -130,12 +136,28 @@ def decline_passenger(request, user_id):
 
 @admin_login_required
 def admin_drivers(request):
-    drivers = Driver.objects.filter(is_deleted=False).annotate(
+    drivers = Driver.objects.filter(is_deleted=False)
+    drivers = apply_search(drivers, request.GET.get('q'), ['first_name', 'last_name', 'email', 'phone', 'city'], id_field='driver_id')
+    drivers = apply_filters(drivers, request, {'status': 'status', 'vehicle_type': 'service_type__name', 'available': 'availability'})
+    page = keyset_page(request, drivers, ['-driver_id'])
+
+    # Ride counts and ratings only for the drivers on this page
+    stats = Driver.objects.filter(driver_id__in=[d.driver_id for d in page.items]).annotate(
         total_rides=Count('booking', distinct=True),
         completed_rides=Count('booking', filter=Q(booking__status='Completed'), distinct=True),
-        average_rating=Avg('driver_ratings__rating', filter=Q(driver_ratings__given_by='user'))
-    )
-    return render(request, 'adminpanel/drivers.html', {'drivers': drivers})
+        average_rating=F('rating_summary__average_rating')
+    ).in_bulk()
+    drivers = [stats[d.driver_id] for d in page.items]
+
+    return render(request, 'adminpanel/drivers.html', {
+        'drivers': drivers,
+        'page': page,
+        'filters': [
+            ('status', 'All statuses', Driver.STATUS_CHOICES),
+            ('vehicle_type', 'All vehicle types', [(name, name) for name in ServiceType.objects.order_by('name').values_list('name', flat=True)]),
+            ('available', 'Availability', [('true', 'Online'), ('false', 'Offline')]),
+        ],
+    })
 
 @admin_login_required
 def add_driver(request):
@@ -164,11 +186,12 @@ def view_driver(request, driver_id):
     driver = get_object_or_404(Driver, driver_id=driver_id)
     
     
-    average_rating_data = Rating.objects.filter(
-        driver=driver, 
-        given_by='user'
-    ).aggregate(avg_rating=Avg('rating')) 
-    driver_average_rating = average_rating_data['avg_rating']
+    driver_average_rating = (
+        DriverRatingSummary.objects
+        .filter(driver=driver)
+        .values_list('average_rating', flat=True)
+        .first()
+    )
 
     return render(request, 'adminpanel/view_driver.html', {
         'driver': driver,
@@ -215,11 +238,16 @@ def delete_driver(request, driver_id):
 @admin_login_required
 def view_driver_history(request, driver_id):
     driver = get_object_or_404(Driver, driver_id=driver_id)
-    rides = Booking.objects.filter(driver_id=driver.driver_id).order_by('-scheduled_time')
+    rides = Booking.objects.filter(driver_id=driver.driver_id).select_related('user')
+    rides = apply_search(rides, request.GET.get('q'), ['pickup_location', 'dropoff_location'], id_field='booking_id')
+    rides = apply_filters(rides, request, {'status': 'status'})
+    page = keyset_page(request, rides, ['-scheduled_time', '-booking_id'])
 
     return render(request, 'adminpanel/view_driver_history.html', {
         'driver': driver,
-        'rides': rides
+        'rides': page.items,
+        'page': page,
+        'filters': [('status', 'All statuses', Booking.STATUS_CHOICES)],
     })
 
 @admin_login_required
@@ -251,31 +279,77 @@ def update_driver_document_status(request, driver_id):
 
 @admin_login_required
 def admin_bookings(request):
-    daily_type = ServiceType.objects.filter(name__iexact='Daily').first()
-    rental_type = ServiceType.objects.filter(name__iexact='Rental').first()
-    outstation_type = ServiceType.objects.filter(name__iexact='Outstation').first()
-
-    total_requests = Booking.objects.count()
-    ongoing_requests = Booking.objects.filter(status='Ongoing').count()
-    completed_requests = Booking.objects.filter(status='Completed').count()
-    cancelled_requests = Booking.objects.filter(status='Cancelled').count()
-
-    daily_rides = Booking.objects.filter(service_type__name__iexact='Daily').count()
-    rental_rides = Booking.objects.filter(service_type__name__iexact='Rental').count()
-    outstation_rides = Booking.objects.filter(service_type__name__iexact='Outstation').count()
-    scheduled_rides = Booking.objects.filter(scheduled_time__isnull=False).count()
+    metrics = get_metrics()
 
     return render(request, 'adminpanel/booking.html', {
-        'total_requests': total_requests,
-        'ongoing_requests': ongoing_requests,
-        'completed_requests': completed_requests,
-        'cancelled_requests': cancelled_requests,
-        'daily_rides': daily_rides,
-        'rental_rides': rental_rides,
-        'outstation_rides': outstation_rides,
-        'scheduled_rides': scheduled_rides,
+        'total_requests': metrics['total_bookings'],
+        'ongoing_requests': metrics['ongoing_bookings'],
+        'completed_requests': metrics['completed_bookings'],
+        'cancelled_requests': metrics['cancelled_bookings'],
+        'daily_rides': metrics['daily_rides'],
+        'rental_rides': metrics['rental_rides'],
+        'outstation_rides': metrics['outstation_rides'],
+        'scheduled_rides': metrics['scheduled_rides'],
+        'booking_status_choices': Booking.STATUS_CHOICES,
     })
 
+@admin_login_required
+@require_GET
+def export_data(request, dataset):
+    """Stream bookings, payments or ratings as CSV or JSONL, filtered by ?start=&end=&status=."""
+    spec = EXPORT_DATASETS.get(dataset)
+    if spec is None:
+        return JsonResponse({"success": False, "error": "Unknown export"}, status=404)
+    fmt = request.GET.get('format', 'csv')
+    if fmt not in EXPORT_FORMATS:
+        return JsonResponse({"success": False, "error": "Format must be csv or jsonl"}, status=400)
+    try:
+        queryset = build_export_queryset(spec, request.GET.get('start'), request.GET.get('end'), request.GET.get('status'))
+    except ValueError:
+        return JsonResponse({"success": False, "error": "Dates must be YYYY-MM-DD"}, status=400)
+
+    if isinstance(request, ASGIRequest):
+        content = aiter_export(spec, queryset, fmt)
+    else:
+        content = iter_export(spec, queryset, fmt)
+    response = StreamingHttpResponse(content, content_type=EXPORT_FORMATS[fmt])
+    response['Content-Disposition'] = f'attachment; filename="{dataset}-{timezone.localdate():%Y%m%d}.{fmt}"'
+    return response
+
+@admin_login_required
+@require_GET
+def api_booking_timeseries(request):
+    """Bookings, completions, cancellations and revenue per hour/day, from the rollup tables."""
+    today = timezone.localdate()
+    try:
+        start = datetime.date.fromisoformat(request.GET.get('start') or (today - datetime.timedelta(days=29)).isoformat())
+        end = datetime.date.fromisoformat(request.GET.get('end') or today.isoformat())
+        service_type_id = int(request.GET['service_type']) if request.GET.get('service_type') else None
+    except ValueError:
+        return JsonResponse({"success": False, "error": "Invalid date or service type"}, status=400)
+
+    period = request.GET.get('period', 'day')
+    try:
+        series = rollup_timeseries(period, start, end, service_type_id=service_type_id, city=request.GET.get('city'))
+    except ValueError as e:
+        return JsonResponse({"success": False, "error": str(e)}, status=400)
+
+    return JsonResponse({"success": True, "period": period, "start": start.isoformat(), "end": end.isoformat(), "series": series})
+
+@admin_login_required
+@require_GET
+def api_driver_forecast(request):
+    """Drivers needed per time slot for the pre-booked rides of the next ?hours= (default 24, at most 168)."""
+    try:
+        hours = min(max(int(request.GET.get('hours', 24)), 1), 168)
+        slot_minutes = int(request.GET['slot']) if request.GET.get('slot') else None
+    except ValueError:
+        return JsonResponse({"success": False, "error": "Invalid hours or slot"}, status=400)
+    if slot_minutes is not None and not 5 <= slot_minutes <= 240:
+        return JsonResponse({"success": False, "error": "slot must be 5 to 240 minutes"}, status=400)
+
+    return JsonResponse({"success": True, "hours": hours, "slots": forecast_driver_demand(hours=hours, slot_minutes=slot_minutes)})
+
 @admin_login_required
 def vehicle_dashboard(request):
     vehicles = Vehicle.objects.all()
@@ -398,11 +472,23 @@ def promo_dashboard(request):
 
 @admin_login_required
 def wallet_dashboard(request):
-    wallets = Wallet.objects.select_related('user').all()
-    wallet_payments = WalletPayment.objects.select_related('user').all() 
+    term = request.GET.get('q')
+    wallets = apply_search(
+        Wallet.objects.select_related('user'), term,
+        ['user__first_name', 'user__last_name', 'user__email'], id_field='wallet_id',
+    )
+    wallet_payments = apply_search(
+        WalletPayment.objects.select_related('user'), term,
+        ['title', 'payment_id', 'user__email'], id_field='wallet_payment_id',
+    )
+    wallets_page = keyset_page(request, wallets, ['-wallet_id'], param='wallets_after')
+    payments_page = keyset_page(request, wallet_payments, ['-wallet_payment_id'], param='payments_after')
+
     return render(request, 'adminpanel/wallet_dashboard.html', {
-        'wallets': wallets,
-        'wallet_payments': wallet_payments
+        'wallets': wallets_page.items,
+        'wallet_payments': payments_page.items,
+        'wallets_page': wallets_page,
+        'payments_page': payments_page,
     })
 
 @admin_login_required
@@ -431,17 +517,26 @@ def view_wallet_payment(request, wallet_payment_id):
 
 @admin_login_required
 def rating_dashboard(request):
+    ratings = Rating.objects.select_related('User', 'driver', 'booking')
+    ratings = apply_search(
+        ratings, request.GET.get('q'),
+        ['driver__first_name', 'driver__last_name', 'User__first_name', 'User__last_name'], id_field='booking_id',
+    )
+    ratings = apply_filters(ratings, request, {'rating': 'rating'})
+
     # Ratings where the passenger (User) rated the driver
-    user_ratings = Rating.objects.select_related('User', 'driver', 'booking') \
-                                 .filter(given_by='user')
+    user_page = keyset_page(request, ratings.filter(given_by='user'), ['-created_at', '-pk'], param='user_after')
 
     # Ratings where the driver rated the passenger (User)
-    driver_ratings = Rating.objects.select_related('driver', 'User', 'booking') \
-                                   .filter(given_by='driver')
+    driver_page = keyset_page(request, ratings.filter(given_by='driver'), ['-created_at', '-pk'], param='driver_after')
 
     context = {
-        'user_ratings': user_ratings,
-        'driver_ratings': driver_ratings,
+        'user_ratings': user_page.items,
+        'driver_ratings': driver_page.items,
+        'user_page': user_page,
+        'driver_page': driver_page,
+        'filters': [('rating', 'Any rating', [(str(n), f'{n} star') for n in range(5, 0, -1)])],
+        'given_by_choices': Rating.GIVEN_BY_CHOICES,
     }
     return render(request, 'adminpanel/rating_dashboard.html', context)
 
@@ -557,32 +652,21 @@ def faq_detail(request, faq_id):
 # Payment Dashboard
 @admin_login_required
 def payment_dashboard(request):
-    today = timezone.now().date()
-
-    # === Completed payments queryset with service_type relation ===
-    completed_payments = Payment.objects.filter(status="completed").select_related("booking__service_type")
-
     # === KPIs ===
-    total_revenue = completed_payments.aggregate(total=Sum("amount"))["total"] or 0
-    completed_count = completed_payments.count()
-    pending_count = Payment.objects.filter(status="pending").count()
-    failed_count = Payment.objects.filter(status="failed").count()
-    refunded_count = Payment.objects.filter(status="refunded").count()
-
-    # === Admin & Provider Earnings (dynamic commission) ===
-    payments_with_commission = completed_payments.annotate(
-        admin_earning=ExpressionWrapper(
-            F("amount") * F("booking__service_type__admin_commission") / 100,
-            output_field=DecimalField(max_digits=10, decimal_places=2)
-        ),
-        provider_earning=ExpressionWrapper(
-            F("amount") * F("booking__service_type__provider_commission") / 100,
-            output_field=DecimalField(max_digits=10, decimal_places=2)
-        ),
+    metrics = get_metrics()
+    total_revenue = metrics["total_revenue"]
+    completed_count = metrics["completed_payments"]
+    pending_count = metrics["pending_payments"]
+    failed_count = metrics["failed_payments"]
+    refunded_count = metrics["refunded_payments"]
+
+    # === Admin & Provider Earnings (from the earnings ledger) ===
+    earnings = EarningsEntry.objects.aggregate(
+        admin=Sum("admin_commission"),
+        provider=Sum("driver_earning"),
     )
-
-    total_profit = payments_with_commission.aggregate(total=Sum("admin_earning"))["total"] or 0
-    total_provider_earning = payments_with_commission.aggregate(total=Sum("provider_earning"))["total"] or 0
+    total_profit = earnings["admin"] or 0
+    total_provider_earning = earnings["provider"] or 0
 
     # === Payment Status Distribution ===
     payment_status_qs = Payment.objects.values("status").annotate(total=Count("payment_id"))
@@ -636,6 +720,7 @@ def payment_dashboard(request):
         "payment_status_data": payment_status_data,
         "payment_mode_data": payment_mode_data,
         "revenue_trend": revenue_trend,
+        "payment_status_choices": Payment.PAYMENT_STATUS_CHOICES,
     }
 
     return render(request, "adminpanel/payment_dashboard.html", context)
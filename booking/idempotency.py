@@ -0,0 +1,98 @@
+"""
+Idempotency keys for driver ride actions (accept, start, end, cancel).
+
+The driver app sends an `Idempotency-Key` header (or `idempotency_key` form
+field) and reuses it when it retries the same action. The first request
+with a key runs the view and, if it succeeded, stores its response; a
+retry replays that response without touching the ride again, and a
+duplicate that arrives while the first is still running gets 409. A record
+still in progress after IDEMPOTENCY_IN_PROGRESS_LEASE_SECONDS is taken to
+belong to a worker that died, and the next retry takes it over and runs the
+view. Requests without a key behave as before. Keys expire after
+IDEMPOTENCY_KEY_TTL_SECONDS.
+"""
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.http import HttpResponse, JsonResponse
+from django.utils import timezone
+
+from .models import IdempotencyKey
+
+MAX_KEY_LENGTH = 64
+REPLAYED_HEADERS = ('Content-Type', 'Location')
+
+
+def _request_key(request):
+    return (request.headers.get('Idempotency-Key') or request.POST.get('idempotency_key') or '').strip()
+
+
+def _claim(owner, key, scope):
+    """
+    (record, created): a new in-progress record, an abandoned one taken over,
+    or the one already stored for this key.
+    """
+    now = timezone.now()
+    ttl = getattr(settings, 'IDEMPOTENCY_KEY_TTL_SECONDS', 60 * 60 * 24)
+    lease = getattr(settings, 'IDEMPOTENCY_IN_PROGRESS_LEASE_SECONDS', 30)
+    IdempotencyKey.objects.filter(owner=owner, created_at__lt=now - timedelta(seconds=ttl)).delete()
+    try:
+        with transaction.atomic():
+            return IdempotencyKey.objects.create(owner=owner, key=key, scope=scope), True
+    except IntegrityError:
+        pass
+
+    # Only one retry can win the conditional update of an abandoned record
+    taken_over = IdempotencyKey.objects.filter(
+        owner=owner, key=key, response_status__isnull=True,
+        created_at__lt=now - timedelta(seconds=lease),
+    ).update(created_at=now, scope=scope)
+    return IdempotencyKey.objects.filter(owner=owner, key=key).first(), bool(taken_over)
+
+
+def _replay(record):
+    response = HttpResponse(record.response_body, status=record.response_status)
+    for header, value in record.response_headers.items():
+        response[header] = value
+    response['Idempotent-Replay'] = 'true'
+    return response
+
+
+def idempotent(view):
+    """Make a driver POST view safe to retry under the same idempotency key."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        key = _request_key(request)
+        driver_id = request.session.get('driver_id')
+        if not key or not driver_id:
+            return view(request, *args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return JsonResponse({'success': False, 'error': 'Idempotency key is too long.'}, status=400)
+
+        scope = f"{view.__name__}:{request.path}"
+        record, created = _claim(f"driver:{driver_id}", key, scope)
+        if not created:
+            if record is None or record.response_status is None:
+                return JsonResponse({'success': False, 'error': 'This request is already being processed.'}, status=409)
+            if record.scope != scope:
+                return JsonResponse({'success': False, 'error': 'Idempotency key was already used for another request.'}, status=422)
+            return _replay(record)
+
+        try:
+            response = view(request, *args, **kwargs)
+        except Exception:
+            record.delete()
+            raise
+        if response.status_code >= 400 or getattr(response, 'streaming', False):
+            # Only successes are replayed; a rejected attempt can be retried with the same key
+            record.delete()
+            return response
+
+        record.response_status = response.status_code
+        record.response_body = response.content.decode(response.charset)
+        record.response_headers = {h: response[h] for h in REPLAYED_HEADERS if response.has_header(h)}
+        record.save(update_fields=['response_status', 'response_body', 'response_headers'])
+        return response
+    return wrapper
@@ -0,0 +1,61 @@
+import re
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from booking.models import Booking, RideRequest
+from driver.models import Driver
+from rating.models import Rating
+
+ACTIVE_STATUSES = ['Confirmed', 'Arrived', 'Ongoing', 'Started']
+# SQLite says "SCAN <table>", PostgreSQL "Seq Scan" and MySQL "type: ALL" for a full table read
+FULL_SCAN = re.compile(r'\bSCAN \w+$|Seq Scan|\bALL\b', re.MULTILINE)
+
+
+def hot_queries(user_id, driver_id, service_type_id):
+    """The busiest filters of passenger/driver views and dispatch, as (label, queryset) pairs."""
+    return [
+        ("passenger homepage: active booking",
+         Booking.objects.filter(user_id=user_id, status__in=ACTIVE_STATUSES).order_by('-booking_id')[:1]),
+        ("passenger homepage: pending ride request",
+         RideRequest.objects.filter(user_id=user_id, status='Requested').order_by('-id')[:1]),
+        ("driver homepage: active booking",
+         Booking.objects.filter(driver_id=driver_id, status__in=ACTIVE_STATUSES).order_by('-scheduled_time', '-booking_id')[:1]),
+        ("driver homepage: confirmed rides",
+         Booking.objects.filter(driver_id=driver_id, status__in=['Confirmed', 'Scheduled'])),
+        ("driver homepage: ride requests",
+         RideRequest.objects.filter(driver_id=driver_id, status='Requested', service_type_id=service_type_id)),
+        ("driver ratings: completed bookings",
+         Booking.objects.filter(driver_id=driver_id, status='Completed')),
+        ("driver ratings: ratings given by driver",
+         Rating.objects.filter(driver_id=driver_id, given_by='driver')),
+        ("book ride: matching drivers",
+         Driver.objects.filter(service_type_id=service_type_id, availability=True, status='Active', is_deleted=False)),
+        ("dispatch: is driver dispatchable",
+         Driver.objects.filter(Q(driver_id=driver_id), availability=True, status='Active', is_deleted=False)),
+    ]
+
+
+class Command(BaseCommand):
+    help = "Print the database's EXPLAIN plan for each hot booking/driver/rating query."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user-id', type=int, default=1)
+        parser.add_argument('--driver-id', type=int, default=1)
+        parser.add_argument('--service-type-id', type=int, default=1)
+
+    def handle(self, *args, **options):
+        scans = 0
+        for label, queryset in hot_queries(options['user_id'], options['driver_id'], options['service_type_id']):
+            plan = queryset.explain()
+            self.stdout.write(self.style.MIGRATE_HEADING(label))
+            self.stdout.write(plan)
+            self.stdout.write("")
+            if FULL_SCAN.search(plan):
+                scans += 1
+                self.stdout.write(self.style.WARNING(f"  ^ full table scan: {label}"))
+
+        if scans:
+            self.stdout.write(self.style.WARNING(f"{scans} quer(y/ies) read the whole table."))
+        else:
+            self.stdout.write(self.style.SUCCESS("Every hot query uses an index."))
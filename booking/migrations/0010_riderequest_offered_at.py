@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 17:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0009_booking_cancellation_fields'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='riderequest',
+            name='offered_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
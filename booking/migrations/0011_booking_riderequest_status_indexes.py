@@ -0,0 +1,33 @@
+# Generated by Django 5.2.4 on 2026-10-18 17:29
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0010_riderequest_offered_at'),
+        ('driver', '0007_driverstats'),
+        ('services', '0004_remove_fareslab_booking_fee'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['user', 'status'], name='booking_boo_user_id_dddf68_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['driver', 'status', 'scheduled_time'], name='booking_boo_driver__f1e3a4_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='riderequest',
+            index=models.Index(fields=['driver', 'status'], name='booking_rid_driver__1b4e72_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='riderequest',
+            index=models.Index(fields=['user', 'status'], name='booking_rid_user_id_d3c35f_idx'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.4 on 2026-10-18 17:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0011_booking_riderequest_status_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IdempotencyKey',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('owner', models.CharField(max_length=50)),
+                ('key', models.CharField(max_length=64)),
+                ('scope', models.CharField(max_length=255)),
+                ('response_status', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('response_body', models.TextField(blank=True, default='')),
+                ('response_headers', models.JSONField(blank=True, default=dict)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['owner', 'created_at'], name='booking_ide_owner_7ba4b7_idx')],
+                'unique_together': {('owner', 'key')},
+            },
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.4 on 2026-10-18 17:38
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0012_idempotencykey'),
+        ('driver', '0009_driver_service_type'),
+        ('services', '0004_remove_fareslab_booking_fee'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='riderequest',
+            name='status',
+            field=models.CharField(choices=[('Scheduled', 'Scheduled'), ('Requested', 'Requested'), ('Accepted', 'Accepted'), ('Rejected', 'Rejected'), ('Expired', 'Expired')], default='Requested', max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='riderequest',
+            index=models.Index(fields=['status', 'scheduled_time'], name='booking_rid_status_f051c7_idx'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.4 on 2026-10-18 18:05
+
+from django.db import migrations
+from django.utils.crypto import get_random_string, salted_hmac
+
+# Frozen copy of the hash format in booking/ride_pins.py as of this migration
+ALGORITHM = 'hmac_sha256'
+
+
+def hash_pin(pin):
+    salt = get_random_string(16)
+    digest = salted_hmac(f'booking.ride_pin.{salt}', pin, algorithm='sha256').hexdigest()
+    return f'{ALGORITHM}${salt}${digest}'
+
+
+def rehash_active_pins(apps, schema_editor):
+    # PINs still shown to a passenger keep their plaintext, so they can be
+    # rehashed now; the rest are upgraded by verify_ride_pin if ever used.
+    RidePin = apps.get_model('booking', 'RidePin')
+    pending = (
+        RidePin.objects
+        .exclude(pin_plain='')
+        .exclude(pin_hash__startswith=f'{ALGORITHM}$')
+    )
+    batch = []
+    for ride_pin in pending.only('id', 'pin_plain').iterator(chunk_size=500):
+        ride_pin.pin_hash = hash_pin(ride_pin.pin_plain)
+        batch.append(ride_pin)
+        if len(batch) >= 500:
+            RidePin.objects.bulk_update(batch, ['pin_hash'])
+            batch = []
+    if batch:
+        RidePin.objects.bulk_update(batch, ['pin_hash'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0013_riderequest_scheduled'),
+    ]
+
+    operations = [
+        migrations.RunPython(rehash_active_pins, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 17:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0014_ridepin_hmac_hashes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='riderequest',
+            name='next_attempt_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
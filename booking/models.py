@@ -39,7 +39,13 @@ class Booking(models.Model):
     cancellation_reason = models.TextField(null=True, blank=True)
     cancellation_stage = models.CharField(max_length=50, null=True, blank=True)
     cancelled_at = models.DateTimeField(null=True, blank=True)
-    
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'status']),
+            models.Index(fields=['driver', 'status', 'scheduled_time']),
+        ]
+
     def __str__(self):
         return f"Booking #{self.booking_id} - {self.status}"
     
@@ -47,7 +53,8 @@ class Booking(models.Model):
 class RidePin(models.Model):
     """
     One-time 4-digit PIN per ride, required before the driver can start.
-    Stores hashed PIN for verification plus a plaintext copy for passenger display only.
+    Stores a keyed HMAC of the PIN for verification (booking/ride_pins.py) plus a
+    plaintext copy for passenger display only.
     """
     booking = models.OneToOneField(Booking, on_delete=models.CASCADE, related_name='ride_pin')
     pin_hash = models.CharField(max_length=128)
@@ -65,6 +72,7 @@ class RidePin(models.Model):
 
 class RideRequest(models.Model):
     STATUS_CHOICES = [
+        ('Scheduled', 'Scheduled'),  # pre-booked, waiting for dispatch.scheduler to release it
         ('Requested', 'Requested'),
         ('Accepted', 'Accepted'),
         ('Rejected', 'Rejected'),
@@ -87,8 +95,37 @@ class RideRequest(models.Model):
     service_type = models.ForeignKey(ServiceType, on_delete=models.CASCADE)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='Requested')
     payment_mode = models.CharField(max_length=50, null=True, blank=True)
+    offered_at = models.DateTimeField(null=True, blank=True)  # when the current driver was offered the ride
+    next_attempt_at = models.DateTimeField(null=True, blank=True)  # scheduled ride found no driver; retry after this
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['driver', 'status']),
+            models.Index(fields=['user', 'status']),
+            models.Index(fields=['status', 'scheduled_time']),
+        ]
+
     def __str__(self):
         booking_info = f"Booking #{self.booking.booking_id}" if self.booking else "No Booking Yet"
         return f"RideRequest to Driver {self.driver_id} - {booking_info}"
+
+
+class IdempotencyKey(models.Model):
+    """A client-chosen key for one ride action and the response it produced (see booking/idempotency.py)."""
+    owner = models.CharField(max_length=50)   # who sent the key, e.g. "driver:12"
+    key = models.CharField(max_length=64)
+    scope = models.CharField(max_length=255)  # the view and path the key was first used on
+    response_status = models.PositiveSmallIntegerField(null=True, blank=True)  # None while in progress
+    response_body = models.TextField(blank=True, default='')
+    response_headers = models.JSONField(default=dict, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('owner', 'key')
+        indexes = [
+            models.Index(fields=['owner', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.owner} {self.key} ({self.scope})"
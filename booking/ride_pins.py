@@ -0,0 +1,42 @@
+"""
+Hashing of the 4-digit ride PIN.
+
+A PIN has only 10,000 values and its plaintext is kept for the passenger's
+screen, so a slow password hasher adds CPU on every accept and verify attempt
+without adding protection; the attempt limit and lockout in verify_ride_pin
+are what stop guessing. PINs are stored as an HMAC-SHA256 of the PIN, keyed
+with SECRET_KEY and a random per-PIN salt, and compared in constant time.
+
+Hashes made with make_password() before this change are still accepted and
+are replaced with the HMAC form the first time they verify.
+"""
+import secrets
+
+from django.contrib.auth.hashers import check_password
+from django.utils.crypto import constant_time_compare, get_random_string, salted_hmac
+
+ALGORITHM = "hmac_sha256"
+SALT_LENGTH = 16
+
+
+def new_pin():
+    return f"{secrets.randbelow(10000):04d}"
+
+
+def _digest(pin, salt):
+    return salted_hmac(f"booking.ride_pin.{salt}", pin, algorithm="sha256").hexdigest()
+
+
+def hash_pin(pin, salt=None):
+    salt = salt or get_random_string(SALT_LENGTH)
+    return f"{ALGORITHM}${salt}${_digest(pin, salt)}"
+
+
+def check_pin(pin, encoded):
+    """(matches, needs_rehash) for a PIN against a stored hash of either form."""
+    algorithm, _, rest = (encoded or '').partition('$')
+    if algorithm != ALGORITHM:
+        matches = check_password(pin, encoded)
+        return matches, matches
+    salt, _, digest = rest.partition('$')
+    return constant_time_compare(_digest(pin, salt), digest), False
@@ -43,6 +43,7 @@ INSTALLED_APPS = [
     "rating",
     "faq",
     "feedback",
+    "dispatch",
     # Third-party
     "widget_tweaks",
 ]
@@ -191,3 +192,114 @@ OUTSTATION_DISTANCE_KM = 40
 
 # Vehicle types not allowed for Outstation rides
 OUTSTATION_DISALLOWED_VEHICLES = ["Bike", "Auto"]
+
+# Driver dispatch: proximity search around the pickup point
+DISPATCH_GRID_CELL_DEG = 0.01          # ~1.1 km grid cells for the driver location index
+DISPATCH_SEARCH_RADIUS_KM = 10         # ignore drivers further than this from pickup
+DISPATCH_CANDIDATE_LIMIT = 20          # K nearest drivers considered per ride request
+DRIVER_LOCATION_TTL_SECONDS = 120      # positions older than this are treated as unknown
+
+# Driver GPS ingestion: latest position lives in the cache, the trail is flushed in bulk
+DRIVER_TRAIL_MIN_INTERVAL_SECONDS = 15     # keep at most one trail point per interval...
+DRIVER_TRAIL_MIN_DISTANCE_M = 50           # ...unless the driver moved at least this far
+DRIVER_LOCATION_FLUSH_SIZE = 500           # flush buffered trail points at this many rows
+DRIVER_LOCATION_FLUSH_SECONDS = 10         # or when the oldest buffered point is this old
+DRIVER_LOCATION_MAX_PING_AGE_SECONDS = 3600
+
+# Shared cache: every gunicorn worker must see the same dispatch/location state.
+# Redis when REDIS_URL is set, otherwise a file-based cache shared by workers on one host.
+REDIS_URL = os.getenv("REDIS_URL")
+if REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+            "LOCATION": os.getenv("CACHE_DIR", "/tmp/dropme-cache"),
+            "OPTIONS": {"MAX_ENTRIES": 50000},
+        }
+    }
+
+# Candidate-driver queues per ride request (see dispatch/queue.py)
+DISPATCH_QUEUE_BACKEND = os.getenv(
+    "DISPATCH_QUEUE_BACKEND",
+    "dispatch.queue.RedisQueueStore" if REDIS_URL else "dispatch.queue.DatabaseQueueStore",
+)
+DISPATCH_QUEUE_TTL_SECONDS = 60 * 10
+
+# Background dispatcher (python manage.py run_dispatcher)
+DISPATCH_OFFER_TIMEOUT_SECONDS = 120   # a driver has this long to accept before the next one is offered
+DISPATCH_POLL_SECONDS = 2              # how often new offers are picked up from the database
+
+# How a ride request is offered: "sequential" (one driver at a time) or
+# "broadcast" (DISPATCH_BROADCAST_SIZE drivers at once, first accept wins)
+DISPATCH_MODE = os.getenv("DISPATCH_MODE", "sequential")
+DISPATCH_BROADCAST_SIZE = 3
+
+# Pre-booked rides (python manage.py dispatch_scheduled_rides)
+DISPATCH_SCHEDULED_LEAD_SECONDS = 20 * 60   # dispatch starts this long before pickup
+DISPATCH_SCHEDULED_BATCH_SIZE = 50          # rides released per pass, earliest pickup first
+DISPATCH_SCHEDULED_RETRY_SECONDS = 2 * 60   # wait before retrying a scheduled ride that found no driver
+DISPATCH_SCHEDULER_INTERVAL_SECONDS = 30
+DISPATCH_FORECAST_SLOT_MINUTES = 30         # slot width of the driver demand forecast
+
+# Server-Sent Events push channel (notifications/events.py); needs the ASGI server
+EVENT_STREAM_POLL_SECONDS = 0.5        # how often an open stream checks for new events
+EVENT_STREAM_MAX_SECONDS = 300         # streams are closed after this long; browsers reconnect
+
+# Fare quotes: per-process tariff snapshot (services/fare_engine.py)
+FARE_SNAPSHOT_CHECK_SECONDS = 5        # how often a process checks whether tariffs were edited
+BATCH_QUOTE_MAX_TRIPS = 1000           # per request to services/api/quotes/ (open endpoint)
+BATCH_QUOTE_MAX_DISTANCE_KM = 5000     # larger, negative or non-finite trip values are rejected
+BATCH_QUOTE_MAX_DURATION_MIN = 6000
+
+# Surge pricing (python manage.py compute_surge)
+SURGE_ZONE_CELL_DEG = 0.05             # ~5.5 km pricing zones
+SURGE_WINDOW_SECONDS = 600             # open ride requests created within this window count as demand
+SURGE_SUPPLY_FRESH_SECONDS = 300       # available drivers must have reported a position this recently
+SURGE_MIN_REQUESTS = 3                 # no surge below this many open requests in a zone
+SURGE_RATIO_THRESHOLD = 1.0            # requests per available driver before surge starts
+SURGE_SENSITIVITY = 0.5                # multiplier added per request/driver above the threshold
+SURGE_MAX_MULTIPLIER = 2.5
+SURGE_SMOOTHING = 0.5                  # fraction of the way towards the new target per update
+SURGE_INTERVAL_SECONDS = 30            # recompute cadence
+SURGE_REFRESH_SECONDS = 5              # how often web processes reload the published table
+
+# Driver earnings page (driver/earnings/)
+DRIVER_EARNINGS_PAGE_SIZE = 20         # completed rides listed per page
+
+# Admin dashboard counters (adminpanel/metrics.py)
+ADMIN_METRICS_TTL_SECONDS = 30         # counters older than this are recomputed in the background
+ADMIN_METRICS_MAX_STALE_SECONDS = 300  # ...and never served older than this
+
+# Booking analytics rollups (python manage.py rollup_bookings)
+ROLLUP_INTERVAL_SECONDS = 60           # how often days changed by new/updated bookings are recomputed
+
+# Admin list pages (adminpanel/listing.py)
+ADMIN_LIST_PAGE_SIZE = 50
+
+# Admin CSV/JSONL exports (adminpanel/exports.py)
+EXPORT_CHUNK_SIZE = 2000               # rows read and written per batch
+
+# Idempotency keys on driver ride actions (booking/idempotency.py)
+IDEMPOTENCY_KEY_TTL_SECONDS = 60 * 60 * 24
+IDEMPOTENCY_IN_PROGRESS_LEASE_SECONDS = 30   # an unfinished request older than this is retried
+
+# Server-side routing for fare quotes (dispatch/routing.py, python manage.py build_road_graph)
+ROUTING_OSM_PATH = os.getenv("ROUTING_OSM_PATH", "")       # OSM XML road extract (.osm / .osm.gz)
+ROUTING_GRAPH_PATH = os.getenv("ROUTING_GRAPH_PATH", "")   # compiled graph; empty = trust client route values
+ROUTING_LANDMARKS = 8                  # ALT landmarks precomputed by build_road_graph
+ROUTING_SNAP_CELL_DEG = 0.005          # grid of the nearest-road-node index
+ROUTING_MAX_SNAP_KM = 0.5              # a point further than this from any road is not routed
+ROUTING_CACHE_CELL_DEG = 0.002         # ~220 m cells; routes are computed and cached per cell pair
+ROUTING_CACHE_TTL_SECONDS = 60 * 60 * 24
+ROUTING_LOCAL_CACHE_SIZE = 10000       # cell pairs kept in each process
+ROUTING_ETA_MAX_SECONDS = 45 * 60      # candidate drivers further than this by road are ranked by straight line
+
+# Rating aggregates (rating/aggregates.py, python manage.py backfill_rating_summaries)
+RATING_RECENT_WEIGHT = 0.1             # share of the decayed recent average each new rating replaces
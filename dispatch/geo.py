@@ -0,0 +1,50 @@
+import math
+from django.conf import settings
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEG_LAT = 111.32
+
+
+def get_cell_size_deg() -> float:
+    return float(getattr(settings, "DISPATCH_GRID_CELL_DEG", 0.01))
+
+
+def haversine_km(lat1, lng1, lat2, lng2) -> float:
+    lat1, lng1, lat2, lng2 = map(math.radians, (float(lat1), float(lng1), float(lat2), float(lng2)))
+    dlat = lat2 - lat1
+    dlng = lng2 - lng1
+    a = math.sin(dlat / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin(dlng / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def cell_for(lat, lng, cell_size=None):
+    """Grid cell (row, col) containing the point."""
+    size = cell_size or get_cell_size_deg()
+    return int(math.floor(float(lat) / size)), int(math.floor(float(lng) / size))
+
+
+def ring_cells(center, radius):
+    """Cells on the square ring `radius` steps away from `center` (radius 0 is the center itself)."""
+    row, col = center
+    if radius == 0:
+        return [center]
+    cells = []
+    for dc in range(-radius, radius + 1):
+        cells.append((row - radius, col + dc))
+        cells.append((row + radius, col + dc))
+    for dr in range(-radius + 1, radius):
+        cells.append((row + dr, col - radius))
+        cells.append((row + dr, col + radius))
+    return cells
+
+
+def ring_min_distance_km(lat, radius, cell_size=None) -> float:
+    """
+    Lower bound on the distance from a point to anything in ring `radius`.
+    Longitude degrees shrink with latitude, so the bound uses the narrower axis.
+    """
+    if radius <= 0:
+        return 0.0
+    size = cell_size or get_cell_size_deg()
+    km_per_deg_lng = KM_PER_DEG_LAT * max(math.cos(math.radians(float(lat))), 0.01)
+    return (radius - 1) * size * min(KM_PER_DEG_LAT, km_per_deg_lng)
@@ -0,0 +1,142 @@
+"""
+Cache-backed grid index of live driver positions.
+
+Each grid cell (see dispatch.geo) holds a small dict of the drivers currently
+inside it, keyed per vehicle type, so a proximity search only reads the cells
+around the pickup point instead of scanning the Driver table.
+"""
+import heapq
+import math
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .geo import KM_PER_DEG_LAT, cell_for, get_cell_size_deg, haversine_km, ring_cells, ring_min_distance_km
+
+CELL_KEY = "dispatch:geo:{vehicle}:{row}:{col}"
+DRIVER_KEY = "dispatch:geo:driver:{driver_id}"
+
+
+def normalize_vehicle_type(value) -> str:
+    return (value or "").strip().lower()
+
+
+def get_location_ttl() -> int:
+    return int(getattr(settings, "DRIVER_LOCATION_TTL_SECONDS", 120))
+
+
+def _cell_key(vehicle, cell):
+    return CELL_KEY.format(vehicle=vehicle, row=cell[0], col=cell[1])
+
+
+def _fresh_members(members, now, ttl):
+    return {
+        driver_id: entry
+        for driver_id, entry in (members or {}).items()
+        if now - entry[2] <= ttl
+    }
+
+
+def _discard(cell_key, driver_id):
+    members = cache.get(cell_key)
+    if members and driver_id in members:
+        members.pop(driver_id, None)
+        if members:
+            cache.set(cell_key, members, timeout=get_location_ttl() * 5)
+        else:
+            cache.delete(cell_key)
+
+
+def update_driver_location(driver_id, vehicle_type, lat, lng, timestamp=None):
+    """
+    Move a driver to the cell containing (lat, lng).
+    Concurrent writers to the same cell can drop each other's update; the next
+    ping from the affected driver restores it, so no locking is done here.
+    """
+    now = time.time()
+    ts = float(timestamp) if timestamp is not None else now
+    ttl = get_location_ttl()
+    vehicle = normalize_vehicle_type(vehicle_type)
+    new_key = _cell_key(vehicle, cell_for(lat, lng))
+    driver_key = DRIVER_KEY.format(driver_id=driver_id)
+
+    previous_key = cache.get(driver_key)
+    if previous_key and previous_key != new_key:
+        _discard(previous_key, driver_id)
+
+    members = _fresh_members(cache.get(new_key), now, ttl)
+    members[driver_id] = (float(lat), float(lng), ts)
+    cache.set(new_key, members, timeout=ttl * 5)
+    cache.set(driver_key, new_key, timeout=ttl * 5)
+
+
+def remove_driver_location(driver_id):
+    driver_key = DRIVER_KEY.format(driver_id=driver_id)
+    previous_key = cache.get(driver_key)
+    if previous_key:
+        _discard(previous_key, driver_id)
+    cache.delete(driver_key)
+
+
+def get_driver_location(driver_id):
+    """Latest (lat, lng, timestamp) for a driver, or None if unknown or stale."""
+    cell_key = cache.get(DRIVER_KEY.format(driver_id=driver_id))
+    if not cell_key:
+        return None
+    entry = (cache.get(cell_key) or {}).get(driver_id)
+    if not entry or time.time() - entry[2] > get_location_ttl():
+        return None
+    return entry
+
+
+def get_driver_locations(driver_ids):
+    """{driver_id: (lat, lng, timestamp)} for the drivers with a fresh position, in two cache reads."""
+    driver_keys = {DRIVER_KEY.format(driver_id=driver_id): driver_id for driver_id in driver_ids}
+    cell_keys = cache.get_many(list(driver_keys))
+    cells = cache.get_many(list(set(cell_keys.values())))
+    now = time.time()
+    ttl = get_location_ttl()
+    locations = {}
+    for driver_key, cell_key in cell_keys.items():
+        driver_id = driver_keys[driver_key]
+        entry = (cells.get(cell_key) or {}).get(driver_id)
+        if entry and now - entry[2] <= ttl:
+            locations[driver_id] = entry
+    return locations
+
+
+def nearest_drivers(vehicle_type, lat, lng, k=None, radius_km=None):
+    """
+    Return up to `k` (driver_id, distance_km) pairs for drivers of `vehicle_type`
+    within `radius_km` of the point, nearest first.
+    Rings of cells are read outwards until the k-th best distance is closer than
+    anything an unread ring could contain.
+    """
+    k = int(k or getattr(settings, "DISPATCH_CANDIDATE_LIMIT", 20))
+    radius_km = float(radius_km or getattr(settings, "DISPATCH_SEARCH_RADIUS_KM", 10))
+    vehicle = normalize_vehicle_type(vehicle_type)
+    now = time.time()
+    ttl = get_location_ttl()
+    cell_size = get_cell_size_deg()
+    center = cell_for(lat, lng, cell_size)
+
+    km_per_cell = cell_size * KM_PER_DEG_LAT * max(math.cos(math.radians(float(lat))), 0.01)
+    max_ring = int(math.ceil(radius_km / km_per_cell)) + 1
+
+    best = {}
+    for radius in range(max_ring + 1):
+        if len(best) >= k:
+            kth = heapq.nsmallest(k, best.values())[-1]
+            if ring_min_distance_km(lat, radius, cell_size) > kth:
+                break
+        keys = [_cell_key(vehicle, cell) for cell in ring_cells(center, radius)]
+        for members in cache.get_many(keys).values():
+            for driver_id, (d_lat, d_lng, ts) in members.items():
+                if now - ts > ttl:
+                    continue
+                distance = haversine_km(lat, lng, d_lat, d_lng)
+                if distance <= radius_km and distance < best.get(driver_id, float("inf")):
+                    best[driver_id] = distance
+
+    return heapq.nsmallest(k, best.items(), key=lambda item: item[1])
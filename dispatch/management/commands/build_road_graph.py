@@ -0,0 +1,36 @@
+import time
+from xml.etree.ElementTree import ParseError
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from dispatch.routing import compile_graph, save_graph
+
+
+class Command(BaseCommand):
+    help = "Compile the OSM road extract into the routing graph used for server-side fare quotes."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--osm', default=getattr(settings, 'ROUTING_OSM_PATH', ''), help='OSM XML extract (.osm or .osm.gz).')
+        parser.add_argument('--output', default=getattr(settings, 'ROUTING_GRAPH_PATH', ''), help='Where to write the compiled graph.')
+        parser.add_argument('--landmarks', type=int, default=getattr(settings, 'ROUTING_LANDMARKS', 8))
+
+    def handle(self, *args, **options):
+        if not options['osm'] or not options['output']:
+            raise CommandError("Set ROUTING_OSM_PATH and ROUTING_GRAPH_PATH, or pass --osm and --output.")
+
+        started = time.monotonic()
+        try:
+            graph = compile_graph(options['osm'], landmarks=options['landmarks'])
+        except (OSError, ParseError) as exc:
+            raise CommandError(f"Could not read {options['osm']}: {exc}")
+        if not len(graph):
+            raise CommandError(f"No drivable roads found in {options['osm']}.")
+        save_graph(graph, options['output'])
+
+        edges = sum(len(out) for out in graph.edges)
+        self.stdout.write(self.style.SUCCESS(
+            f"Road graph written to {options['output']}: {len(graph)} nodes, {edges} edges, "
+            f"{len(graph.landmarks)} landmarks ({time.monotonic() - started:.1f}s). "
+            f"Restart web processes to load it."
+        ))
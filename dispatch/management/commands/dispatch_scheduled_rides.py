@@ -0,0 +1,45 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from dispatch.scheduler import forecast_driver_demand, release_due
+
+
+class Command(BaseCommand):
+    help = "Release pre-booked rides into dispatch shortly before pickup, or print the driver demand forecast."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Release the rides that are due, then exit (for cron).')
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=getattr(settings, 'DISPATCH_SCHEDULER_INTERVAL_SECONDS', 30),
+            help='Seconds between passes.',
+        )
+        parser.add_argument('--forecast', action='store_true', help='Print drivers needed per time slot and exit.')
+        parser.add_argument('--hours', type=int, default=24, help='Forecast window (with --forecast).')
+
+    def handle(self, *args, **options):
+        if options['forecast']:
+            for row in forecast_driver_demand(hours=options['hours']):
+                self.stdout.write(
+                    f"{row['slot_start']}  {row['service_type'] or '-':<12} "
+                    f"pickups={row['pickups']:<4} drivers_needed={row['drivers_needed']:<4} "
+                    f"registered={row['drivers_registered']}"
+                )
+            return
+
+        try:
+            while True:
+                started = time.monotonic()
+                close_old_connections()
+                released, waiting = release_due()
+                if released or waiting:
+                    self.stdout.write(f"Scheduled rides: {released} released, {waiting} still waiting for a driver.")
+                if options['once']:
+                    return
+                time.sleep(max(options['interval'] - (time.monotonic() - started), 0))
+        except KeyboardInterrupt:
+            self.stdout.write("Scheduler stopped.")
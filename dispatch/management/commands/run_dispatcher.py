@@ -0,0 +1,111 @@
+import heapq
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.utils import timezone
+
+from booking.models import RideRequest
+from dispatch.services import advance_ride_request, offer_deadline
+
+
+class Command(BaseCommand):
+    help = "Move pending ride requests to the next driver when an offer is not accepted in time."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Advance every offer that is already overdue, then exit (for cron).',
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=getattr(settings, 'DISPATCH_POLL_SECONDS', 2),
+            help='Seconds between checks for newly offered ride requests.',
+        )
+
+    def handle(self, *args, **options):
+        self.heap = []          # (deadline, ride_request_id, driver_id, offered_at); driver_id is None for broadcasts
+        self.scheduled = {}     # ride_request_id -> (driver_id, offered_at) of the live heap entry
+        self.watermark = None
+        poll_interval = max(options['poll_interval'], 0.1)
+
+        self.load_offers()
+        if options['once']:
+            self.advance_due(timezone.now())
+            return
+
+        self.stdout.write(f"Dispatcher running, {len(self.heap)} offer(s) pending.")
+        next_poll = time.monotonic() + poll_interval
+        try:
+            while True:
+                close_old_connections()
+                if time.monotonic() >= next_poll:
+                    self.load_offers(overlap=poll_interval * 5)
+                    next_poll = time.monotonic() + poll_interval
+
+                now = timezone.now()
+                self.advance_due(now)
+
+                wait = next_poll - time.monotonic()
+                if self.heap:
+                    wait = min(wait, (self.heap[0][0] - timezone.now()).total_seconds())
+                time.sleep(max(wait, 0.05))
+        except KeyboardInterrupt:
+            self.stdout.write("Dispatcher stopped.")
+
+    def schedule(self, ride_request_id, driver_id, offered_at, deadline):
+        if self.scheduled.get(ride_request_id) == (driver_id, offered_at):
+            return
+        self.scheduled[ride_request_id] = (driver_id, offered_at)
+        heapq.heappush(self.heap, (deadline, ride_request_id, driver_id, offered_at))
+
+    def load_offers(self, overlap=0):
+        """Pick up offers made since the last poll (all open offers on the first call)."""
+        offers = RideRequest.objects.filter(
+            status='Requested',
+            booking__isnull=True,
+            offered_at__isnull=False,
+        )
+        if self.watermark is not None:
+            offers = offers.filter(offered_at__gte=self.watermark - timedelta(seconds=overlap))
+
+        for ride_request in offers.only('id', 'driver_id', 'offered_at'):
+            self.schedule(
+                ride_request.id,
+                ride_request.driver_id,
+                ride_request.offered_at,
+                offer_deadline(ride_request),
+            )
+            if self.watermark is None or ride_request.offered_at > self.watermark:
+                self.watermark = ride_request.offered_at
+        if self.watermark is None:
+            self.watermark = timezone.now()
+
+    def advance_due(self, now):
+        while self.heap and self.heap[0][0] <= now:
+            _, ride_request_id, driver_id, offered_at = heapq.heappop(self.heap)
+            # Entries superseded by a newer offer for the same ride are skipped lazily
+            if self.scheduled.get(ride_request_id) != (driver_id, offered_at):
+                continue
+            del self.scheduled[ride_request_id]
+
+            ride_request, drivers = advance_ride_request(
+                ride_request_id,
+                expected_driver_id=driver_id,
+                expected_offered_at=offered_at,
+            )
+            if ride_request is None:
+                continue
+            if not drivers:
+                self.stdout.write(f"RideRequest {ride_request_id}: no drivers left, expired.")
+                continue
+            self.schedule(
+                ride_request.id,
+                ride_request.driver_id,
+                ride_request.offered_at,
+                offer_deadline(ride_request),
+            )
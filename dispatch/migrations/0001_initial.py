@@ -0,0 +1,25 @@
+# Generated by Django 5.2.4 on 2026-10-18 17:11
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('booking', '0009_booking_cancellation_fields'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DispatchQueue',
+            fields=[
+                ('ride_request', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='dispatch_queue', serialize=False, to='booking.riderequest')),
+                ('candidate_ids', models.JSONField(default=list)),
+                ('expires_at', models.DateTimeField(db_index=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.4 on 2026-10-18 17:36
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0012_idempotencykey'),
+        ('dispatch', '0001_initial'),
+        ('driver', '0009_driver_service_type'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RideOffer',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('Offered', 'Offered'), ('Accepted', 'Accepted'), ('Declined', 'Declined'), ('Retracted', 'Retracted')], default='Offered', max_length=10)),
+                ('offered_at', models.DateTimeField()),
+                ('responded_at', models.DateTimeField(blank=True, null=True)),
+                ('driver', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ride_offers', to='driver.driver')),
+                ('ride_request', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='offers', to='booking.riderequest')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['driver', 'status'], name='dispatch_ri_driver__a0208e_idx')],
+                'unique_together': {('ride_request', 'driver')},
+            },
+        ),
+    ]
@@ -0,0 +1,49 @@
+from django.db import models
+
+
+class DispatchQueue(models.Model):
+    """
+    Remaining candidate drivers for a ride request, shared by all workers.
+    Used by dispatch.queue.DatabaseQueueStore.
+    """
+    ride_request = models.OneToOneField(
+        'booking.RideRequest',
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='dispatch_queue',
+    )
+    candidate_ids = models.JSONField(default=list)
+    expires_at = models.DateTimeField(db_index=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"DispatchQueue for RideRequest #{self.ride_request_id} ({len(self.candidate_ids)} left)"
+
+
+class RideOffer(models.Model):
+    """
+    A ride request offered to one of several drivers at once
+    (settings.DISPATCH_MODE = 'broadcast'). The first to accept gets the ride;
+    the other open offers are retracted.
+    """
+    STATUS_CHOICES = [
+        ('Offered', 'Offered'),
+        ('Accepted', 'Accepted'),
+        ('Declined', 'Declined'),
+        ('Retracted', 'Retracted'),
+    ]
+
+    ride_request = models.ForeignKey('booking.RideRequest', on_delete=models.CASCADE, related_name='offers')
+    driver = models.ForeignKey('driver.Driver', on_delete=models.CASCADE, related_name='ride_offers')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='Offered')
+    offered_at = models.DateTimeField()  # the broadcast round, equal to RideRequest.offered_at
+    responded_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        unique_together = ('ride_request', 'driver')
+        indexes = [
+            models.Index(fields=['driver', 'status']),
+        ]
+
+    def __str__(self):
+        return f"RideRequest #{self.ride_request_id} offered to Driver {self.driver_id} ({self.status})"
@@ -0,0 +1,177 @@
+"""
+Candidate-driver queues for ride requests.
+
+The queue for a ride request holds the drivers that have not been offered the
+ride yet. Every web worker and the dispatcher must see the same queue, so it
+lives in a shared store selected by settings.DISPATCH_QUEUE_BACKEND:
+
+- dispatch.queue.DatabaseQueueStore (default): one DispatchQueue row per ride
+  request, popped under a row lock.
+- dispatch.queue.RedisQueueStore: one Redis list per ride request, popped with
+  LPOP. Needs the `redis` package and settings.REDIS_URL.
+"""
+from abc import ABC, abstractmethod
+from datetime import timedelta
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+
+def get_queue_ttl() -> int:
+    return int(getattr(settings, "DISPATCH_QUEUE_TTL_SECONDS", 60 * 10))
+
+
+class BaseQueueStore(ABC):
+    @abstractmethod
+    def set(self, ride_request_id, driver_ids):
+        pass
+
+    @abstractmethod
+    def get(self, ride_request_id):
+        pass
+
+    @abstractmethod
+    def pop_next(self, ride_request_id, is_eligible=None):
+        """
+        Atomically remove and return the first driver id for which `is_eligible`
+        returns True. Ineligible drivers ahead of it are dropped. Returns None
+        when the queue is exhausted.
+        """
+
+    @abstractmethod
+    def discard(self, ride_request_id, driver_id):
+        pass
+
+    @abstractmethod
+    def delete(self, ride_request_id):
+        pass
+
+
+class DatabaseQueueStore(BaseQueueStore):
+    def set(self, ride_request_id, driver_ids):
+        from .models import DispatchQueue
+
+        DispatchQueue.objects.update_or_create(
+            ride_request_id=ride_request_id,
+            defaults={
+                'candidate_ids': list(driver_ids),
+                'expires_at': timezone.now() + timedelta(seconds=get_queue_ttl()),
+            },
+        )
+
+    def get(self, ride_request_id):
+        from .models import DispatchQueue
+
+        row = (
+            DispatchQueue.objects
+            .filter(ride_request_id=ride_request_id, expires_at__gt=timezone.now())
+            .values_list('candidate_ids', flat=True)
+            .first()
+        )
+        return list(row or [])
+
+    def pop_next(self, ride_request_id, is_eligible=None):
+        from .models import DispatchQueue
+
+        with transaction.atomic():
+            queue = (
+                DispatchQueue.objects
+                .select_for_update()
+                .filter(ride_request_id=ride_request_id, expires_at__gt=timezone.now())
+                .first()
+            )
+            if queue is None:
+                return None
+
+            remaining = list(queue.candidate_ids)
+            chosen = None
+            while remaining:
+                candidate_id = remaining.pop(0)
+                if is_eligible is None or is_eligible(candidate_id):
+                    chosen = candidate_id
+                    break
+
+            queue.candidate_ids = remaining
+            queue.expires_at = timezone.now() + timedelta(seconds=get_queue_ttl())
+            queue.save(update_fields=['candidate_ids', 'expires_at', 'updated_at'])
+            return chosen
+
+    def discard(self, ride_request_id, driver_id):
+        from .models import DispatchQueue
+
+        with transaction.atomic():
+            queue = (
+                DispatchQueue.objects
+                .select_for_update()
+                .filter(ride_request_id=ride_request_id)
+                .first()
+            )
+            if queue and driver_id in queue.candidate_ids:
+                queue.candidate_ids = [cid for cid in queue.candidate_ids if cid != driver_id]
+                queue.save(update_fields=['candidate_ids', 'updated_at'])
+
+    def delete(self, ride_request_id):
+        from .models import DispatchQueue
+
+        DispatchQueue.objects.filter(ride_request_id=ride_request_id).delete()
+
+    def purge_expired(self):
+        from .models import DispatchQueue
+
+        return DispatchQueue.objects.filter(expires_at__lte=timezone.now()).delete()[0]
+
+
+class RedisQueueStore(BaseQueueStore):
+    KEY = "dispatch:queue:{ride_request_id}"
+
+    def __init__(self):
+        try:
+            import redis
+        except ImportError as exc:
+            raise ImproperlyConfigured("RedisQueueStore requires the 'redis' package.") from exc
+        url = getattr(settings, "REDIS_URL", None)
+        if not url:
+            raise ImproperlyConfigured("RedisQueueStore requires settings.REDIS_URL.")
+        self.client = redis.Redis.from_url(url)
+
+    def _key(self, ride_request_id):
+        return self.KEY.format(ride_request_id=ride_request_id)
+
+    def set(self, ride_request_id, driver_ids):
+        key = self._key(ride_request_id)
+        pipe = self.client.pipeline()
+        pipe.delete(key)
+        if driver_ids:
+            pipe.rpush(key, *driver_ids)
+            pipe.expire(key, get_queue_ttl())
+        pipe.execute()
+
+    def get(self, ride_request_id):
+        return [int(v) for v in self.client.lrange(self._key(ride_request_id), 0, -1)]
+
+    def pop_next(self, ride_request_id, is_eligible=None):
+        key = self._key(ride_request_id)
+        while True:
+            value = self.client.lpop(key)
+            if value is None:
+                return None
+            candidate_id = int(value)
+            if is_eligible is None or is_eligible(candidate_id):
+                self.client.expire(key, get_queue_ttl())
+                return candidate_id
+
+    def discard(self, ride_request_id, driver_id):
+        self.client.lrem(self._key(ride_request_id), 0, driver_id)
+
+    def delete(self, ride_request_id):
+        self.client.delete(self._key(ride_request_id))
+
+
+@lru_cache(maxsize=None)
+def get_queue_store() -> BaseQueueStore:
+    backend = getattr(settings, "DISPATCH_QUEUE_BACKEND", "dispatch.queue.DatabaseQueueStore")
+    return import_string(backend)()
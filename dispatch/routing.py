@@ -0,0 +1,501 @@
+"""
+Server-side road routing for fare quotes and dispatch ETAs.
+
+The road graph is read from an OpenStreetMap XML extract (ROUTING_OSM_PATH).
+It is compiled once into ROUTING_GRAPH_PATH by `python manage.py
+build_road_graph`, and each process loads that file on first use. Edges are
+weighted by travel time at a per-highway-type speed. Shortest paths use A*
+with landmarks (ALT): travel times to and from a few far-apart landmark nodes
+are precomputed and give a lower bound that steers the search towards the
+destination.
+
+Pickup and drop points are snapped to a ROUTING_CACHE_CELL_DEG grid cell and
+routed from the road node nearest each cell centre. The same cell pair
+therefore always gets the same distance and duration, whatever the browser
+sends. Results are kept per cell pair in a small per-process LRU and in the
+shared cache, so a popular route is computed once.
+
+eta_matrix() gives the travel time from many candidate drivers to one pickup
+with a single reverse search, for ranking dispatch candidates.
+
+With no graph configured, trip_metrics() falls back to the client's
+distance/duration as before.
+"""
+import gzip
+import heapq
+import math
+import os
+import pickle
+import random
+import threading
+import time
+import xml.etree.ElementTree as ET
+from array import array
+from collections import OrderedDict, defaultdict
+from dataclasses import dataclass
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .geo import KM_PER_DEG_LAT, cell_for, haversine_km, ring_cells
+
+GRAPH_FORMAT = 1
+INF = float('inf')
+
+# km/h used when a way has no usable maxspeed tag
+HIGHWAY_SPEEDS_KMH = {
+    'motorway': 80, 'motorway_link': 45,
+    'trunk': 60, 'trunk_link': 40,
+    'primary': 45, 'primary_link': 35,
+    'secondary': 40, 'secondary_link': 30,
+    'tertiary': 35, 'tertiary_link': 25,
+    'unclassified': 30,
+    'residential': 25,
+    'living_street': 10,
+    'service': 15,
+    'road': 25,
+}
+ONEWAY_YES = ('yes', 'true', '1')
+
+
+@dataclass(frozen=True)
+class Route:
+    distance_km: Decimal
+    duration_min: Decimal
+
+
+class RoadGraph:
+    """Compiled road graph: node coordinates, weighted adjacency lists and landmark tables."""
+
+    def __init__(self, lat, lng, edges, snap_cell_deg, version):
+        self.lat = lat                    # array('d') per node index
+        self.lng = lng
+        self.edges = edges                # edges[u] = [(v, metres, seconds), ...]
+        self.snap_cell_deg = snap_cell_deg
+        self.version = version
+        self.landmarks = []               # node indexes
+        self.from_landmark = []           # travel seconds landmark -> node, array per landmark
+        self.to_landmark = []             # travel seconds node -> landmark
+        self._build_snap_index()
+
+    def __len__(self):
+        return len(self.lat)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['snap_index']
+        state.pop('_reverse', None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._build_snap_index()
+
+    def _build_snap_index(self):
+        index = defaultdict(list)
+        for node in range(len(self.lat)):
+            index[cell_for(self.lat[node], self.lng[node], self.snap_cell_deg)].append(node)
+        self.snap_index = dict(index)
+
+    def nearest_node(self, lat, lng, max_km):
+        """Index of the road node closest to the point, or None if none is within `max_km`."""
+        center = cell_for(lat, lng, self.snap_cell_deg)
+        km_per_deg_lng = KM_PER_DEG_LAT * max(math.cos(math.radians(lat)), 0.01)
+        cell_km = self.snap_cell_deg * min(KM_PER_DEG_LAT, km_per_deg_lng)
+        best, best_km = None, max_km
+        radius = 0
+        # A node in ring r is at least (r - 1) cells away, so stop once that exceeds the best found
+        while (radius - 1) * cell_km <= best_km:
+            for cell in ring_cells(center, radius):
+                for node in self.snap_index.get(cell, ()):
+                    km = haversine_km(lat, lng, self.lat[node], self.lng[node])
+                    if km <= best_km:
+                        best, best_km = node, km
+            radius += 1
+        return best
+
+    def dijkstra(self, source, reverse_edges=None):
+        """Travel seconds from `source` to every node (to `source` from every node when given reverse edges)."""
+        edges = reverse_edges or self.edges
+        dist = array('d', [INF]) * len(self.lat)
+        dist[source] = 0.0
+        heap = [(0.0, source)]
+        while heap:
+            d, u = heapq.heappop(heap)
+            if d > dist[u]:
+                continue
+            for v, _, seconds in edges[u]:
+                nd = d + seconds
+                if nd < dist[v]:
+                    dist[v] = nd
+                    heapq.heappush(heap, (nd, v))
+        return dist
+
+    def reverse_edges(self):
+        reverse = [[] for _ in range(len(self.lat))]
+        for u, out in enumerate(self.edges):
+            for v, metres, seconds in out:
+                reverse[v].append((u, metres, seconds))
+        return reverse
+
+    def travel_times_to(self, target, sources, max_seconds=INF):
+        """
+        Many-to-one: travel seconds from each of `sources` to `target`, found
+        with a single Dijkstra search over the reversed edges that stops once
+        every source is settled or `max_seconds` is exceeded. Unreached sources
+        are left out.
+        """
+        reverse = getattr(self, '_reverse', None)
+        if reverse is None:
+            reverse = self._reverse = self.reverse_edges()
+        pending = set(sources)
+        found = {}
+        dist = {target: 0.0}
+        heap = [(0.0, target)]
+        while heap and pending:
+            d, u = heapq.heappop(heap)
+            if d > max_seconds:
+                break
+            if d > dist[u]:
+                continue
+            if u in pending:
+                pending.discard(u)
+                found[u] = d
+            for v, _, seconds in reverse[u]:
+                nd = d + seconds
+                if nd < dist.get(v, INF):
+                    dist[v] = nd
+                    heapq.heappush(heap, (nd, v))
+        return found
+
+    def build_landmarks(self, count, seed=0):
+        """
+        Pick `count` landmarks spread over the graph (each one the node farthest
+        from those already picked) and store travel times to and from them.
+        """
+        if not len(self):
+            return
+        reverse = self.reverse_edges()
+        rng = random.Random(seed)
+        nearest = array('d', [INF]) * len(self)
+        candidate = rng.randrange(len(self))
+        self.landmarks, self.from_landmark, self.to_landmark = [], [], []
+        for _ in range(min(count, len(self))):
+            forward = self.dijkstra(candidate)
+            self.landmarks.append(candidate)
+            self.from_landmark.append(forward)
+            self.to_landmark.append(self.dijkstra(candidate, reverse_edges=reverse))
+            for node, seconds in enumerate(forward):
+                if seconds < nearest[node]:
+                    nearest[node] = seconds
+            reachable = [node for node in range(len(self)) if nearest[node] < INF]
+            candidate = max(reachable, key=nearest.__getitem__)
+            if nearest[candidate] == 0:
+                break
+
+    def _potential(self, target):
+        """ALT lower bound on the travel seconds from a node to `target`."""
+        bounds = []
+        for forward, backward in zip(self.from_landmark, self.to_landmark):
+            if forward[target] < INF:
+                bounds.append((forward, forward[target], 1))
+            if backward[target] < INF:
+                bounds.append((backward, backward[target], -1))
+
+        def potential(node):
+            # d(L,t) - d(L,v) and d(v,L) - d(t,L) never overestimate d(v,t) (triangle inequality)
+            best = 0.0
+            for table, at_target, sign in bounds:
+                estimate = (at_target - table[node]) if sign > 0 else (table[node] - at_target)
+                if estimate > best:
+                    best = estimate
+            return best
+        return potential
+
+    def shortest_path(self, source, target):
+        """(metres, seconds) of the fastest path, or None if `target` cannot be reached."""
+        if source == target:
+            return 0.0, 0.0
+        potential = self._potential(target)
+        seconds = {source: 0.0}
+        metres = {source: 0.0}
+        done = set()
+        heap = [(potential(source), source)]
+        while heap:
+            _, u = heapq.heappop(heap)
+            if u == target:
+                return metres[u], seconds[u]
+            if u in done:
+                continue
+            done.add(u)
+            base = seconds[u]
+            for v, edge_metres, edge_seconds in self.edges[u]:
+                if v in done:
+                    continue
+                nd = base + edge_seconds
+                if nd < seconds.get(v, INF):
+                    estimate = potential(v)
+                    if estimate == INF:
+                        continue
+                    seconds[v] = nd
+                    metres[v] = metres[u] + edge_metres
+                    heapq.heappush(heap, (nd + estimate, v))
+        return None
+
+
+def _way_speed_kmh(tags):
+    maxspeed = tags.get('maxspeed', '').split(' ')[0]
+    if maxspeed.isdigit() and int(maxspeed) > 0:
+        return min(int(maxspeed), HIGHWAY_SPEEDS_KMH['motorway'])
+    return HIGHWAY_SPEEDS_KMH[tags['highway']]
+
+
+def _way_direction(tags):
+    """1 one way along the node order, -1 against it, 0 both ways."""
+    oneway = tags.get('oneway', '').lower()
+    if oneway == '-1':
+        return -1
+    if oneway in ONEWAY_YES:
+        return 1
+    if oneway == 'no':
+        return 0
+    if tags['highway'] == 'motorway' or tags.get('junction') == 'roundabout':
+        return 1
+    return 0
+
+
+def _open_extract(path):
+    return gzip.open(path, 'rb') if path.endswith('.gz') else open(path, 'rb')
+
+
+def read_osm(path):
+    """Road nodes and ways of an OSM XML extract: ({osm id: (lat, lng)}, [(node ids, tags)])."""
+    coords = {}
+    ways = []
+    with _open_extract(path) as source:
+        for _, elem in ET.iterparse(source, events=('end',)):
+            if elem.tag == 'node':
+                coords[elem.get('id')] = (float(elem.get('lat')), float(elem.get('lon')))
+            elif elem.tag == 'way':
+                tags = {tag.get('k'): tag.get('v') for tag in elem.iter('tag')}
+                if tags.get('highway') in HIGHWAY_SPEEDS_KMH and tags.get('access') not in ('no', 'private'):
+                    ways.append(([nd.get('ref') for nd in elem.iter('nd')], tags))
+            elif elem.tag != 'relation':
+                continue
+            elem.clear()
+    return coords, ways
+
+
+def _largest_component(node_count, pairs):
+    """Node indexes of the largest weakly connected component (drops islands that snapping could land on)."""
+    parent = list(range(node_count))
+
+    def find(x):
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for u, v in pairs:
+        ru, rv = find(u), find(v)
+        if ru != rv:
+            parent[ru] = rv
+    sizes = defaultdict(int)
+    for node in range(node_count):
+        sizes[find(node)] += 1
+    if not sizes:
+        return set()
+    root = max(sizes, key=sizes.get)
+    return {node for node in range(node_count) if find(node) == root}
+
+
+def compile_graph(osm_path, landmarks=None, snap_cell_deg=None):
+    """Parse an OSM extract into a RoadGraph with landmark tables."""
+    coords, ways = read_osm(osm_path)
+    index = {}
+    segments = []   # (u, v, direction, speed)
+    for refs, tags in ways:
+        refs = [ref for ref in refs if ref in coords]
+        speed = _way_speed_kmh(tags)
+        direction = _way_direction(tags)
+        for a, b in zip(refs, refs[1:]):
+            if a == b:
+                continue
+            u = index.setdefault(a, len(index))
+            v = index.setdefault(b, len(index))
+            segments.append((u, v, direction, speed))
+
+    keep = _largest_component(len(index), ((u, v) for u, v, _, _ in segments))
+    renumber = {}
+    lat, lng = array('d'), array('d')
+    for ref, old in index.items():
+        if old in keep:
+            renumber[old] = len(lat)
+            lat.append(coords[ref][0])
+            lng.append(coords[ref][1])
+
+    edges = [[] for _ in range(len(lat))]
+    for u, v, direction, speed in segments:
+        if u not in keep:
+            continue
+        u, v = renumber[u], renumber[v]
+        metres = haversine_km(lat[u], lng[u], lat[v], lng[v]) * 1000
+        seconds = metres / (speed / 3.6)
+        if direction >= 0:
+            edges[u].append((v, metres, seconds))
+        if direction <= 0:
+            edges[v].append((u, metres, seconds))
+
+    graph = RoadGraph(
+        lat, lng, edges,
+        snap_cell_deg=snap_cell_deg or float(getattr(settings, 'ROUTING_SNAP_CELL_DEG', 0.005)),
+        version=f"{int(time.time())}",
+    )
+    graph.build_landmarks(landmarks or int(getattr(settings, 'ROUTING_LANDMARKS', 8)))
+    return graph
+
+
+def save_graph(graph, path):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as out:
+        pickle.dump((GRAPH_FORMAT, graph), out, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+
+
+def load_graph(path):
+    """RoadGraph from a file written by save_graph(), or None if it is missing or from another format."""
+    try:
+        with open(path, 'rb') as source:
+            graph_format, graph = pickle.load(source)
+    except (OSError, EOFError, pickle.UnpicklingError, ValueError):
+        return None
+    return graph if graph_format == GRAPH_FORMAT else None
+
+
+_graph = None
+_graph_loaded = False
+_graph_lock = threading.Lock()
+_routes = OrderedDict()
+_routes_lock = threading.Lock()
+
+
+def get_graph():
+    """The process-wide RoadGraph, loaded on first use; None when routing is not configured."""
+    global _graph, _graph_loaded
+    if _graph_loaded:
+        return _graph
+    with _graph_lock:
+        if not _graph_loaded:
+            path = getattr(settings, 'ROUTING_GRAPH_PATH', '')
+            _graph = load_graph(path) if path else None
+            if path and _graph is None:
+                print(f"[ROUTING] No road graph at {path}; run `python manage.py build_road_graph`. Using client route values.")
+            _graph_loaded = True
+    return _graph
+
+
+def is_enabled():
+    return get_graph() is not None
+
+
+def get_cache_cell_deg() -> float:
+    return float(getattr(settings, 'ROUTING_CACHE_CELL_DEG', 0.002))
+
+
+def _cell_center(cell, size):
+    return (cell[0] + 0.5) * size, (cell[1] + 0.5) * size
+
+
+def _compute(graph, origin_cell, dest_cell, size):
+    max_snap_km = float(getattr(settings, 'ROUTING_MAX_SNAP_KM', 0.5))
+    source = graph.nearest_node(*_cell_center(origin_cell, size), max_km=max_snap_km)
+    target = graph.nearest_node(*_cell_center(dest_cell, size), max_km=max_snap_km)
+    if source is None or target is None:
+        return None
+    path = graph.shortest_path(source, target)
+    if path is None:
+        return None
+    metres, seconds = path
+    return Route(
+        distance_km=Decimal(metres / 1000).quantize(Decimal('0.01')),
+        duration_min=Decimal(seconds / 60).quantize(Decimal('0.1')),
+    )
+
+
+def route(pickup_lat, pickup_lng, drop_lat, drop_lng):
+    """
+    Route between two points from the road graph, or None when routing is
+    not configured or no road path is found near them.
+    """
+    graph = get_graph()
+    if graph is None:
+        return None
+    size = get_cache_cell_deg()
+    key = (cell_for(pickup_lat, pickup_lng, size), cell_for(drop_lat, drop_lng, size))
+
+    with _routes_lock:
+        if key in _routes:
+            _routes.move_to_end(key)
+            return _routes[key]
+
+    cache_key = f"routing:{graph.version}:{size}:{key[0][0]}:{key[0][1]}:{key[1][0]}:{key[1][1]}"
+    cached = cache.get(cache_key)
+    if cached is not None:
+        result = Route(Decimal(cached[0]), Decimal(cached[1])) if cached else None
+    else:
+        result = _compute(graph, key[0], key[1], size)
+        stored = (str(result.distance_km), str(result.duration_min)) if result else ()
+        cache.set(cache_key, stored, getattr(settings, 'ROUTING_CACHE_TTL_SECONDS', 60 * 60 * 24))
+
+    with _routes_lock:
+        _routes[key] = result
+        if len(_routes) > int(getattr(settings, 'ROUTING_LOCAL_CACHE_SIZE', 10000)):
+            _routes.popitem(last=False)
+    return result
+
+
+def eta_matrix(origins, dest_lat, dest_lng):
+    """
+    Road travel seconds from each origin ({key: (lat, lng)}, e.g. candidate
+    drivers) to one destination, from one batched search. Origins that are
+    off the road graph or more than ROUTING_ETA_MAX_SECONDS away are left
+    out. None when routing is not configured or the destination is not
+    near a road.
+    """
+    graph = get_graph()
+    if graph is None:
+        return None
+    max_snap_km = float(getattr(settings, 'ROUTING_MAX_SNAP_KM', 0.5))
+    target = graph.nearest_node(float(dest_lat), float(dest_lng), max_km=max_snap_km)
+    if target is None:
+        return None
+    nodes = {}
+    for key, (lat, lng) in origins.items():
+        node = graph.nearest_node(float(lat), float(lng), max_km=max_snap_km)
+        if node is not None:
+            nodes.setdefault(node, []).append(key)
+    seconds = graph.travel_times_to(
+        target, nodes, max_seconds=float(getattr(settings, 'ROUTING_ETA_MAX_SECONDS', 45 * 60)),
+    )
+    return {key: eta for node, eta in seconds.items() for key in nodes[node]}
+
+
+def trip_metrics(pickup_lat, pickup_lng, drop_lat, drop_lng, client_distance=None, client_duration=None):
+    """
+    (distance_km, duration_min) to quote a trip on. With a road graph loaded
+    this is always the server route (None, None if it cannot be routed), and
+    the client's values are ignored; without one, the client's values.
+    """
+    if not is_enabled():
+        return client_distance, client_duration
+    try:
+        points = [float(value) for value in (pickup_lat, pickup_lng, drop_lat, drop_lng)]
+    except (TypeError, ValueError):
+        return None, None
+    if not all(math.isfinite(value) for value in points):
+        return None, None
+    result = route(*points)
+    if result is None:
+        return None, None
+    return result.distance_km, result.duration_min
@@ -0,0 +1,159 @@
+"""
+Pre-booked (scheduled) rides.
+
+A ride booked further ahead than DISPATCH_SCHEDULED_LEAD_SECONDS is stored as
+a RideRequest with status 'Scheduled' and no driver. The
+dispatch_scheduled_rides command releases each one into normal dispatch once
+its pickup time comes within the lead time, reading them in pickup order off
+the (status, scheduled_time) index. No driver is tied up hours ahead, and
+releases are spread over the day instead of happening at booking time. A
+ride that finds no driver is not retried for DISPATCH_SCHEDULED_RETRY_SECONDS,
+so a backlog of unmatched rides cannot fill every batch and hold back the
+rides behind them.
+forecast_driver_demand() reports how many drivers the scheduled rides will
+need per time slot.
+"""
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from booking.models import RideRequest
+from driver.models import Driver
+from notifications.events import publish_ride_status
+
+from .queue import get_queue_store
+from .services import start_dispatch
+
+DEFAULT_DURATION_MIN = 30  # for rides booked without an estimated duration
+
+
+def get_lead_seconds() -> int:
+    return int(getattr(settings, "DISPATCH_SCHEDULED_LEAD_SECONDS", 20 * 60))
+
+
+def get_retry_seconds() -> int:
+    return int(getattr(settings, "DISPATCH_SCHEDULED_RETRY_SECONDS", 2 * 60))
+
+
+def is_prebooked(pickup_time, now=None):
+    """True if a ride picking up at `pickup_time` should wait in the scheduler instead of dispatching now."""
+    if pickup_time is None:
+        return False
+    return pickup_time - (now or timezone.now()) > timedelta(seconds=get_lead_seconds())
+
+
+def overlapping_scheduled_ride(user, pickup_time, duration_min=None):
+    """The user's held ride whose trip would overlap one picking up at `pickup_time`, if any."""
+    finish = pickup_time + timedelta(minutes=duration_min or DEFAULT_DURATION_MIN)
+    for ride_request in RideRequest.objects.filter(user=user, status='Scheduled', scheduled_time__lt=finish):
+        held_finish = ride_request.scheduled_time + timedelta(minutes=ride_request.duration_min or DEFAULT_DURATION_MIN)
+        if held_finish > pickup_time:
+            return ride_request
+    return None
+
+
+def release_ride(ride_request_id, now=None):
+    """
+    Hand one scheduled ride to dispatch and return the drivers offered. With
+    nobody available it stays scheduled and is retried after
+    DISPATCH_SCHEDULED_RETRY_SECONDS, and expires once its pickup time has passed.
+    """
+    now = now or timezone.now()
+    with transaction.atomic():
+        ride_request = (
+            RideRequest.objects
+            .select_for_update()
+            .select_related('service_type')
+            .filter(id=ride_request_id, status='Scheduled')
+            .first()
+        )
+        if ride_request is None:
+            return []
+
+        ride_request.status = 'Requested'
+        ride_request.save(update_fields=['status'])
+        drivers = start_dispatch(ride_request)
+        if drivers:
+            publish_ride_status(ride_request, user_id=ride_request.user_id)
+            return drivers
+
+        get_queue_store().delete(ride_request.id)
+        expired = ride_request.scheduled_time is None or ride_request.scheduled_time <= now
+        ride_request.status = 'Expired' if expired else 'Scheduled'
+        ride_request.next_attempt_at = None if expired else now + timedelta(seconds=get_retry_seconds())
+        ride_request.save(update_fields=['status', 'next_attempt_at'])
+        if expired:
+            publish_ride_status(ride_request, user_id=ride_request.user_id)
+    return []
+
+
+def release_due(now=None, limit=None):
+    """
+    Release scheduled rides whose pickup is within the lead time, earliest
+    first, at most `limit` (default DISPATCH_SCHEDULED_BATCH_SIZE) per call.
+    Rides still backing off after finding no driver are skipped.
+    Returns (rides released, rides still waiting for a driver).
+    """
+    now = now or timezone.now()
+    limit = limit or int(getattr(settings, "DISPATCH_SCHEDULED_BATCH_SIZE", 50))
+    due_ids = list(
+        RideRequest.objects
+        .filter(status='Scheduled', scheduled_time__lte=now + timedelta(seconds=get_lead_seconds()))
+        .filter(Q(next_attempt_at__isnull=True) | Q(next_attempt_at__lte=now))
+        .order_by('scheduled_time')
+        .values_list('id', flat=True)[:limit]
+    )
+    released = sum(1 for ride_request_id in due_ids if release_ride(ride_request_id, now=now))
+    return released, len(due_ids) - released
+
+
+def forecast_driver_demand(start=None, hours=24, slot_minutes=None):
+    """
+    Drivers needed per time slot and service type for the scheduled rides
+    picking up in the next `hours`. A ride keeps a driver busy from its pickup
+    until its estimated duration is over, so it counts in every slot it
+    overlaps. Returns rows ordered by slot, with the number of active drivers
+    registered for the service type alongside.
+    """
+    slot = timedelta(minutes=slot_minutes or int(getattr(settings, "DISPATCH_FORECAST_SLOT_MINUTES", 30)))
+    epoch = int((start or timezone.now()).timestamp())
+    start = datetime.fromtimestamp(epoch - epoch % int(slot.total_seconds()), tz=dt_timezone.utc)
+    end = start + timedelta(hours=hours)
+
+    rides = (
+        RideRequest.objects
+        .filter(status='Scheduled', scheduled_time__gte=start, scheduled_time__lt=end)
+        .values_list('scheduled_time', 'duration_min', 'service_type__name')
+    )
+    needed = defaultdict(int)   # (slot index, service) -> overlapping rides
+    pickups = defaultdict(int)  # (slot index, service) -> rides picking up in the slot
+    slots = int((end - start) / slot)
+    for pickup, duration_min, service in rides:
+        service = service or ''
+        first = int((pickup - start) / slot)
+        finish = pickup + timedelta(minutes=duration_min or DEFAULT_DURATION_MIN)
+        last = min(int((finish - start) / slot), slots - 1)
+        pickups[(first, service)] += 1
+        for index in range(first, last + 1):
+            needed[(index, service)] += 1
+
+    registered = dict(
+        Driver.objects
+        .filter(status='Active', is_deleted=False, service_type__isnull=False)
+        .values_list('service_type__name')
+        .annotate(n=Count('driver_id'))
+    )
+    return [
+        {
+            'slot_start': timezone.localtime(start + index * slot).isoformat(),
+            'service_type': service,
+            'pickups': pickups.get((index, service), 0),
+            'drivers_needed': n,
+            'drivers_registered': registered.get(service, 0),
+        }
+        for (index, service), n in sorted(needed.items())
+    ]
@@ -0,0 +1,269 @@
+import random
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from booking.models import RideRequest
+from driver.models import Driver
+from notifications.events import publish_ride_status
+
+from .index import get_driver_locations, nearest_drivers
+from .models import RideOffer
+from .queue import get_queue_store
+from .routing import eta_matrix, is_enabled as routing_enabled
+
+
+def _rating_ordered_ids(drivers):
+    # Group drivers by rating, shuffle within each rating, then flatten
+    rating_to_drivers = defaultdict(list)
+    for d in drivers:
+        rating_to_drivers[float(d.rating or 0.0)].append(d)
+
+    candidate_ids = []
+    for rating in sorted(rating_to_drivers.keys(), reverse=True):
+        group = rating_to_drivers[rating]
+        random.shuffle(group)
+        candidate_ids.extend(d.driver_id for d in group)
+    return candidate_ids
+
+
+def rank_by_eta(driver_ids, pickup_lat, pickup_lng):
+    """
+    Reorder candidate driver ids by road travel time to the pickup (see
+    routing.eta_matrix), compared in whole minutes so ties keep the current
+    order. Drivers with no fresh position or no road path follow in their
+    current order. Unchanged when no road graph is configured.
+    """
+    if not driver_ids or pickup_lat is None or pickup_lng is None or not routing_enabled():
+        return driver_ids
+    locations = get_driver_locations(driver_ids)
+    etas = eta_matrix({d: locations[d][:2] for d in driver_ids if d in locations}, pickup_lat, pickup_lng)
+    if not etas:
+        return driver_ids
+    return sorted(driver_ids, key=lambda d: (0, round(etas[d] / 60)) if d in etas else (1, 0))
+
+
+def build_candidate_queue(matching_drivers, vehicle_type, pickup_lat, pickup_lng):
+    """
+    Order candidate driver ids for a ride request: the K nearest by straight
+    line are ranked by road ETA to the pickup, then distance, with rating as
+    the last key. Distances are compared in 100 m steps so a better rated driver
+    wins over one that is only a few metres closer. Matching drivers without
+    a recent position follow in rating order, so they are still offered the
+    ride once the nearby ones have passed on it.
+    """
+    nearby = dict(nearest_drivers(vehicle_type, pickup_lat, pickup_lng))
+    if nearby:
+        drivers = list(
+            matching_drivers
+            .filter(driver_id__in=list(nearby.keys()))
+            .only('driver_id', 'rating')
+        )
+        if drivers:
+            drivers.sort(key=lambda d: (round(nearby[d.driver_id], 1), -float(d.rating or 0.0)))
+            ranked = rank_by_eta([d.driver_id for d in drivers], pickup_lat, pickup_lng)
+            queued = set(ranked)
+            return ranked + [d for d in _rating_ordered_ids(matching_drivers) if d not in queued]
+
+    return _rating_ordered_ids(matching_drivers)
+
+
+def rerank_queue(ride_request):
+    """Re-sort the drivers left in a ride request's queue by their current ETA to the pickup."""
+    store = get_queue_store()
+    driver_ids = store.get(ride_request.id)
+    ranked = rank_by_eta(driver_ids, ride_request.pickup_latitude, ride_request.pickup_longitude)
+    if ranked != driver_ids:
+        store.set(ride_request.id, ranked)
+
+
+def available_drivers(service_type_id):
+    """Drivers who can be offered rides of a service type right now."""
+    return Driver.objects.filter(
+        service_type_id=service_type_id,
+        availability=True,
+        status='Active',
+        is_deleted=False,
+    )
+
+
+def start_dispatch(ride_request, matching_drivers=None):
+    """
+    Build the candidate queue of a ride request from `matching_drivers`
+    (default: everyone available for its service type) and make its first
+    offer(s). Returns the drivers offered.
+    """
+    if matching_drivers is None:
+        matching_drivers = available_drivers(ride_request.service_type_id)
+    vehicle_type = ride_request.service_type.name if ride_request.service_type else ''
+    candidate_ids = build_candidate_queue(
+        matching_drivers,
+        vehicle_type,
+        ride_request.pickup_latitude,
+        ride_request.pickup_longitude,
+    )
+    get_queue_store().set(ride_request.id, candidate_ids)
+    return offer_ride(ride_request)
+
+
+def _is_dispatchable(driver_id):
+    return Driver.objects.filter(
+        driver_id=driver_id,
+        availability=True,
+        status='Active',
+        is_deleted=False,
+    ).exists()
+
+
+def pop_next_driver(ride_request_id, exclude_driver_id=None):
+    """
+    Take the next available driver off the shared queue of a ride request.
+    Returns the Driver, or None once the queue is exhausted.
+    """
+    store = get_queue_store()
+    if exclude_driver_id is not None:
+        store.discard(ride_request_id, exclude_driver_id)
+    driver_id = store.pop_next(ride_request_id, is_eligible=_is_dispatchable)
+    if driver_id is None:
+        return None
+    return Driver.objects.filter(driver_id=driver_id).first()
+
+
+def get_offer_timeout() -> int:
+    return int(getattr(settings, "DISPATCH_OFFER_TIMEOUT_SECONDS", 120))
+
+
+def is_broadcast() -> bool:
+    return getattr(settings, "DISPATCH_MODE", "sequential") == "broadcast"
+
+
+def get_broadcast_size() -> int:
+    return max(int(getattr(settings, "DISPATCH_BROADCAST_SIZE", 3)), 1)
+
+
+def offer_deadline(ride_request):
+    """When the current offer lapses, or None if the ride has not been offered to anyone."""
+    if not ride_request.offered_at:
+        return None
+    return ride_request.offered_at + timedelta(seconds=get_offer_timeout())
+
+
+def offered_to(driver_id):
+    """Q matching ride requests offered to a driver, directly or as one of a broadcast."""
+    broadcast_ids = RideOffer.objects.filter(driver_id=driver_id, status='Offered').values('ride_request_id')
+    return Q(driver_id=driver_id) | Q(id__in=broadcast_ids)
+
+
+def offer_ride(ride_request, exclude_driver_id=None):
+    """
+    Offer `ride_request` to the next driver in its queue, or to the next
+    DISPATCH_BROADCAST_SIZE drivers in broadcast mode, and notify them.
+    Saves the ride request's driver/offered_at and returns the drivers offered
+    (empty once the queue is exhausted).
+    """
+    now = timezone.now()
+    if is_broadcast():
+        drivers = []
+        for _ in range(get_broadcast_size()):
+            driver = pop_next_driver(ride_request.id, exclude_driver_id=exclude_driver_id)
+            if driver is None:
+                break
+            drivers.append(driver)
+        RideOffer.objects.bulk_create(
+            [RideOffer(ride_request=ride_request, driver=driver, offered_at=now) for driver in drivers],
+            ignore_conflicts=True,
+        )
+        ride_request.driver = None
+    else:
+        driver = pop_next_driver(ride_request.id, exclude_driver_id=exclude_driver_id)
+        drivers = [driver] if driver else []
+        ride_request.driver = driver
+
+    ride_request.offered_at = now if drivers else None
+    ride_request.save(update_fields=['driver', 'offered_at'])
+    for driver in drivers:
+        publish_ride_status(ride_request, status='Requested', driver_id=driver.driver_id)
+        print(
+            f"[DEBUG][ride_dispatch] RideRequest {ride_request.id} "
+            f"sent to Driver ID={driver.driver_id}, "
+            f"VehicleType={driver.vehicle_type}, "
+            f"Status={driver.status}, "
+            f"Timestamp={now.isoformat()}"
+        )
+    return drivers
+
+
+def retract_offers(ride_request, status='Retracted', keep_driver_id=None):
+    """
+    Close the open broadcast offers of `ride_request` (except `keep_driver_id`'s)
+    and withdraw the ride from those drivers' screens.
+    """
+    offers = RideOffer.objects.filter(ride_request=ride_request, status='Offered')
+    if keep_driver_id is not None:
+        offers = offers.exclude(driver_id=keep_driver_id)
+    driver_ids = list(offers.values_list('driver_id', flat=True))
+    if driver_ids:
+        offers.filter(driver_id__in=driver_ids).update(status=status, responded_at=timezone.now())
+        for driver_id in driver_ids:
+            publish_ride_status(ride_request, status='Reassigned', driver_id=driver_id)
+    return driver_ids
+
+
+def decline_offer(ride_request_id, driver_id):
+    """
+    Record a driver declining a broadcast offer. Returns True if it was one;
+    the ride moves on at once when nobody it is offered to is left.
+    """
+    offers = RideOffer.objects.filter(ride_request_id=ride_request_id, driver_id=driver_id, status='Offered')
+    offered_at = offers.values_list('offered_at', flat=True).first()
+    if offered_at is None or not offers.update(status='Declined', responded_at=timezone.now()):
+        return False
+    if not RideOffer.objects.filter(ride_request_id=ride_request_id, status='Offered').exists():
+        advance_ride_request(ride_request_id, expected_offered_at=offered_at)
+    return True
+
+
+def advance_ride_request(ride_request_id, expected_driver_id=None, expected_offered_at=None):
+    """
+    Offer a pending ride request to the next driver(s) in its queue, or expire
+    it when the queue is exhausted. The ride request row is locked so the web
+    reassign trigger and the dispatcher cannot both advance the same offer.
+    When `expected_driver_id` or `expected_offered_at` is given and the ride
+    has meanwhile been offered to someone else, nothing is changed.
+    Returns (ride_request, drivers offered); ride_request is None if it no
+    longer needs dispatching.
+    """
+    with transaction.atomic():
+        ride_request = (
+            RideRequest.objects
+            .select_for_update()
+            .filter(id=ride_request_id, status='Requested', booking__isnull=True)
+            .first()
+        )
+        if ride_request is None:
+            return None, []
+        if (
+            (expected_driver_id is not None and ride_request.driver_id != expected_driver_id)
+            or (expected_offered_at is not None and ride_request.offered_at != expected_offered_at)
+        ):
+            return ride_request, [ride_request.driver] if ride_request.driver else []
+
+        previous_driver_id = ride_request.driver_id
+        # Withdraw the lapsed offer(s) from the previous drivers' screens
+        retract_offers(ride_request)
+        if previous_driver_id:
+            publish_ride_status(ride_request, status='Reassigned', driver_id=previous_driver_id)
+
+        # Drivers have moved since the queue was built
+        rerank_queue(ride_request)
+        drivers = offer_ride(ride_request, exclude_driver_id=previous_driver_id)
+        if not drivers:
+            ride_request.status = 'Expired'
+            ride_request.save(update_fields=['status'])
+            get_queue_store().delete(ride_request.id)
+            publish_ride_status(ride_request, user_id=ride_request.user_id)
+    return ride_request, drivers
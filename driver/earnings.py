@@ -0,0 +1,130 @@
+"""
+Driver earnings and the denormalised DriverStats record.
+
+Earnings come from the payments ledger (payments.ledger). record_booking_status()
+keeps DriverStats in step with booking status changes and must be called
+inside the transaction that saves the booking; rebuild_driver_stats()
+recomputes a record from scratch.
+"""
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+from django.utils.timezone import localtime
+
+from booking.models import Booking
+from payments.models import EarningsEntry
+from .models import DriverStats
+
+CANCELLED_STATUSES = ('Cancelled', 'CancelledByDriver', 'CancelledByPassenger')
+ZERO = Decimal('0.00')
+
+
+def local_midnight(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def period_starts(today=None):
+    """(today, start of week, start of month) in local time."""
+    today = today or localtime().date()
+    return today, today - timedelta(days=today.weekday()), today.replace(day=1)
+
+
+def _bucket(status):
+    if status == 'Completed':
+        return 'completed_rides'
+    if status in CANCELLED_STATUSES:
+        return 'cancelled_rides'
+    if status == 'Confirmed':
+        return 'scheduled_rides'
+    return None
+
+
+def _add_earning(stats, amount, ride_date, today=None):
+    today, week_start, month_start = period_starts(today)
+    stats.earnings_total += amount
+    for field, start in (('earnings_today', today), ('earnings_week', week_start), ('earnings_month', month_start)):
+        if ride_date < start:
+            continue
+        if getattr(stats, f'{field}_date') != start:
+            setattr(stats, field, ZERO)
+            setattr(stats, f'{field}_date', start)
+        setattr(stats, field, getattr(stats, field) + amount)
+
+
+def rebuild_driver_stats(driver_id):
+    """Recompute a driver's stats from their bookings and earnings entries."""
+    today, week_start, month_start = period_starts()
+    counts = Booking.objects.filter(driver_id=driver_id).aggregate(
+        total=Count('booking_id'),
+        completed=Count('booking_id', filter=Q(status='Completed')),
+        cancelled=Count('booking_id', filter=Q(status__in=CANCELLED_STATUSES)),
+        scheduled=Count('booking_id', filter=Q(status='Confirmed')),
+    )
+    stats = DriverStats(
+        driver_id=driver_id,
+        total_rides=counts['total'],
+        completed_rides=counts['completed'],
+        cancelled_rides=counts['cancelled'],
+        scheduled_rides=counts['scheduled'],
+        earnings_today_date=today,
+        earnings_week_date=week_start,
+        earnings_month_date=month_start,
+    )
+    earnings = EarningsEntry.objects.filter(driver_id=driver_id).aggregate(
+        total=Sum('driver_earning'),
+        today=Sum('driver_earning', filter=Q(ride_time__gte=local_midnight(today))),
+        week=Sum('driver_earning', filter=Q(ride_time__gte=local_midnight(week_start))),
+        month=Sum('driver_earning', filter=Q(ride_time__gte=local_midnight(month_start))),
+    )
+    stats.earnings_total = earnings['total'] or ZERO
+    stats.earnings_today = earnings['today'] or ZERO
+    stats.earnings_week = earnings['week'] or ZERO
+    stats.earnings_month = earnings['month'] or ZERO
+    stats.save()
+    return stats
+
+
+def record_booking_status(booking, old_status, new_status, driver_id=None):
+    """
+    Apply one booking status change to the driver's stats. `old_status` None
+    means the booking was just assigned to the driver; `new_status` None means
+    the driver was unassigned from it.
+    """
+    driver_id = driver_id or booking.driver_id
+    if not driver_id or old_status == new_status:
+        return
+    with transaction.atomic():
+        stats = DriverStats.objects.select_for_update().filter(driver_id=driver_id).first()
+        if stats is None:
+            # First change for this driver: the booking is already saved, so a rebuild includes it
+            rebuild_driver_stats(driver_id)
+            return
+
+        if old_status is None:
+            stats.total_rides += 1
+        if new_status is None:
+            stats.total_rides -= 1
+        for status, delta in ((old_status, -1), (new_status, 1)):
+            field = _bucket(status)
+            if field:
+                setattr(stats, field, getattr(stats, field) + delta)
+
+        if new_status == 'Completed':
+            # The ledger entry is written first, in the same transaction (see end_ride_view)
+            entry = EarningsEntry.objects.filter(booking=booking).first()
+            if entry is not None:
+                _add_earning(stats, entry.driver_earning, localtime(entry.ride_time).date())
+        stats.save()
+
+
+def get_driver_stats(driver):
+    """The driver's stats record, created on first use, with stale period earnings zeroed."""
+    stats = DriverStats.objects.filter(driver=driver).first() or rebuild_driver_stats(driver.driver_id)
+    today, week_start, month_start = period_starts()
+    for field, start in (('earnings_today', today), ('earnings_week', week_start), ('earnings_month', month_start)):
+        if getattr(stats, f'{field}_date') != start:
+            setattr(stats, field, ZERO)
+    return stats
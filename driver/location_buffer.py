@@ -0,0 +1,162 @@
+"""
+Per-process write buffer for driver GPS pings.
+
+Live positions go straight to the dispatch index (cache). The database only
+receives a down-sampled trail plus each driver's last position, and both are
+written in bulk once the buffer is large or old enough, instead of one ORM
+save() per ping.
+"""
+import atexit
+import logging
+import math
+import threading
+import time
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+
+from dispatch.geo import haversine_km
+from dispatch.index import update_driver_location, remove_driver_location
+from .models import Driver, DriverLocationTrail
+
+logger = logging.getLogger(__name__)
+
+TRAIL_LAST_KEY = "driver:{driver_id}:trail_last"
+COORD_QUANT = Decimal('0.000001')
+
+_lock = threading.Lock()
+_pending_trail = []
+_pending_latest = {}
+_last_flush = time.monotonic()
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def parse_points(raw_points, now=None):
+    """
+    Validate raw pings ({lat, lng, ts}) and return (lat, lng, epoch_seconds)
+    tuples sorted by time. `ts` may be epoch milliseconds or seconds; pings
+    without one are stamped with the server time. Invalid pings are dropped.
+    """
+    now = now or time.time()
+    max_age = _setting('DRIVER_LOCATION_MAX_PING_AGE_SECONDS', 3600)
+    points = []
+    for raw in raw_points or []:
+        try:
+            lat = Decimal(str(raw['lat'])).quantize(COORD_QUANT)
+            lng = Decimal(str(raw['lng'])).quantize(COORD_QUANT)
+            ts = raw.get('ts')
+            ts = float(ts) if ts not in (None, '') else now
+            if not (lat.is_finite() and lng.is_finite() and math.isfinite(ts)):
+                continue
+            if not (Decimal('-90') <= lat <= Decimal('90') and Decimal('-180') <= lng <= Decimal('180')):
+                continue
+        except Exception:
+            continue
+        if ts > 1e11:
+            ts = ts / 1000.0
+        if ts > now + 60 or ts < now - max_age:
+            continue
+        points.append((lat, lng, ts))
+    points.sort(key=lambda p: p[2])
+    return points
+
+
+def _downsample(driver_id, points):
+    """Keep a ping only if enough time or distance separates it from the last kept one."""
+    min_interval = _setting('DRIVER_TRAIL_MIN_INTERVAL_SECONDS', 15)
+    min_distance_km = _setting('DRIVER_TRAIL_MIN_DISTANCE_M', 50) / 1000.0
+    last_key = TRAIL_LAST_KEY.format(driver_id=driver_id)
+    last = cache.get(last_key)
+
+    kept = []
+    for lat, lng, ts in points:
+        if last is not None:
+            too_soon = ts - last[2] < min_interval
+            too_close = haversine_km(last[0], last[1], lat, lng) < min_distance_km
+            if too_soon and too_close:
+                continue
+        kept.append((lat, lng, ts))
+        last = (lat, lng, ts)
+
+    if kept:
+        cache.set(last_key, kept[-1], timeout=60 * 60)
+    return kept
+
+
+def record_pings(driver, points):
+    """
+    Ingest a sorted batch of pings for one driver: update the live index with
+    the newest point and queue the down-sampled trail for the next bulk flush.
+    Returns the number of trail points kept.
+    """
+    if not points:
+        return 0
+
+    lat, lng, ts = points[-1]
+    if driver.availability:
+        update_driver_location(driver.driver_id, driver.vehicle_type, lat, lng, timestamp=ts)
+    else:
+        remove_driver_location(driver.driver_id)
+
+    kept = _downsample(driver.driver_id, points)
+    with _lock:
+        for k_lat, k_lng, k_ts in kept:
+            _pending_trail.append(DriverLocationTrail(
+                driver_id=driver.driver_id,
+                latitude=k_lat,
+                longitude=k_lng,
+                recorded_at=datetime.fromtimestamp(k_ts, tz=dt_timezone.utc),
+            ))
+        previous = _pending_latest.get(driver.driver_id)
+        if previous is None or previous[2] <= ts:
+            _pending_latest[driver.driver_id] = (lat, lng, ts)
+        should_flush = (
+            len(_pending_trail) >= _setting('DRIVER_LOCATION_FLUSH_SIZE', 500)
+            or time.monotonic() - _last_flush >= _setting('DRIVER_LOCATION_FLUSH_SECONDS', 10)
+        )
+
+    if should_flush:
+        flush()
+    return len(kept)
+
+
+def flush():
+    """Write buffered trail points and latest positions with one bulk insert and one bulk update."""
+    global _pending_trail, _pending_latest, _last_flush
+    with _lock:
+        trail, latest = _pending_trail, _pending_latest
+        _pending_trail, _pending_latest = [], {}
+        _last_flush = time.monotonic()
+
+    if not trail and not latest:
+        return
+
+    try:
+        if trail:
+            DriverLocationTrail.objects.bulk_create(trail, batch_size=500)
+        if latest:
+            drivers = [
+                Driver(
+                    driver_id=driver_id,
+                    current_latitude=lat,
+                    current_longitude=lng,
+                    location_updated_at=datetime.fromtimestamp(ts, tz=dt_timezone.utc),
+                )
+                for driver_id, (lat, lng, ts) in latest.items()
+            ]
+            Driver.objects.bulk_update(
+                drivers,
+                ['current_latitude', 'current_longitude', 'location_updated_at'],
+                batch_size=500,
+            )
+    except Exception:
+        # Trail data is best-effort; live positions are already in the dispatch index.
+        logger.exception("Failed to flush %s trail points / %s driver positions", len(trail), len(latest))
+
+
+atexit.register(flush)
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from driver.earnings import rebuild_driver_stats
+from driver.models import Driver
+
+
+class Command(BaseCommand):
+    help = "Recompute DriverStats from bookings (all drivers, or the given driver ids)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('driver_ids', nargs='*', type=int, help='Only rebuild these drivers.')
+
+    def handle(self, *args, **options):
+        drivers = Driver.objects.all()
+        if options['driver_ids']:
+            drivers = drivers.filter(driver_id__in=options['driver_ids'])
+
+        count = 0
+        for driver_id in drivers.values_list('driver_id', flat=True).iterator():
+            rebuild_driver_stats(driver_id)
+            count += 1
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt stats for {count} driver(s)."))
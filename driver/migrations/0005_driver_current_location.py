@@ -0,0 +1,28 @@
+# Generated by Django 5.2.4 on 2026-10-18 17:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('driver', '0004_alter_driver_phone'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='driver',
+            name='current_latitude',
+            field=models.DecimalField(blank=True, decimal_places=6, max_digits=9, null=True),
+        ),
+        migrations.AddField(
+            model_name='driver',
+            name='current_longitude',
+            field=models.DecimalField(blank=True, decimal_places=6, max_digits=9, null=True),
+        ),
+        migrations.AddField(
+            model_name='driver',
+            name='location_updated_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
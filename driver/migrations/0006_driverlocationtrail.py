@@ -0,0 +1,27 @@
+# Generated by Django 5.2.4 on 2026-10-18 17:09
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('driver', '0005_driver_current_location'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DriverLocationTrail',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('latitude', models.DecimalField(decimal_places=6, max_digits=9)),
+                ('longitude', models.DecimalField(decimal_places=6, max_digits=9)),
+                ('recorded_at', models.DateTimeField()),
+                ('driver', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='location_trail', to='driver.driver')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['driver', 'recorded_at'], name='driver_driv_driver__1dff00_idx')],
+            },
+        ),
+    ]
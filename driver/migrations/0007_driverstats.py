@@ -0,0 +1,32 @@
+# Generated by Django 5.2.4 on 2026-10-18 17:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('driver', '0006_driverlocationtrail'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DriverStats',
+            fields=[
+                ('driver', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='driver.driver')),
+                ('total_rides', models.IntegerField(default=0)),
+                ('completed_rides', models.IntegerField(default=0)),
+                ('cancelled_rides', models.IntegerField(default=0)),
+                ('scheduled_rides', models.IntegerField(default=0)),
+                ('earnings_total', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('earnings_today', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('earnings_today_date', models.DateField(blank=True, null=True)),
+                ('earnings_week', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('earnings_week_date', models.DateField(blank=True, null=True)),
+                ('earnings_month', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('earnings_month_date', models.DateField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.4 on 2026-10-18 17:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('driver', '0007_driverstats'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='driver',
+            index=models.Index(fields=['availability', 'status', 'is_deleted', 'vehicle_type'], name='driver_driv_availab_913799_idx'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.4 on 2026-10-18 17:32
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def link_service_types(apps, schema_editor):
+    # Same comparison as Driver.save(): both names trimmed, case-insensitive
+    Driver = apps.get_model('driver', 'Driver')
+    ServiceType = apps.get_model('services', 'ServiceType')
+    services = {}
+    for service in ServiceType.objects.exclude(name__isnull=True).order_by('pk'):
+        services.setdefault(service.name.strip().lower(), service.pk)
+    drivers = Driver.objects.filter(service_type__isnull=True).exclude(vehicle_type__isnull=True)
+    for driver_id, vehicle_type in drivers.values_list('driver_id', 'vehicle_type').iterator():
+        service_id = services.get(vehicle_type.strip().lower())
+        if service_id:
+            Driver.objects.filter(driver_id=driver_id).update(service_type_id=service_id)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('driver', '0008_driver_matching_index'),
+        ('services', '0004_remove_fareslab_booking_fee'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='driver',
+            name='driver_driv_availab_913799_idx',
+        ),
+        migrations.AddField(
+            model_name='driver',
+            name='service_type',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='drivers', to='services.servicetype'),
+        ),
+        migrations.RunPython(link_service_types, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='driver',
+            index=models.Index(fields=['service_type', 'availability', 'status', 'is_deleted'], name='driver_driv_service_986b5e_idx'),
+        ),
+    ]
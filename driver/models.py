@@ -2,6 +2,23 @@
 from django.db import models
 from django.utils import timezone
 from config.validators import mobile_number_validator
+from services.models import ServiceType
+
+def normalize_service_name(value):
+    """How Driver.vehicle_type and ServiceType.name are compared: trimmed, case-insensitive."""
+    return (value or '').strip().lower()
+
+
+def service_type_for(vehicle_type):
+    """The ServiceType a driver's vehicle_type names, or None."""
+    name = normalize_service_name(vehicle_type)
+    if not name:
+        return None
+    for service in ServiceType.objects.filter(name__icontains=name):
+        if normalize_service_name(service.name) == name:
+            return service
+    return None
+
 
 class Driver(models.Model):
     driver_id = models.AutoField(primary_key=True)
@@ -21,6 +38,11 @@ class Driver(models.Model):
     first_name = models.CharField(max_length=100, blank=True, null=True)
     last_name = models.CharField(max_length=100, blank=True, null=True)
     vehicle_type = models.CharField(max_length=50, blank=True, null=True)
+    # ServiceType named by vehicle_type, resolved on save; matching filters on this
+    service_type = models.ForeignKey(
+        ServiceType, on_delete=models.SET_NULL, null=True, blank=True,
+        editable=False, related_name='drivers',
+    )
     email = models.CharField(unique=True, max_length=150)  # NOT NULL in DB
     phone = models.CharField(unique=True, max_length=15, validators=[mobile_number_validator])   # NOT NULL in DB
     gender = models.CharField(max_length=6, choices=GENDER_CHOICES, blank=True, null=True)  # ENUM in DB
@@ -37,7 +59,12 @@ class Driver(models.Model):
     # Address and Availability
     full_address = models.TextField(blank=True, null=True)
     availability = models.BooleanField(default=True, null=True, blank=True)  # tinyint(1) in MySQL
-    
+
+    # Last reported position (live positions are served from dispatch.index)
+    current_latitude = models.DecimalField(max_digits=9, decimal_places=6, blank=True, null=True)
+    current_longitude = models.DecimalField(max_digits=9, decimal_places=6, blank=True, null=True)
+    location_updated_at = models.DateTimeField(blank=True, null=True)
+
     # Payment Information
     upi_id = models.CharField(max_length=100, blank=True, null=True)
     bank_name = models.CharField(max_length=100, blank=True, null=True)
@@ -77,7 +104,62 @@ class Driver(models.Model):
         choices=[("Pending", "Pending"), ("Verified", "Verified"), ("Rejected", "Rejected")],
         default="Pending"
     )
-    
+
+    class Meta:
+        indexes = [
+            # Driver matching: service type plus the availability flags
+            models.Index(fields=['service_type', 'availability', 'status', 'is_deleted']),
+        ]
+
     def __str__(self):
         return f"{self.first_name} {self.last_name}"
-    
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'vehicle_type' in update_fields:
+            self.service_type = service_type_for(self.vehicle_type)
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'service_type'}
+        super().save(*args, **kwargs)
+
+
+class DriverLocationTrail(models.Model):
+    """Down-sampled GPS trail, written in bulk by driver.location_buffer."""
+    driver = models.ForeignKey(Driver, on_delete=models.CASCADE, related_name='location_trail')
+    latitude = models.DecimalField(max_digits=9, decimal_places=6)
+    longitude = models.DecimalField(max_digits=9, decimal_places=6)
+    recorded_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['driver', 'recorded_at']),
+        ]
+
+    def __str__(self):
+        return f"Driver {self.driver_id} @ {self.latitude},{self.longitude} ({self.recorded_at})"
+
+
+class DriverStats(models.Model):
+    """
+    Per-driver ride counts and earnings for the dashboard, kept current by
+    driver.earnings.record_booking_status(); rebuild with `manage.py rebuild_driver_stats`.
+    Period earnings are only valid for the period starting on their *_date field.
+    """
+    driver = models.OneToOneField(Driver, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    total_rides = models.IntegerField(default=0)
+    completed_rides = models.IntegerField(default=0)
+    cancelled_rides = models.IntegerField(default=0)
+    scheduled_rides = models.IntegerField(default=0)
+
+    earnings_total = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    earnings_today = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    earnings_today_date = models.DateField(null=True, blank=True)
+    earnings_week = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    earnings_week_date = models.DateField(null=True, blank=True)
+    earnings_month = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    earnings_month_date = models.DateField(null=True, blank=True)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Stats for Driver {self.driver_id}"
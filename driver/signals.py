@@ -0,0 +1,26 @@
+from django.db.models import Q
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from services.models import ServiceType
+
+from .models import Driver, normalize_service_name
+
+
+@receiver(post_save, sender=ServiceType)
+def relink_drivers(sender, instance, **kwargs):
+    """
+    Driver.service_type is resolved when a driver is saved, so a service type
+    added or renamed later has to pick up (or let go of) existing drivers here.
+    """
+    name = normalize_service_name(instance.name)
+    lookup = Q(service_type=instance)
+    if name:
+        lookup |= Q(vehicle_type__icontains=name)
+    for driver in Driver.objects.filter(lookup).only('driver_id', 'vehicle_type', 'service_type'):
+        matches = bool(name) and normalize_service_name(driver.vehicle_type) == name
+        if matches and driver.service_type_id != instance.pk:
+            Driver.objects.filter(driver_id=driver.driver_id).update(service_type=instance)
+        elif not matches and driver.service_type_id == instance.pk:
+            # Renamed away from this driver's vehicle type; another service may still match
+            driver.save(update_fields=['vehicle_type'])
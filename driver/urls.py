@@ -26,4 +26,5 @@ urlpatterns = [
     path('api/ride-request/<int:ride_request_id>/', views.api_ride_request_details, name='api_ride_request_details'),
     path('api/booking/<int:booking_id>/', views.api_booking_details, name='api_booking_details'),
     path('api/verify-pin/<int:booking_id>/', views.verify_ride_pin, name='verify_ride_pin'),
+    path('api/location/', views.api_update_location, name='api_update_location'),
 ]
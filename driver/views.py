@@ -1,24 +1,36 @@
-from decimal import Decimal, ROUND_HALF_UP
+from decimal import Decimal
 from django.utils.timezone import localtime
 from django.shortcuts import render, get_object_or_404, redirect
 from .models import Driver
 from booking.models import Booking, RideRequest, RidePin
+from booking.idempotency import idempotent
+from booking.ride_pins import check_pin, hash_pin, new_pin
 from django.views.decorators.csrf import csrf_exempt
 from django.http import JsonResponse
 from django.utils import timezone
 from django.contrib import messages
-from payments.models import Payment
+from payments.models import EarningsEntry, Payment
+from payments.ledger import record_earnings
 from django.views.decorators.http import require_POST
 from driver.decorators import driver_login_required
 import logging
 from django.db import transaction
-from rating.models import Rating
+from rating.aggregates import record_passenger_ride, record_rating
+from rating.models import PassengerRatingSummary, Rating
 import json
 from .forms import DriverEditProfileForm
 from django.core.cache import cache
-import random
-from django.contrib.auth.hashers import make_password, check_password
 from datetime import timedelta
+from django.conf import settings
+from django.db.models import Count, DecimalField, F, Q, Sum, Value
+from django.db.models.functions import Coalesce
+from dispatch.index import remove_driver_location
+from dispatch.queue import get_queue_store
+from dispatch.models import RideOffer
+from dispatch.services import decline_offer, offer_ride, offered_to, retract_offers
+from notifications.events import publish_ride_status
+from . import location_buffer
+from .earnings import get_driver_stats, local_midnight, record_booking_status
 
 logger = logging.getLogger(__name__)
 
@@ -32,6 +44,8 @@ DRIVER_CANCELLATION_REASONS = {
     "other": "Other",
 }
 
+MAX_LOCATION_BATCH = 200
+
 def admin_driver_list(request):
     drivers = Driver.objects.all()
     return render(request, 'adminpanel/drivers.html', {'drivers': drivers})
@@ -50,13 +64,7 @@ def driver_homepage_cab_view(request):
     except Driver.DoesNotExist:
         return redirect('login')
 
-    total_rides = Booking.objects.filter(driver=driver).count()
-    completed_rides = Booking.objects.filter(driver=driver, status='Completed').count()
-    cancelled_rides = Booking.objects.filter(
-        driver=driver,
-        status__in=['Cancelled', 'CancelledByDriver', 'CancelledByPassenger']
-    ).count()
-    scheduled_rides = Booking.objects.filter(driver=driver, status='Confirmed').count()
+    stats = get_driver_stats(driver)
 
     active_booking = Booking.objects.filter(
         driver=driver,
@@ -73,11 +81,11 @@ def driver_homepage_cab_view(request):
         status__in=['Confirmed', 'Scheduled']
     )
 
-    # Retrieve active ride requests assigned to this driver only
+    # Retrieve active ride requests offered to this driver only
     ride_requests = RideRequest.objects.filter(
+        offered_to(driver.driver_id),
         status='Requested',
-        driver=driver,
-        service_type__name__iexact=driver.vehicle_type
+        service_type_id=driver.service_type_id
     )
 
     # Combine confirmed bookings and ride requests, sort properly
@@ -88,63 +96,18 @@ def driver_homepage_cab_view(request):
     all_rides = list(confirmed_rides) + list(ride_requests)
     all_rides.sort(key=get_sort_time)
 
-    # === Calculate earnings (today, week, month, total) ===
-    completed_bookings = (
-        Booking.objects.filter(driver=driver, status='Completed')
-        .select_related('service_type')
-        .order_by('-scheduled_time')
-    )
-
-    from datetime import timedelta
-
-    today = localtime().date()
-    start_of_week = today - timedelta(days=today.weekday())
-    start_of_month = today.replace(day=1)
-
-    earnings_today = Decimal("0.00")
-    earnings_week = Decimal("0.00")
-    earnings_month = Decimal("0.00")
-    total_earnings = Decimal("0.00")
-
-    for ride in completed_bookings:
-        fare_total = Decimal(ride.fare or 0)
-        service = ride.service_type
-
-        provider_percent = Decimal(service.provider_commission or 0) / Decimal(100)
-        booking_fee = Decimal(service.booking_fee or 0)
-        tax_percent = Decimal(service.tax_percentage or 0) / Decimal(100)
-
-        if tax_percent > 0:
-            subtotal_before_tax = fare_total / (1 + tax_percent)
-        else:
-            subtotal_before_tax = fare_total
-
-        components_excl_booking = subtotal_before_tax - booking_fee
-        driver_earning = (components_excl_booking * provider_percent).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
-
-        total_earnings += driver_earning
-
-        local_dt = localtime(ride.scheduled_time)
-        local_date = local_dt.date()
-        if local_date == today:
-            earnings_today += driver_earning
-        if local_date >= start_of_week:
-            earnings_week += driver_earning
-        if local_date >= start_of_month:
-            earnings_month += driver_earning
-
     return render(request, 'driver/driver_homepage.html', {
         'driver': driver,
-        'total_rides': total_rides,
-        'completed_rides': completed_rides,
-        'cancelled_rides': cancelled_rides,
-        'scheduled_rides': scheduled_rides,
+        'total_rides': stats.total_rides,
+        'completed_rides': stats.completed_rides,
+        'cancelled_rides': stats.cancelled_rides,
+        'scheduled_rides': stats.scheduled_rides,
         'all_rides': all_rides,
         'ride_requests': ride_requests,
-        'total_earnings': total_earnings,
-        'earnings_today': earnings_today,
-        'earnings_week': earnings_week,
-        'earnings_month': earnings_month,
+        'total_earnings': stats.earnings_total,
+        'earnings_today': stats.earnings_today,
+        'earnings_week': stats.earnings_week,
+        'earnings_month': stats.earnings_month,
         'active_booking': active_booking,
     })
 
@@ -180,6 +143,7 @@ def api_active_booking(request):
         'status': active_booking.status if active_booking else None,
     })
 
+@idempotent
 def accept_ride(request, ride_request_id):
     logger.debug(f"accept_ride called for ride_request_id={ride_request_id}")
 
@@ -191,67 +155,98 @@ def accept_ride(request, ride_request_id):
     driver = get_object_or_404(Driver, driver_id=driver_id)
 
     with transaction.atomic():
-        # Only allow the currently assigned driver to accept
-        ride_request = get_object_or_404(
-            RideRequest,
+        # Claim the request with a conditional UPDATE. Of two racing accepts (or an
+        # accept racing a reassignment) only one still matches status='Requested'.
+        open_request = RideRequest.objects.filter(
             id=ride_request_id,
             status='Requested',
-            driver=driver,
-            service_type__name__iexact=driver.vehicle_type
+            booking__isnull=True,
+            service_type_id=driver.service_type_id,
         )
-
-        if hasattr(ride_request, 'booking') and ride_request.booking:
-            logger.warning(f"RideRequest {ride_request_id} already has booking {ride_request.booking.booking_id}")
-            messages.error(request, "This ride has already been accepted by another driver.")
-            return redirect('driver_homepage')
-
-        booking = Booking.objects.create(
-            user=ride_request.user,
-            driver=driver,
-            pickup_location=ride_request.pickup_location,
-            dropoff_location=ride_request.dropoff_location,
-            pickup_latitude=ride_request.pickup_latitude,
-            pickup_longitude=ride_request.pickup_longitude,
-            drop_latitude=ride_request.drop_latitude,
-            drop_longitude=ride_request.drop_longitude,
-            fare=ride_request.fare,
-            distance_km=ride_request.distance_km,
-            duration_min=ride_request.duration_min,
-            scheduled_time=ride_request.scheduled_time,
-            payment_mode=ride_request.payment_mode,
-            service_type=ride_request.service_type,
-            status='Confirmed'
-        )
-        print(
-            f"[DEBUG][accept_ride] ride_request_id={ride_request_id} "
-            f"booking_id={booking.booking_id} status={booking.status}"
+        offered_at = (
+            RideOffer.objects
+            .filter(ride_request_id=ride_request_id, driver=driver, status='Offered')
+            .values_list('offered_at', flat=True)
+            .first()
         )
+        if offered_at is not None:
+            # Broadcast offer: first accept wins, while this offer's round is still current
+            claimed = open_request.filter(driver__isnull=True, offered_at=offered_at).update(
+                status='Accepted', driver=driver,
+            )
+        else:
+            claimed = open_request.filter(driver=driver).update(status='Accepted')
 
-        # Generate a unique 4-digit PIN for this booking
-        pin_value = f"{random.randint(0, 9999):04d}"
-        RidePin.objects.update_or_create(
-            booking=booking,
-            defaults={
-                'pin_hash': make_password(pin_value),
-                'pin_plain': pin_value,
-                'attempts': 0,
-                'locked_until': None,
-                'is_active': True,
-                'is_verified': False,
-            }
-        )
+        if not claimed:
+            ride_request = (
+                RideRequest.objects
+                .select_related('booking')
+                .filter(id=ride_request_id, status='Accepted', booking__driver=driver)
+                .first()
+            )
+            if ride_request is None:
+                logger.warning(f"RideRequest {ride_request_id} is no longer open for driver {driver.driver_id}")
+                error_msg = "This ride is no longer available."
+                if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+                    return JsonResponse({'success': False, 'error': error_msg}, status=409)
+                messages.error(request, error_msg)
+                return redirect('driver_homepage')
+            # A repeated accept by the same driver: report the booking it already made
+            booking = ride_request.booking
+        else:
+            ride_request = RideRequest.objects.select_related('user', 'service_type').get(id=ride_request_id)
+            booking = Booking.objects.create(
+                user=ride_request.user,
+                driver=driver,
+                pickup_location=ride_request.pickup_location,
+                dropoff_location=ride_request.dropoff_location,
+                pickup_latitude=ride_request.pickup_latitude,
+                pickup_longitude=ride_request.pickup_longitude,
+                drop_latitude=ride_request.drop_latitude,
+                drop_longitude=ride_request.drop_longitude,
+                fare=ride_request.fare,
+                distance_km=ride_request.distance_km,
+                duration_min=ride_request.duration_min,
+                scheduled_time=ride_request.scheduled_time,
+                payment_mode=ride_request.payment_mode,
+                service_type=ride_request.service_type,
+                status='Confirmed'
+            )
+            print(
+                f"[DEBUG][accept_ride] ride_request_id={ride_request_id} "
+                f"booking_id={booking.booking_id} status={booking.status}"
+            )
+
+            # Generate a unique 4-digit PIN for this booking
+            pin_value = new_pin()
+            RidePin.objects.update_or_create(
+                booking=booking,
+                defaults={
+                    'pin_hash': hash_pin(pin_value),
+                    'pin_plain': pin_value,
+                    'attempts': 0,
+                    'locked_until': None,
+                    'is_active': True,
+                    'is_verified': False,
+                }
+            )
 
-        ride_request.booking = booking
-        ride_request.status = 'Accepted'
-        ride_request.save(update_fields=['booking', 'status'])
+            ride_request.booking = booking
+            ride_request.save(update_fields=['booking'])
+            if offered_at is not None:
+                RideOffer.objects.filter(ride_request=ride_request, driver=driver).update(
+                    status='Accepted', responded_at=timezone.now(),
+                )
+                retract_offers(ride_request)
+            record_booking_status(booking, None, booking.status)
+            publish_ride_status(ride_request, booking, user_id=ride_request.user_id)
 
-        logger.debug(f"RideRequest {ride_request_id} accepted, Booking {booking.booking_id} created.")
+            logger.debug(f"RideRequest {ride_request_id} accepted, Booking {booking.booking_id} created.")
 
     messages.success(request, f"Ride #{ride_request.id} accepted successfully.")
     
     # If AJAX request, return JSON with booking_id
     if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
-        from django.http import JsonResponse
         return JsonResponse({
             'success': True,
             'booking_id': booking.booking_id,
@@ -267,12 +262,14 @@ def reject_ride(request, ride_request_id):
     if not driver_id:
         return redirect('driver_login')
 
-    try:
-        ride_obj = RideRequest.objects.get(id=ride_request_id)
-        ride_obj.status = 'Rejected'
-        ride_obj.save()
-    except RideRequest.DoesNotExist:
-        pass
+    # A broadcast offer is declined for this driver only; the others keep theirs
+    if not decline_offer(ride_request_id, driver_id):
+        try:
+            ride_obj = RideRequest.objects.get(id=ride_request_id)
+            ride_obj.status = 'Rejected'
+            ride_obj.save()
+        except RideRequest.DoesNotExist:
+            pass
 
     messages.info(request, f"You rejected ride request #{ride_request_id}.")
     return redirect('driver_homepage')
@@ -393,14 +390,18 @@ def arrived_ride_view(request, booking_id):
     # Only allow arrival announcement before ride start
     if booking.status in ['Confirmed', 'Scheduled']:
         # Persist status change to 'Arrived'
-        booking.status = 'Arrived'
-        booking.save(update_fields=['status'])
+        prior_status = booking.status
+        with transaction.atomic():
+            booking.status = 'Arrived'
+            booking.save(update_fields=['status'])
+            record_booking_status(booking, prior_status, booking.status)
         print(
             f"[DEBUG][arrived_ride_view] booking_id={booking.booking_id} "
             f"status_after={booking.status}"
         )
         cache_key = f"booking:{booking.booking_id}:arrived"
         cache.set(cache_key, True, timeout=60 * 60)  # 1 hour TTL
+        publish_ride_status(booking=booking, user_id=booking.user_id)
         
         # Return JSON for AJAX requests
         if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
@@ -437,11 +438,48 @@ def api_assigned_requests(request):
         return JsonResponse({'assigned_request_ids': []})
     ids = list(
         RideRequest.objects
-        .filter(status='Requested', driver=driver)
+        .filter(offered_to(driver.driver_id), status='Requested')
         .values_list('id', flat=True)
     )
     return JsonResponse({'assigned_request_ids': ids})
 
+@require_POST
+@driver_login_required
+def api_update_location(request):
+    """
+    Ingest GPS pings from the driver app for proximity-based dispatch.
+    Accepts a JSON batch `{"points": [{"lat": .., "lng": .., "ts": epoch_ms}, ...]}`
+    or a single `lat`/`lng` pair (JSON or form-encoded).
+    """
+    driver_id = request.session.get('driver_id')
+    try:
+        driver = Driver.objects.only('driver_id', 'vehicle_type', 'availability').get(driver_id=driver_id)
+    except Driver.DoesNotExist:
+        return JsonResponse({'success': False, 'error': 'Driver not found'}, status=404)
+
+    if 'application/json' in request.META.get('CONTENT_TYPE', ''):
+        try:
+            data = json.loads(request.body)
+        except json.JSONDecodeError:
+            return JsonResponse({'success': False, 'error': 'Invalid JSON'}, status=400)
+        if not isinstance(data, dict):
+            return JsonResponse({'success': False, 'error': 'Expected a JSON object'}, status=400)
+    else:
+        data = request.POST
+
+    raw_points = data.get('points')
+    if raw_points is None:
+        raw_points = [{'lat': data.get('lat'), 'lng': data.get('lng'), 'ts': data.get('ts')}]
+    if not isinstance(raw_points, list) or len(raw_points) > MAX_LOCATION_BATCH:
+        return JsonResponse({'success': False, 'error': f'Send between 1 and {MAX_LOCATION_BATCH} points'}, status=400)
+
+    points = location_buffer.parse_points(raw_points)
+    if not points:
+        return JsonResponse({'success': False, 'error': 'No valid points in batch'}, status=400)
+
+    stored = location_buffer.record_pings(driver, points)
+    return JsonResponse({'success': True, 'accepted': len(points), 'stored': stored})
+
 @driver_login_required
 def api_ride_request_details(request, ride_request_id):
     """
@@ -454,18 +492,14 @@ def api_ride_request_details(request, ride_request_id):
     try:
         driver = Driver.objects.get(driver_id=driver_id)
         # Allow fetching both Requested and Accepted ride requests
-        ride_request = RideRequest.objects.get(
+        ride_request = RideRequest.objects.select_related('user', 'service_type', 'booking').get(
+            offered_to(driver.driver_id),
             id=ride_request_id,
-            driver=driver
         )
         
-        # Get passenger rating
-        from rating.models import Rating
-        from django.db.models import Avg
-        passenger_rating = Rating.objects.filter(
-            User_id=ride_request.user_id,
-            given_by='driver'
-        ).aggregate(avg_rating=Avg('rating'))['avg_rating']
+        # Passenger reputation: one primary-key read of the maintained summary
+        passenger_summary = PassengerRatingSummary.objects.filter(user_id=ride_request.user_id).first()
+        passenger_rating = passenger_summary.average_rating if passenger_summary else None
         
         passenger_name = f"{ride_request.user.first_name} {ride_request.user.last_name}".strip()
         if not passenger_name:
@@ -481,6 +515,8 @@ def api_ride_request_details(request, ride_request_id):
             'id': ride_request.id,
             'passengerName': passenger_name,
             'rating': round(float(passenger_rating), 1) if passenger_rating else 4.5,
+            'passengerRides': passenger_summary.completed_rides if passenger_summary else 0,
+            'passengerCancellationRate': passenger_summary.cancellation_rate if passenger_summary else None,
             'pickup': ride_request.pickup_location,
             'dropoff': ride_request.dropoff_location,
             'pickupLat': pickup_lat,
@@ -545,6 +581,7 @@ def api_booking_details(request, booking_id):
 
 @require_POST
 @driver_login_required
+@idempotent
 def end_ride_view(request, booking_id):
     driver_id = request.session.get('driver_id')
     if not driver_id:
@@ -563,31 +600,41 @@ def end_ride_view(request, booking_id):
         f"[DEBUG][end_ride_view] booking_id={booking.booking_id} "
         f"status_before={booking.status}"
     )
-    if booking.status == 'Ongoing':
-        booking.status = 'Completed'
-        booking.save()
-        print(
-            f"[DEBUG][end_ride_view] booking_id={booking.booking_id} "
-            f"status_after={booking.status}"
-        )
+    with transaction.atomic():
+        # Lock the booking so a double submit cannot complete (and pay out) the ride twice
+        booking = Booking.objects.select_for_update().select_related('service_type').get(pk=booking.pk)
+        completed = booking.status == 'Ongoing'
+        if completed:
+            booking.status = 'Completed'
+            booking.save()
+            record_earnings(booking)
+            record_booking_status(booking, 'Ongoing', booking.status)
+            record_passenger_ride(booking.user_id)
+            publish_ride_status(booking=booking, user_id=booking.user_id)
+            print(
+                f"[DEBUG][end_ride_view] booking_id={booking.booking_id} "
+                f"status_after={booking.status}"
+            )
 
-        payment_mode = booking.payment_mode or "Cash"  # default if somehow null
+            payment_mode = booking.payment_mode or "Cash"  # default if somehow null
 
-        # ✅ Create Payment record with passenger-selected payment mode
-        Payment.objects.create(
-            user=booking.user,
-            booking=booking,
-            payment_mode=payment_mode,
-            amount=booking.fare,
-            status='completed' if payment_mode.lower() == 'cash' else 'completed'
-        )
+            # ✅ Create Payment record with passenger-selected payment mode
+            Payment.objects.create(
+                user=booking.user,
+                booking=booking,
+                payment_mode=payment_mode,
+                amount=booking.fare,
+                status='completed' if payment_mode.lower() == 'cash' else 'completed'
+            )
 
-        # Ensure PIN is invalidated once ride is completed
-        ride_pin = getattr(booking, 'ride_pin', None)
-        if ride_pin:
-            ride_pin.is_active = False
-            ride_pin.pin_plain = ''
-            ride_pin.save(update_fields=['is_active', 'pin_plain'])
+            # Ensure PIN is invalidated once ride is completed
+            ride_pin = getattr(booking, 'ride_pin', None)
+            if ride_pin:
+                ride_pin.is_active = False
+                ride_pin.pin_plain = ''
+                ride_pin.save(update_fields=['is_active', 'pin_plain'])
+
+    if completed:
 
         # Return JSON for AJAX requests with complete ride details for popup
         if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
@@ -630,10 +677,11 @@ def end_ride_view(request, booking_id):
 
 @require_POST
 @driver_login_required
+@idempotent
 def cancel_ride_view(request, booking_id):
     """
     Cancel an accepted/arrived/ongoing ride with mandatory reason capture.
-    Before ride start: attempt reassignment to next driver from cached queue.
+    Before ride start: attempt reassignment to next driver from the shared dispatch queue.
     Mid ride: mark cancelled and compute a simple partial fare.
     """
     driver_id = request.session.get('driver_id')
@@ -693,7 +741,14 @@ def cancel_ride_view(request, booking_id):
     next_driver_id = None
 
     with transaction.atomic():
+        # Re-read under a row lock: a concurrent start/end/cancel may have moved the ride on
+        booking = Booking.objects.select_for_update().get(pk=booking.pk)
         prior_status = booking.status
+        if (prior_status or '').strip() != current_status:
+            return JsonResponse(
+                {'success': False, 'error': f'Ride is now "{prior_status}"; refresh and try again.'},
+                status=409
+            )
         booking.status = 'CancelledByDriver'
         booking.cancelled_by = 'driver'
         booking.cancellation_reason = reason_text
@@ -705,6 +760,8 @@ def cancel_ride_view(request, booking_id):
             booking.fare = partial_fare
 
         booking.save()
+        record_booking_status(booking, prior_status, booking.status)
+        publish_ride_status(booking=booking, user_id=booking.user_id)
         print(
             f"[DEBUG][cancel_ride_view] booking_id={booking.booking_id} "
             f"status_after={booking.status} stage={stage}"
@@ -726,29 +783,14 @@ def cancel_ride_view(request, booking_id):
                 .first()
             )
             if ride_request:
-                queue_key = f"ride_request:{ride_request.id}:driver_queue"
-                candidate_ids = cache.get(queue_key) or []
-                candidate_ids = [cid for cid in candidate_ids if cid != driver.driver_id]
-
-                next_driver = None
-                while candidate_ids:
-                    candidate_id = candidate_ids.pop(0)
-                    try:
-                        d = Driver.objects.get(
-                            driver_id=candidate_id,
-                            availability=True,
-                            status='Active',
-                            is_deleted=False
-                        )
-                    except Driver.DoesNotExist:
-                        continue
-                    next_driver = d
-                    break
-
                 ride_request.booking = None
-                ride_request.status = 'Requested' if next_driver else 'Expired'
-                ride_request.driver = next_driver
-                ride_request.save(update_fields=['booking', 'status', 'driver'])
+                ride_request.status = 'Requested'
+                ride_request.save(update_fields=['booking', 'status'])
+                next_drivers = offer_ride(ride_request, exclude_driver_id=driver.driver_id)
+                next_driver = next_drivers[0] if next_drivers else None
+                if not next_driver:
+                    ride_request.status = 'Expired'
+                    ride_request.save(update_fields=['status'])
                 cache.set(
                     f"booking:{booking.booking_id}:reassignment_meta",
                     {
@@ -762,16 +804,8 @@ def cancel_ride_view(request, booking_id):
                 if next_driver:
                     reassigned = True
                     next_driver_id = next_driver.driver_id
-                    cache.set(queue_key, candidate_ids, timeout=60 * 10)
-                    print(
-                        f"[DEBUG][ride_dispatch] RideRequest {ride_request.id} "
-                        f"sent to Driver ID={next_driver.driver_id}, "
-                        f"VehicleType={next_driver.vehicle_type}, "
-                        f"Status={next_driver.status}, "
-                        f"Timestamp={timezone.now().isoformat()}"
-                    )
                 else:
-                    cache.delete(queue_key)
+                    get_queue_store().delete(ride_request.id)
 
     logger.info(
         "[RIDE CANCELLED] booking=%s driver=%s stage=%s reason=%s reassigned=%s next_driver=%s",
@@ -841,11 +875,16 @@ def verify_ride_pin(request, booking_id):
     # Log attempt
     logger.info(f"[PIN VERIFY] driver={driver.driver_id} booking={booking_id} attempt_pin={pin_input}")
 
-    if check_password(pin_input, ride_pin.pin_hash):
+    matches, needs_rehash = check_pin(pin_input, ride_pin.pin_hash)
+    if matches:
         ride_pin.is_verified = True
         ride_pin.attempts = 0
         ride_pin.locked_until = None
-        ride_pin.save(update_fields=['is_verified', 'attempts', 'locked_until'])
+        update_fields = ['is_verified', 'attempts', 'locked_until']
+        if needs_rehash:
+            ride_pin.pin_hash = hash_pin(pin_input)
+            update_fields.append('pin_hash')
+        ride_pin.save(update_fields=update_fields)
         return JsonResponse({'success': True, 'message': 'PIN verified. You can start the ride now.'})
 
     # Failed attempt handling
@@ -872,6 +911,7 @@ def verify_ride_pin(request, booking_id):
 
 @require_POST
 @driver_login_required
+@idempotent
 def start_ride_view(request, booking_id):
     driver_id = request.session.get('driver_id')
     if not driver_id:
@@ -903,9 +943,18 @@ def start_ride_view(request, booking_id):
     else:
         logger.warning(f"[PIN VERIFY] Missing ride pin for booking {booking.booking_id}")
 
-    if booking.status in ['Confirmed', 'Arrived']:
-        booking.status = 'Ongoing'
-        booking.save()
+    with transaction.atomic():
+        # Lock the booking so a double submit cannot start the ride twice
+        booking = Booking.objects.select_for_update().get(pk=booking.pk)
+        prior_status = booking.status
+        started = prior_status in ['Confirmed', 'Arrived']
+        if started:
+            booking.status = 'Ongoing'
+            booking.save()
+            record_booking_status(booking, prior_status, booking.status)
+
+    if started:
+        publish_ride_status(booking=booking, user_id=booking.user_id)
         print(
             f"[DEBUG][start_ride_view] booking_id={booking.booking_id} "
             f"status_after={booking.status}"
@@ -955,76 +1004,56 @@ def driver_earnings_view(request):
         return redirect('unified_login')
 
     today = localtime().date()
-    start_of_month = today.replace(day=1)
-    start_of_year = today.replace(month=1, day=1)
-
-    all_completed_rides = Booking.objects.filter(
-        driver=driver,
-        status='Completed'
-    ).order_by('-scheduled_time')
-
-    print("=== [DEBUG] Completed Rides for Driver Earnings Calculation ===")
-    earnings_today = Decimal("0.00")
-    earnings_month = Decimal("0.00")
-    earnings_year = Decimal("0.00")
-
-    ride_data = []
-
-    for ride in all_completed_rides:
-        utc_dt = ride.scheduled_time
-        local_dt = localtime(utc_dt)
-        local_date = local_dt.date()
-
-        fare_total = Decimal(ride.fare or 0)
-        service = ride.service_type
-
-        provider_percent = Decimal(service.provider_commission or 0) / Decimal(100)
-        admin_percent = Decimal(service.admin_commission or 0) / Decimal(100)
-        booking_fee = Decimal(service.booking_fee or 0)
-        tax_percent = Decimal(service.tax_percentage or 0) / Decimal(100)
-
-        if tax_percent > 0:
-            subtotal_before_tax = fare_total / (1 + tax_percent)
-        else:
-            subtotal_before_tax = fare_total
-
-        components_excl_booking = subtotal_before_tax - booking_fee
-        driver_earning = (components_excl_booking * provider_percent).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
-
-        print(
-            f"Ride ID: {ride.booking_id}, "
-            f"Scheduled (UTC): {utc_dt}, Local Date: {local_date}, "
-            f"Fare: {fare_total}, Provider%: {provider_percent}, "
-            f"Admin%: {admin_percent}, Driver Earning: {driver_earning}"
+    start_of_today = local_midnight(today)
+    start_of_tomorrow = local_midnight(today + timedelta(days=1))
+    start_of_month = local_midnight(today.replace(day=1))
+    start_of_year = local_midnight(today.replace(month=1, day=1))
+
+    entries = EarningsEntry.objects.filter(driver=driver)
+    zero = Value(Decimal("0.00"), output_field=DecimalField(max_digits=12, decimal_places=2))
+    totals = entries.aggregate(
+        completed_count=Count('entry_id'),
+        earnings_today=Coalesce(Sum('driver_earning', filter=Q(ride_time__gte=start_of_today, ride_time__lt=start_of_tomorrow)), zero),
+        earnings_month=Coalesce(Sum('driver_earning', filter=Q(ride_time__gte=start_of_month)), zero),
+        earnings_year=Coalesce(Sum('driver_earning', filter=Q(ride_time__gte=start_of_year)), zero),
+    )
+    print(f"[DEBUG] earnings_today: {totals['earnings_today']}")
+    print(f"[DEBUG] earnings_month: {totals['earnings_month']}")
+    print(f"[DEBUG] earnings_year: {totals['earnings_year']}")
+
+    # Newest first, one page at a time; ?before=<booking_id> continues after the last ride shown
+    rides = entries.order_by('-ride_time', '-entry_id')
+    before = None
+    if request.GET.get('before', '').isdigit():
+        before = entries.filter(booking_id=request.GET['before']).values('ride_time', 'entry_id').first()
+    if before:
+        rides = rides.filter(
+            Q(ride_time__lt=before['ride_time']) |
+            Q(ride_time=before['ride_time'], entry_id__lt=before['entry_id'])
         )
-
-        if local_date == today:
-            earnings_today += driver_earning
-        if local_date >= start_of_month:
-            earnings_month += driver_earning
-        if local_date >= start_of_year:
-            earnings_year += driver_earning
-
-        ride_data.append({
-            'booking_id': ride.booking_id,
-            'pickup_location': ride.pickup_location,
-            'dropoff_location': ride.dropoff_location,
-            'scheduled_time': ride.scheduled_time,
-            'fare': fare_total,
-            'driver_earning': driver_earning
-        })
-
-    print("===============================================================")
-    print(f"[DEBUG] earnings_today: {earnings_today}")
-    print(f"[DEBUG] earnings_month: {earnings_month}")
-    print(f"[DEBUG] earnings_year: {earnings_year}")
+    page_size = getattr(settings, 'DRIVER_EARNINGS_PAGE_SIZE', 20)
+    ride_data = list(
+        rides
+        .annotate(
+            pickup_location=F('booking__pickup_location'),
+            dropoff_location=F('booking__dropoff_location'),
+            scheduled_time=F('ride_time'),
+            fare=F('gross_fare'),
+        )
+        .values('booking_id', 'pickup_location', 'dropoff_location', 'scheduled_time', 'fare', 'driver_earning')[:page_size + 1]
+    )
+    next_before = ride_data[page_size - 1]['booking_id'] if len(ride_data) > page_size else None
+    ride_data = ride_data[:page_size]
 
     context = {
-        'earnings_today': earnings_today,
-        'earnings_month': earnings_month,
-        'earnings_year': earnings_year,
+        'earnings_today': totals['earnings_today'],
+        'earnings_month': totals['earnings_month'],
+        'earnings_year': totals['earnings_year'],
+        'completed_count': totals['completed_count'],
         'driver': driver,
         'ride_earnings': ride_data,
+        'next_before': next_before,
+        'is_first_page': before is None,
     }
     return render(request, 'driver/driver_earnings.html', context)
 
@@ -1060,6 +1089,10 @@ def toggle_availability(request):
     driver.availability = new_availability
     driver.save()
 
+    # Keep offline drivers out of proximity search; they re-enter on their next location ping
+    if not driver.availability:
+        remove_driver_location(driver.driver_id)
+
     return JsonResponse({
         "success": True, 
         "availability": driver.availability,
@@ -1166,14 +1199,16 @@ def submit_driver_rating(request):
     
     # Create the rating
     try:
-        Rating.objects.create(
-            booking=booking,
-            User=booking.user,   
-            driver=driver,
-            rating=rating_value,
-            comments=comments,
-            given_by='driver'
-        )
+        with transaction.atomic():
+            rating = Rating.objects.create(
+                booking=booking,
+                User=booking.user,   
+                driver=driver,
+                rating=rating_value,
+                comments=comments,
+                given_by='driver'
+            )
+            record_rating(rating)
         
         return JsonResponse({
             'success': True, 
@@ -52,8 +52,10 @@ CREATE TABLE Driver (
     outstation_services BOOLEAN,
     rating DECIMAL(3,2) DEFAULT 0.0,
     status ENUM('Active', 'Inactive') DEFAULT 'Active',
-    created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
     vehicle_type VARCHAR(50),
+    service_type_id INT,  -- resolved from vehicle_type by Driver.save()
+    is_deleted BOOLEAN DEFAULT FALSE
 );
 
 -- ========================
@@ -94,6 +96,8 @@ CREATE TABLE ServiceType (
     created_at DATETIME DEFAULT CURRENT_TIMESTAMP
 );
 
+ALTER TABLE Driver ADD FOREIGN KEY (service_type_id) REFERENCES ServiceType(service_id) ON DELETE SET NULL;
+
 -- ========================
 -- BOOKING TABLE
 -- ========================
@@ -187,3 +191,15 @@ CREATE TABLE Feedback (
     created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
     FOREIGN KEY (user_id) REFERENCES User(user_id)
 );
+
+-- ========================
+-- INDEXES
+-- ========================
+-- Composite indexes for the hot filters (booking/driver/rating migrations
+-- add the same on the Django tables, along with RideRequest(driver, status),
+-- RideRequest(user, status) and the given_by column this sketch does not
+-- have). Check plans with: python manage.py explain_hot_queries
+CREATE INDEX booking_user_status ON Booking (user_id, status);
+CREATE INDEX booking_driver_status_time ON Booking (driver_id, status, scheduled_time);
+CREATE INDEX driver_matching ON Driver (service_type_id, availability, status, is_deleted);
+CREATE INDEX rating_driver ON Rating (driver_id);
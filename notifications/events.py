@@ -0,0 +1,131 @@
+"""
+Ride state events pushed to browsers over Server-Sent Events.
+
+Views call publish() when a ride changes state; the streaming views in
+notifications/views.py relay the events to the passenger or driver they
+concern. Events are kept for a short time in the shared cache under a per-
+channel sequence number, so any worker can publish and any worker can serve
+the stream, and a reconnecting browser resumes from its Last-Event-ID.
+
+Sequence numbers come from Redis INCR when the cache is Redis. Other cache
+backends (the file cache used without REDIS_URL) cannot increment atomically
+across workers, so the number is taken from an EventSequence row instead,
+locked until the event and the new sequence are in the cache.
+"""
+import asyncio
+import time
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.redis import RedisCache
+from django.db import transaction
+
+from .models import EventSequence
+
+SEQ_KEY = "events:{channel}:seq"
+EVENT_KEY = "events:{channel}:{seq}"
+EVENT_TTL_SECONDS = 120
+MISSING_EVENT_GRACE_SECONDS = 2
+
+
+def driver_channel(driver_id):
+    return f"driver:{driver_id}"
+
+
+def user_channel(user_id):
+    return f"user:{user_id}"
+
+
+def _append(channel, payload):
+    seq_key = SEQ_KEY.format(channel=channel)
+    if isinstance(caches['default'], RedisCache):
+        cache.add(seq_key, 0, timeout=None)
+        try:
+            seq = cache.incr(seq_key)
+        except ValueError:
+            # Sequence key was evicted between add() and incr()
+            seq = 1
+            cache.set(seq_key, seq, timeout=None)
+        cache.set(EVENT_KEY.format(channel=channel, seq=seq), payload, timeout=EVENT_TTL_SECONDS)
+        return
+
+    with transaction.atomic():
+        EventSequence.objects.get_or_create(channel=channel)
+        sequence = EventSequence.objects.select_for_update().get(channel=channel)
+        sequence.seq += 1
+        sequence.save(update_fields=['seq'])
+        # Written under the row lock, so the channel's sequence key only ever moves forward
+        cache.set(EVENT_KEY.format(channel=channel, seq=sequence.seq), payload, timeout=EVENT_TTL_SECONDS)
+        cache.set(seq_key, sequence.seq, timeout=None)
+
+
+def publish(event, data, driver_id=None, user_id=None):
+    """
+    Queue `event` with JSON-serialisable `data` for a driver and/or passenger.
+    Delivery happens after the surrounding transaction commits, so listeners
+    never see a state they cannot read back from the database.
+    """
+    channels = []
+    if driver_id:
+        channels.append(driver_channel(driver_id))
+    if user_id:
+        channels.append(user_channel(user_id))
+    if not channels:
+        return
+    payload = {'event': event, 'data': data}
+
+    def send():
+        for channel in channels:
+            _append(channel, payload)
+
+    transaction.on_commit(send)
+
+
+def publish_ride_status(ride_request=None, booking=None, status=None, driver_id=None, user_id=None):
+    """Publish a 'ride' event describing the current state of a ride request/booking."""
+    data = {
+        'ride_request_id': ride_request.id if ride_request else None,
+        'booking_id': booking.booking_id if booking else None,
+        'status': status or (booking.status if booking else ride_request.status),
+    }
+    publish('ride', data, driver_id=driver_id, user_id=user_id)
+
+
+async def stream(channel, last_seq=None):
+    """
+    Async generator of (seq, payload) for `channel`, starting after `last_seq`
+    (or at the current end of the channel when it is None). Yields (None, None)
+    after each idle poll so the caller can send keep-alives or stop.
+    """
+    poll = float(getattr(settings, 'EVENT_STREAM_POLL_SECONDS', 0.5))
+    seq_key = SEQ_KEY.format(channel=channel)
+    if last_seq is None:
+        last_seq = await cache.aget(seq_key) or 0
+    missing_since = None
+
+    while True:
+        seq = await cache.aget(seq_key) or 0
+        if seq < last_seq:
+            # Sequence was reset (cache flushed); start again from its current end
+            last_seq = seq
+        if seq > last_seq:
+            keys = {
+                EVENT_KEY.format(channel=channel, seq=s): s
+                for s in range(last_seq + 1, seq + 1)
+            }
+            found = await cache.aget_many(list(keys))
+            for key, s in keys.items():
+                if key in found:
+                    missing_since = None
+                    last_seq = s
+                    yield s, found[key]
+                    continue
+                # Sequence bumped but the event is not written yet: wait briefly, then skip it
+                missing_since = missing_since or time.monotonic()
+                if time.monotonic() - missing_since < MISSING_EVENT_GRACE_SECONDS:
+                    break
+                missing_since = None
+                last_seq = s
+        else:
+            yield None, None
+        await asyncio.sleep(poll)
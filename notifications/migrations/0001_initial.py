@@ -0,0 +1,21 @@
+# Generated by Django 5.2.4 on 2026-10-18 17:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventSequence',
+            fields=[
+                ('channel', models.CharField(max_length=100, primary_key=True, serialize=False)),
+                ('seq', models.BigIntegerField(default=0)),
+            ],
+        ),
+    ]
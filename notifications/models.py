@@ -1,3 +1,13 @@
 from django.db import models
 
-# Create your models here.
+
+class EventSequence(models.Model):
+    """
+    Last event sequence number per channel, for cache backends whose incr()
+    is not atomic across processes (see notifications/events.py).
+    """
+    channel = models.CharField(max_length=100, primary_key=True)
+    seq = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.channel}: {self.seq}"
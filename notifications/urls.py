@@ -3,4 +3,6 @@ from . import views
 
 urlpatterns = [
     path('', views.notifications_dashboard, name='notifications_dashboard'),
+    path('events/passenger/', views.passenger_events, name='passenger_events'),
+    path('events/driver/', views.driver_events, name='driver_events'),
 ]
@@ -1,4 +1,60 @@
+import json
+import time
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, StreamingHttpResponse
 from django.shortcuts import render
 
+from .events import driver_channel, stream, user_channel
+
 def notifications_dashboard(request):
     return render(request, 'notifications/dashboard.html')  # adjust path if needed
+
+
+def _event_stream_response(request, channel):
+    """
+    Server-Sent Events response relaying `channel`. Streams only when served over
+    ASGI; under WSGI a 204 tells EventSource to stop and the page keeps polling.
+    """
+    if not isinstance(request, ASGIRequest):
+        return HttpResponse(status=204)
+
+    last_event_id = request.headers.get('Last-Event-ID')
+    last_seq = int(last_event_id) if last_event_id and last_event_id.isdigit() else None
+    max_seconds = getattr(settings, 'EVENT_STREAM_MAX_SECONDS', 300)
+    heartbeat_seconds = 15
+
+    async def events():
+        started = last_beat = time.monotonic()
+        yield "retry: 3000\n\n"
+        async for seq, payload in stream(channel, last_seq):
+            now = time.monotonic()
+            if seq is not None:
+                yield f"id: {seq}\nevent: {payload['event']}\ndata: {json.dumps(payload['data'])}\n\n"
+                last_beat = now
+            elif now - last_beat >= heartbeat_seconds:
+                yield ": keep-alive\n\n"
+                last_beat = now
+            # Close periodically; the browser reconnects with Last-Event-ID
+            if now - started >= max_seconds:
+                break
+
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+async def passenger_events(request):
+    user = await request.auser()
+    if not user.is_authenticated:
+        return HttpResponse(status=401)
+    return _event_stream_response(request, user_channel(user.id))
+
+
+async def driver_events(request):
+    driver_id = await request.session.aget('driver_id')
+    if not driver_id:
+        return HttpResponse(status=401)
+    return _event_stream_response(request, driver_channel(driver_id))
@@ -1,3 +1,46 @@
+from datetime import timedelta
+
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from booking.models import RideRequest
+from services.models import ServiceType
+
+from .models import User
+
+
+class ScheduledRideTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='rider@example.com', password='secret', first_name='Asha', last_name='Rao', phone='9876543210',
+        )
+        self.client.force_login(self.user)
+        self.ride_request = RideRequest.objects.create(
+            user=self.user,
+            service_type=ServiceType.objects.create(name='Sedan'),
+            status='Scheduled',
+            scheduled_time=timezone.now() + timedelta(hours=3),
+            pickup_location='Airport', dropoff_location='Station',
+            pickup_latitude=12.97, pickup_longitude=77.59, drop_latitude=12.98, drop_longitude=77.60,
+            fare=250, duration_min=25,
+        )
+
+    def test_held_ride_is_shown_and_can_be_cancelled(self):
+        response = self.client.get(reverse('homepage'))
+        self.assertEqual(response.context['active_ride_request'], self.ride_request)
+        self.assertEqual(
+            response.context['active_resume_url'], reverse('waiting_for_driver', args=[self.ride_request.id])
+        )
+
+        response = self.client.get(reverse('waiting_for_driver', args=[self.ride_request.id]))
+        self.assertTrue(response.context['is_scheduled'])
+        self.assertContains(response, 'Cancel Scheduled Ride')
+
+        response = self.client.post(reverse('cancel_ride_request', args=[self.ride_request.id]))
+        self.assertTrue(response.json()['success'])
+        self.ride_request.refresh_from_db()
+        self.assertEqual(self.ride_request.status, 'Cancelled')
 
-# Create your tests here.
+        response = self.client.get(reverse('homepage'))
+        self.assertIsNone(response.context['active_ride_request'])
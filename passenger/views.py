@@ -6,7 +6,8 @@ from adminpanel.forms import PassengerForm
 from decimal import Decimal
 import math
 from services.models import RentalPackage
-from services.models import FareSlab
+from services.fare_engine import get_snapshot as get_tariff_snapshot, quote_daily, quote_outstation, quote_rental
+from services.surge import get_multipliers as get_surge_multipliers
 from django.views.decorators.http import require_POST
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
@@ -14,6 +15,8 @@ from rating.models import Rating
 from driver.models import Driver
 from booking.models import Booking
 from booking.models import RideRequest, RidePin
+from booking.ride_pins import hash_pin, new_pin
+from rating.aggregates import record_passenger_ride, record_rating
 from django.contrib.auth import logout
 from faq.models import MainTopic, SubTopic, FAQ
 from django.utils import timezone
@@ -33,11 +36,19 @@ from django.views.decorators.http import require_POST
 import json
 from .forms import EmergencyContactForm
 from django.core.cache import cache
+from django.db import transaction
 from django.db.models import Q, Sum, Avg
 from django.views.decorators.csrf import csrf_exempt
+from dispatch.routing import trip_metrics
+from dispatch.scheduler import is_prebooked, overlapping_scheduled_ride
+from dispatch.services import advance_ride_request, offer_deadline, retract_offers, start_dispatch
+from driver.earnings import record_booking_status
+from notifications.events import publish_ride_status
 
 ACTIVE_BOOKING_STATUSES = ['Pending', 'Confirmed', 'Arrived', 'Ongoing', 'Started']
 CANCELLED_BOOKING_STATUSES = ['Cancelled', 'CancelledByDriver', 'CancelledByPassenger']
+# Ride requests still waiting for a driver, including pre-booked ones held by dispatch.scheduler
+ACTIVE_RIDE_REQUEST_STATUSES = ['Requested', 'Scheduled']
 
 
 def _get_latest_active_booking(user):
@@ -52,7 +63,7 @@ def _get_latest_active_booking(user):
 def _get_latest_requested_ride_request(user):
     return (
         RideRequest.objects
-        .filter(user=user, status='Requested')
+        .filter(user=user, status__in=ACTIVE_RIDE_REQUEST_STATUSES)
         .order_by('-id')
         .first()
     )
@@ -177,7 +188,7 @@ def passenger_dashboard(request):
     if not active_booking:
         active_ride_request = RideRequest.objects.filter(
             user=request.user,
-            status='Requested'
+            status__in=ACTIVE_RIDE_REQUEST_STATUSES
         ).order_by('-id').first()
         
         if active_ride_request:
@@ -307,14 +318,20 @@ def choose_ride_view(request):
     ride_type = request.GET.get('ride_type', 'daily') 
     pickup_meta = build_meta(pickup_city, pickup_district, pickup_state)
     drop_meta = build_meta(drop_city, drop_district, drop_state)
-    distance = parse_decimal(dynamic_distance_km)
-    duration_minutes = parse_decimal(dynamic_duration_min)
+    distance, duration_minutes = trip_metrics(
+        pickup_lat, pickup_lng, drop_lat, drop_lng,
+        parse_decimal(dynamic_distance_km), parse_decimal(dynamic_duration_min),
+    )
+    route_distance_km = '' if distance is None else distance
+    route_duration_min = '' if duration_minutes is None else duration_minutes
     estimated_fares = []
+    tariffs = get_tariff_snapshot()
     outstation_disallowed = get_outstation_disallowed()
     outstation_threshold_km = get_outstation_threshold_km()
     ride_type_notice = None
     
-    # Coordinates are optional here; distance must come from routing (frontend).
+    # Distance/duration come from the server road graph (dispatch/routing.py) when one is
+    # configured; the frontend's routed values are only used without it.
 
     SERVICE_DETAILS = {
         'Hatchback': {
@@ -345,8 +362,6 @@ def choose_ride_view(request):
     }
 
     if pickup and dropoff:
-        # Route distance/duration must come from frontend routing (single source of truth).
-        # No backend fallback distance; routing distance is the single source of truth.
         time_minutes = None
         if distance is None or duration_minutes is None:
             ride_type_notice = "Unable to calculate route distance. Please select suggested locations and try again."
@@ -367,152 +382,40 @@ def choose_ride_view(request):
                 ride_type_notice = "Pickup and dropoff appear to be in different areas. Ride type was switched to Outstation."
         ride_type = derived_ride_type
 
+        quotes = []
         if ride_type == 'rental' and request.GET.get('rental_duration_id'):
-            try:
-                rental_duration = request.GET.get('rental_duration_id')
-                print(f"[DEBUG] Rental Duration ID received: {rental_duration}")
-                rental_package = RentalPackage.objects.get(id=rental_duration)
-                print(f"[DEBUG] Rental Package fetched: {rental_package}")
-                from services.models import RentalService
-                rental_services = RentalService.objects.filter(package=rental_package).select_related('service_type')
-                estimated_fares = []
-
+            rental_duration = request.GET.get('rental_duration_id')
+            print(f"[DEBUG] Rental Duration ID received: {rental_duration}")
+            rental_package = tariffs.packages_by_id.get(int(rental_duration)) if rental_duration.isdigit() else None
+            print(f"[DEBUG] Rental Package fetched: {rental_package}")
+            if rental_package:
                 duration_minutes = rental_package.time_hours * Decimal(60)
                 distance = rental_package.distance_km
-                print(f"[DEBUG] Calculated duration_minutes: {duration_minutes}, Distance: {distance}")
-
-                for rs in rental_services:
-                    service = rs.service_type
-                    subtotal = (
-                        rs.base_fare +
-                        rs.booking_fee +
-                        (distance * rs.per_km_rate) +
-                        (duration_minutes * rs.per_minute_rate)
-                    )
-                    total_fare = Decimal(math.ceil(subtotal + (subtotal * Decimal('0.05'))))
-                    icon_class = SERVICE_DETAILS.get(service.name, {}).get('icon', 'fas fa-car')
-
-                    estimated_fares.append({
-                        'service_name': service.name,
-                        'number_of_seats': service.number_of_seats,
-                        'estimated_price': total_fare,
-                        'icon': icon_class,
-                        'description': SERVICE_DETAILS.get(service.name, {}).get('description', '')
-                    })
-            except RentalPackage.DoesNotExist:
-                rental_services = []
-                estimated_fares = []
+                quotes = quote_rental(rental_package.id, snapshot=tariffs)
         elif distance and duration_minutes is not None:
             time_minutes = duration_minutes
+            surge = get_surge_multipliers(pickup_lat, pickup_lng)
             if ride_type == 'outstation':
-                services = ServiceType.objects.exclude(name__in=outstation_disallowed)
-                for service in services:
-                    base_fare = service.base_fare or Decimal('0')
-                    per_km_rate = service.price_per_km or Decimal('0')
-                    per_minute_rate = service.price_per_minute or Decimal('0')
-                    booking_fee = service.booking_fee or Decimal('0')
-                    toll_fee = Decimal('0')  # Set toll_fee to zero
-                    discount = Decimal('0')  # Set discount to zero
-                    surge_charge = Decimal('0')
-
-                    estimated_price = (
-                        base_fare +
-                        (distance * per_km_rate) +
-                        (time_minutes * per_minute_rate) +
-                        surge_charge +
-                        toll_fee +
-                        booking_fee -
-                        discount
-                    )
-                    estimated_price_with_tax = estimated_price + (estimated_price * Decimal('0.05'))
-                    estimated_price = Decimal(math.ceil(estimated_price_with_tax))
-
-                    service_info = SERVICE_DETAILS.get(service.name, {})
-                    model_description = getattr(service, 'description', None)
-                    description = model_description if model_description else service_info.get('description', '')
-                    icon = service_info.get('icon', 'fas fa-car')
-                    seats = service.number_of_seats or service_info.get('default_seats', 4)
-
-                    estimated_fares.append({
-                        'service_name': service.name,
-                        'estimated_price': estimated_price,
-                        'number_of_seats': seats,
-                        'icon': icon,
-                        'description': description,
-                    })
+                quotes = quote_outstation(distance, time_minutes, exclude_names=outstation_disallowed, snapshot=tariffs, surge=surge)
             else:
-                services = ServiceType.objects.all()
-                for service in services:
-                    applicable_slab = FareSlab.objects.filter(
-                        service_type=service,
-                        km_from__lte=distance,
-                        km_to__gte=distance
-                    ).first()
-
-                    if applicable_slab:
-                        base_fare = applicable_slab.base_fare or Decimal('0')
-                        per_km_rate = applicable_slab.rate_per_km or Decimal('0')
-                        per_minute_rate = applicable_slab.rate_per_minute or Decimal('0')
-                    else:
-                        base_fare = service.base_fare or Decimal('0')
-                        per_km_rate = service.price_per_km or Decimal('0')
-                        per_minute_rate = service.price_per_minute or Decimal('0')
-
-                    booking_fee = service.booking_fee or Decimal('0')
-                    toll_fee = Decimal('0')
-                    discount = Decimal('0')
-                    surge_charge = Decimal('0')
-
-                    subtotal = (
-                        base_fare +
-                        (distance * per_km_rate) +
-                        (time_minutes * per_minute_rate) +
-                        booking_fee +
-                        surge_charge +
-                        toll_fee -
-                        discount
-                    )
-                    estimated_price = subtotal
-                    estimated_price_with_tax = estimated_price + (estimated_price * Decimal('0.05'))
-                    estimated_price = Decimal(math.ceil(estimated_price_with_tax))
-
-                    min_fare = service.min_fare or Decimal('0')
-                    if estimated_price < min_fare:
-                        estimated_price = min_fare
-
-                    service_info = SERVICE_DETAILS.get(service.name, {})
-                    model_description = getattr(service, 'description', None)
-                    description = model_description if model_description else service_info.get('description', '')
-                    icon = service_info.get('icon', 'fas fa-car')
-                    seats = service.number_of_seats or service_info.get('default_seats', 4)
-
-                    estimated_fares.append({
-                        'service_name': service.name,
-                        'estimated_price': estimated_price,
-                        'number_of_seats': seats,
-                        'icon': icon,
-                        'description': description,
-                    })
+                quotes = quote_daily(distance, time_minutes, snapshot=tariffs, surge=surge)
         else:
             messages.error(request, f"No distance defined for route: {pickup} to {dropoff}")
 
-    # For rental, expose RentalPackage and selected_package_id in context
-    if ride_type == 'rental':
-        from services.models import RentalService
-        selected_package_id = request.GET.get('rental_duration_id')
-        if selected_package_id:
-            try:
-                package = RentalPackage.objects.get(id=selected_package_id)
-                rental_services = RentalService.objects.filter(package=package).select_related('service_type')
-                services_list = [rental.service_type for rental in rental_services]
-            except RentalPackage.DoesNotExist:
-                services_list = []
-        else:
-            services_list = []
-    else:
-        services_list = ServiceType.objects.all() if pickup and dropoff else []
+        for quote in quotes:
+            service = quote.service
+            service_info = SERVICE_DETAILS.get(service.name, {})
+            estimated_fares.append({
+                'service_name': service.name,
+                'estimated_price': quote.estimated_price,
+                'number_of_seats': service.number_of_seats or service_info.get('default_seats', 4),
+                'icon': service_info.get('icon', 'fas fa-car'),
+                'description': service_info.get('description', ''),
+            })
 
-    rental_options = RentalPackage.objects.all() if ride_type == 'rental' else []
+    # For rental, expose RentalPackage and selected_package_id in context
+    selected_package_id = request.GET.get('rental_duration_id') if ride_type == 'rental' else None
+    rental_options = tariffs.rental_packages if ride_type == 'rental' else []
     location_ride_type = derive_ride_type(
         'daily',
         pickup_meta,
@@ -528,8 +431,8 @@ def choose_ride_view(request):
         'pickup_lng': pickup_lng,
         'drop_lat': drop_lat,
         'drop_lng': drop_lng,
-        'distance_km': dynamic_distance_km or '',
-        'duration_min': dynamic_duration_min or '',
+        'distance_km': route_distance_km,
+        'duration_min': route_duration_min,
         'pickup_city': pickup_city,
         'pickup_district': pickup_district,
         'pickup_state': pickup_state,
@@ -544,7 +447,7 @@ def choose_ride_view(request):
         'ride_type_notice': ride_type_notice,
         'estimated_fares': estimated_fares,
         'services': estimated_fares,  
-        'rental_packages': RentalPackage.objects.all() if ride_type == 'rental' else [],
+        'rental_packages': rental_options,
         'selected_package_id': int(selected_package_id) if ride_type == 'rental' and selected_package_id else None,
         'rental_options': rental_options,
         'outstation_distance_km': outstation_threshold_km,
@@ -720,6 +623,8 @@ def submit_rating(request, booking_id):
 
     try:
         rating_value = int(rating_raw)
+        if rating_value < 1 or rating_value > 5:
+            raise ValueError("Rating must be between 1 and 5")
     except (TypeError, ValueError):
         messages.error(request, "Invalid rating value.")
         return redirect('profile_section', section='rating-and-feedback')
@@ -727,17 +632,25 @@ def submit_rating(request, booking_id):
     # IMPORTANT: booking_id here is the Booking PK (because we now post ride.pk from the template)
     booking = get_object_or_404(Booking, pk=booking_id, user=passenger)
 
-    rating_obj, created = Rating.objects.update_or_create(
-        booking=booking,
-        User=request.user,  
-        driver=booking.driver,  # can be None; allowed by your model
-        defaults={
-            "rating": rating_value,
-            "comments": feedback_text,
-            "given_by": "user",
-            # don't pass created_at; auto_now_add handles it
-        }
-    )
+    with transaction.atomic():
+        previous = (
+            Rating.objects.select_for_update()
+            .filter(booking=booking, User=request.user, driver=booking.driver)
+            .values_list('rating', flat=True)
+            .first()
+        )
+        rating_obj, created = Rating.objects.update_or_create(
+            booking=booking,
+            User=request.user,  
+            driver=booking.driver,  # can be None; allowed by your model
+            defaults={
+                "rating": rating_value,
+                "comments": feedback_text,
+                "given_by": "user",
+                # don't pass created_at; auto_now_add handles it
+            }
+        )
+        record_rating(rating_obj, previous=None if created else previous)
 
     if created:
         messages.success(request, "Thank you! Your rating has been submitted.")
@@ -841,8 +754,10 @@ def book_ride_view(request):
     pickup_lng = request.GET.get('pickup_lng') or request.session.get('pickup_lng')
     drop_lat = request.GET.get('drop_lat') or request.session.get('drop_lat')
     drop_lng = request.GET.get('drop_lng') or request.session.get('drop_lng')
-    distance_value = parse_decimal(distance_km)
-    duration_value = parse_decimal(duration_min)
+    distance_value, duration_value = trip_metrics(
+        pickup_lat, pickup_lng, drop_lat, drop_lng,
+        parse_decimal(distance_km), parse_decimal(duration_min),
+    )
     if distance_value is None or distance_value <= 0 or duration_value is None or duration_value <= 0:
         messages.error(request, "Unable to verify route distance. Please select suggested locations and try again.")
         return redirect('choose_ride')
@@ -872,8 +787,8 @@ def book_ride_view(request):
     request.session['drop_city'] = drop_city
     request.session['drop_district'] = drop_district
     request.session['drop_state'] = drop_state
-    request.session['distance_km'] = distance_km
-    request.session['duration_min'] = duration_min
+    request.session['distance_km'] = str(distance_value)
+    request.session['duration_min'] = str(duration_value)
     request.session['pickup_lat'] = pickup_lat
     request.session['pickup_lng'] = pickup_lng
     request.session['drop_lat'] = drop_lat
@@ -894,8 +809,8 @@ def book_ride_view(request):
         'drop_city': drop_city,
         'drop_district': drop_district,
         'drop_state': drop_state,
-        'distance_km': distance_km,
-        'duration_min': duration_min,
+        'distance_km': distance_value,
+        'duration_min': duration_value,
         'pickup_lat': pickup_lat,
         'pickup_lng': pickup_lng,
         'drop_lat': drop_lat,
@@ -966,8 +881,10 @@ def confirm_booking(request):
                 'ride_type': ride_type
             })
 
-        distance_value = parse_decimal(distance_km)
-        duration_value = parse_decimal(duration_min)
+        distance_value, duration_value = trip_metrics(
+            pickup_lat_raw, pickup_lng_raw, drop_lat_raw, drop_lng_raw,
+            parse_decimal(distance_km), parse_decimal(duration_min),
+        )
         if distance_value is None or distance_value <= 0 or duration_value is None or duration_value <= 0:
             return render(request, 'passenger/ride_confirmed.html', {
                 'error': 'Route distance could not be verified. Please go back and reselect pickup/dropoff from suggestions.',
@@ -1054,30 +971,40 @@ def confirm_booking(request):
 
         # ===== Find matching drivers =====
         matching_drivers = Driver.objects.filter(
-            vehicle_type__iexact=selected_vehicle_type,
+            service_type=service_type_obj,
             availability=True,
             status='Active',
             is_deleted=False
         )
 
-        if matching_drivers.exists():
-            from django.utils import timezone
-            booking_option = "now" if (not ride_date_str or not ride_time_str) else "later"
-            if booking_option == "now":
+        booking_option = "now" if (not ride_date_str or not ride_time_str) else "later"
+        if booking_option == "now":
+            scheduled_time_value = timezone.now()
+        else:
+            scheduled_time_value = None
+            if ride_date_str and ride_time_str:
+                try:
+                    scheduled_time_value = timezone.datetime.strptime(
+                        f"{ride_date_str} {ride_time_str}", "%Y-%m-%d %H:%M"
+                    )
+                    scheduled_time_value = timezone.make_aware(scheduled_time_value)
+                except ValueError:
+                    print(f"DEBUG: Could not parse scheduled time: {ride_date_str} {ride_time_str}")
+            if scheduled_time_value is None:
                 scheduled_time_value = timezone.now()
-            else:
-                scheduled_time_value = None
-                if ride_date_str and ride_time_str:
-                    try:
-                        scheduled_time_value = timezone.datetime.strptime(
-                            f"{ride_date_str} {ride_time_str}", "%Y-%m-%d %H:%M"
-                        )
-                        scheduled_time_value = timezone.make_aware(scheduled_time_value)
-                    except ValueError:
-                        print(f"DEBUG: Could not parse scheduled time: {ride_date_str} {ride_time_str}")
-                if scheduled_time_value is None:
-                    scheduled_time_value = timezone.now()
 
+        # Rides further ahead than the dispatch lead time wait in the scheduler instead
+        hold_for_scheduler = is_prebooked(scheduled_time_value)
+        if hold_for_scheduler:
+            held_ride = overlapping_scheduled_ride(request.user, scheduled_time_value, int(duration_value))
+            if held_ride:
+                messages.error(
+                    request,
+                    f"You already have a ride scheduled for {timezone.localtime(held_ride.scheduled_time):%d %b, %I:%M %p}."
+                )
+                return redirect('waiting_for_driver', ride_request_id=held_ride.id)
+
+        if hold_for_scheduler or matching_drivers.exists():
             try:
                 pickup_latitude = parse_decimal(pickup_lat_raw)
                 pickup_longitude = parse_decimal(pickup_lng_raw)
@@ -1115,48 +1042,21 @@ def confirm_booking(request):
                     duration_min=int(duration_value),
                     service_type=service_type_obj,
                     scheduled_time=scheduled_time_value,
-                    status='Requested',
+                    status='Scheduled' if hold_for_scheduler else 'Requested',
                     payment_mode=payment_mode 
                 )
                 print(f"[DEBUG] Ride request created with ID: {ride_request.id}, Payment Mode: {payment_mode}")
 
-                # ===== Compute candidate driver queue: order by rating desc, shuffle ties =====
-                # Group drivers by rating, shuffle within each rating, then flatten
-                from collections import defaultdict
-                import random
-
-                rating_to_drivers = defaultdict(list)
-                for d in matching_drivers:
-                    rating_value = float(d.rating or 0.0)
-                    rating_to_drivers[rating_value].append(d)
-
-                ordered_ratings = sorted(rating_to_drivers.keys(), reverse=True)
-                candidate_ids = []
-                for r in ordered_ratings:
-                    group = rating_to_drivers[r]
-                    random.shuffle(group)
-                    candidate_ids.extend([d.driver_id for d in group])
-
-                # Persist queue in cache for 10 minutes
-                queue_key = f"ride_request:{ride_request.id}:driver_queue"
-                cache.set(queue_key, candidate_ids, timeout=60 * 10)
-
-                # Assign the first available driver immediately (soft assignment)
-                if candidate_ids:
-                    first_driver_id = candidate_ids[0]
-                    try:
-                        assigned_driver = Driver.objects.get(driver_id=first_driver_id)
-                        ride_request.driver = assigned_driver
-                        ride_request.save(update_fields=['driver'])
-                        print(
-                            f"[DEBUG][ride_dispatch] RideRequest {ride_request.id} "
-                            f"sent to Driver ID={assigned_driver.driver_id}, "
-                            f"VehicleType={assigned_driver.vehicle_type}, "
-                            f"Status={assigned_driver.status}, "
-                            f"Timestamp={timezone.now().isoformat()}"
-                        )
-                    except Driver.DoesNotExist:
-                        pass
+                if hold_for_scheduler:
+                    messages.success(
+                        request,
+                        f"Ride scheduled for {timezone.localtime(scheduled_time_value):%d %b, %I:%M %p}. "
+                        "We will find you a driver shortly before pickup."
+                    )
+                    return redirect('waiting_for_driver', ride_request_id=ride_request.id)
+
+                # Candidate queue (nearest first, rating as tie-breaker) and the first offer(s)
+                start_dispatch(ride_request, matching_drivers)
 
             except Exception as e:
                 print(f"ERROR: Failed to create ride request: {e}")
@@ -1181,9 +1081,10 @@ def confirm_booking(request):
 @require_POST
 def reassign_next_driver(request, ride_request_id):
     """
-    Reassign the ride request to the next available driver from the cached queue
+    Reassign the ride request to the next available driver from the shared dispatch queue
     if the current assigned driver has not accepted within the allowed time.
-    Simple, stateless trigger suitable for JS timer/polling.
+    The run_dispatcher command does the same server-side; this remains as a
+    client-side fallback and is a no-op if the dispatcher already moved on.
     """
     try:
         ride_request = RideRequest.objects.select_related('booking', 'user', 'service_type').get(id=ride_request_id)
@@ -1198,45 +1099,21 @@ def reassign_next_driver(request, ride_request_id):
     if ride_request.status in ['Accepted', 'Rejected', 'Expired'] or getattr(ride_request, 'booking', None):
         return JsonResponse({'success': True, 'message': 'Ride already resolved'})
 
-    queue_key = f"ride_request:{ride_request.id}:driver_queue"
-    candidate_ids = cache.get(queue_key) or []
+    # The current driver(s) still have time to respond (e.g. the dispatcher just moved on)
+    deadline = offer_deadline(ride_request)
+    if deadline and deadline > timezone.now():
+        return JsonResponse({'success': True, 'driver_id': ride_request.driver_id, 'message': 'Offer still pending'})
 
-    # Remove current assignment from queue head if it matches
-    if ride_request.driver_id and candidate_ids and candidate_ids[0] == ride_request.driver_id:
-        candidate_ids = candidate_ids[1:]
-
-    # Find the next available driver
-    next_driver = None
-    while candidate_ids:
-        candidate_id = candidate_ids[0]
-        try:
-            d = Driver.objects.get(driver_id=candidate_id, availability=True, status='Active', is_deleted=False)
-        except Driver.DoesNotExist:
-            candidate_ids = candidate_ids[1:]
-            continue
-        next_driver = d
-        break
-
-    # Update cache with the remaining queue
-    cache.set(queue_key, candidate_ids, timeout=60 * 10)
-
-    if next_driver is None:
-        # No more drivers available, mark as expired
-        ride_request.status = 'Expired'
-        ride_request.save(update_fields=['status'])
-        return JsonResponse({'success': True, 'exhausted': True})
-
-    # Soft-assign to next driver
-    ride_request.driver = next_driver
-    ride_request.save(update_fields=['driver'])
-    print(
-        f"[DEBUG][ride_dispatch] RideRequest {ride_request.id} "
-        f"sent to Driver ID={next_driver.driver_id}, "
-        f"VehicleType={next_driver.vehicle_type}, "
-        f"Status={next_driver.status}, "
-        f"Timestamp={timezone.now().isoformat()}"
+    ride_request, drivers = advance_ride_request(
+        ride_request.id,
+        expected_driver_id=ride_request.driver_id,
+        expected_offered_at=ride_request.offered_at,
     )
-    return JsonResponse({'success': True, 'driver_id': next_driver.driver_id})
+    if ride_request is None:
+        return JsonResponse({'success': True, 'message': 'Ride already resolved'})
+    if not drivers:
+        return JsonResponse({'success': True, 'exhausted': True})
+    return JsonResponse({'success': True, 'driver_id': drivers[0].driver_id})
 
 @login_required
 def waiting_for_driver_view(request, ride_request_id):
@@ -1279,6 +1156,7 @@ def waiting_for_driver_view(request, ride_request_id):
 
     return render(request, 'passenger/waiting_for_driver.html', {
         'ride_request_id': ride_request.id,
+        'is_scheduled': ride_request.status == 'Scheduled',
         'pickup': pickup,
         'dropoff': dropoff,
         'fare': fare,
@@ -1296,9 +1174,11 @@ def waiting_for_driver_view(request, ride_request_id):
 
 @login_required
 @require_POST
+@transaction.atomic
 def cancel_ride_request(request, ride_request_id):
     try:
-        ride_request = RideRequest.objects.select_related('booking').get(
+        # Locked so a held ride cannot be released by dispatch.scheduler mid-cancel
+        ride_request = RideRequest.objects.select_for_update().get(
             id=ride_request_id,
             user=request.user,
         )
@@ -1307,8 +1187,12 @@ def cancel_ride_request(request, ride_request_id):
 
     ride_request.status = 'Cancelled'
     ride_request.save(update_fields=['status'])
+    notify_driver_id = ride_request.booking.driver_id if ride_request.booking else ride_request.driver_id
+    publish_ride_status(ride_request, ride_request.booking, status='Cancelled', driver_id=notify_driver_id)
+    retract_offers(ride_request)
 
     if ride_request.booking:
+        prior_status = ride_request.booking.status
         ride_request.booking.status = 'CancelledByPassenger'
         ride_request.booking.cancelled_by = 'passenger'
         ride_request.booking.cancellation_reason = 'Passenger cancelled the ride'
@@ -1319,6 +1203,10 @@ def cancel_ride_request(request, ride_request_id):
             'status', 'cancelled_by', 'cancellation_reason',
             'cancellation_stage', 'cancelled_at', 'driver'
         ])
+        # The driver is unassigned, so the booking drops out of their stats
+        record_booking_status(ride_request.booking, prior_status, None, driver_id=notify_driver_id)
+        if prior_status not in ('Completed', 'Cancelled', 'CancelledByDriver', 'CancelledByPassenger'):
+            record_passenger_ride(request.user.id, cancelled=True)
 
         ride_pin = RidePin.objects.filter(booking=ride_request.booking).first()
         if ride_pin:
@@ -1365,12 +1253,14 @@ def check_driver_assignment(request, ride_request_id):
 
 @login_required
 @require_POST
+@transaction.atomic
 def cancel_booking(request):
     booking_id = request.POST.get('booking_id')
     print(f"DEBUG: Attempting to cancel booking ID: {booking_id}")
     try:
-        # Ensure the booking belongs to the current user
-        booking = Booking.objects.get(booking_id=booking_id, user=request.user)
+        # Ensure the booking belongs to the current user; the row lock makes a
+        # concurrent second cancel see the first one's status
+        booking = Booking.objects.select_for_update().get(booking_id=booking_id, user=request.user)
         print(
             f"[DEBUG][passenger.cancel_booking] user_id={request.user.id} "
             f"booking_id={booking.booking_id} status_before={booking.status}"
@@ -1389,6 +1279,8 @@ def cancel_booking(request):
             print(f"DEBUG: Booking #{booking_id} cancellation blocked in invalid state: {current_status}")
             return redirect('homepage')
 
+        prior_status = booking.status
+        prior_driver_id = booking.driver_id
         booking.status = 'CancelledByPassenger'
         booking.cancelled_by = 'passenger'
         booking.cancellation_reason = 'Passenger cancelled the ride'
@@ -1399,6 +1291,10 @@ def cancel_booking(request):
             'status', 'cancelled_by', 'cancellation_reason',
             'cancellation_stage', 'cancelled_at', 'driver'
         ])
+        record_booking_status(booking, prior_status, None, driver_id=prior_driver_id)
+        record_passenger_ride(request.user.id, cancelled=True)
+        # Sent on commit, after the cancellation is saved
+        publish_ride_status(booking=booking, driver_id=prior_driver_id)
 
         # Invalidate ride PIN if present
         ride_pin = getattr(booking, 'ride_pin', None)
@@ -1434,12 +1330,10 @@ def booking_confirmed_view(request, booking_id):
 
     ride_pin_obj = RidePin.objects.filter(booking=booking).first()
     if not ride_pin_obj:
-        from django.contrib.auth.hashers import make_password
-        import random
-        pin_value = f"{random.randint(0, 9999):04d}"
+        pin_value = new_pin()
         ride_pin_obj = RidePin.objects.create(
             booking=booking,
-            pin_hash=make_password(pin_value),
+            pin_hash=hash_pin(pin_value),
             pin_plain=pin_value,
             attempts=0,
             locked_until=None,
@@ -1473,7 +1367,7 @@ def check_ride_status(request, ride_request_id):
     if getattr(ride_request, 'booking', None):
         return JsonResponse({'status': 'Confirmed', 'booking_id': ride_request.booking.booking_id})
 
-    if ride_request.status in ["Rejected", "Expired", "Cancelled"]:
+    if ride_request.status in ["Scheduled", "Rejected", "Expired", "Cancelled"]:
         return JsonResponse({'status': ride_request.status})
     return JsonResponse({'status': 'Requested'})
 
@@ -1486,12 +1380,10 @@ def booking_confirmed_view(request, booking_id):
     ride_pin_obj = RidePin.objects.filter(booking=booking).first()
     if not ride_pin_obj:
         # Safety net: generate if missing
-        from django.contrib.auth.hashers import make_password
-        import random
-        pin_value = f"{random.randint(0, 9999):04d}"
+        pin_value = new_pin()
         ride_pin_obj = RidePin.objects.create(
             booking=booking,
-            pin_hash=make_password(pin_value),
+            pin_hash=hash_pin(pin_value),
             pin_plain=pin_value,
             attempts=0,
             locked_until=None,
@@ -0,0 +1,63 @@
+"""
+Earnings ledger: the fare split of every completed booking.
+
+split_fare() is the single definition of how a fare is divided. Tax is backed
+out of the fare, the booking fee goes to the platform, and the rest is shared
+by admin and provider commission percentages. record_earnings() stores the
+split as an EarningsEntry when a ride completes, and every earnings or
+commission figure is summed from those entries.
+"""
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.utils import timezone
+
+from .models import EarningsEntry
+
+CENT = Decimal("0.01")
+
+
+def _money(value):
+    return value.quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def split_fare(fare, service):
+    """The parts of `fare` under `service`'s current tax, fee and commission rates."""
+    fare_total = Decimal(fare or 0)
+    tax_percentage = Decimal(service.tax_percentage or 0) if service else Decimal(0)
+    admin_percentage = Decimal(service.admin_commission or 0) if service else Decimal(0)
+    provider_percentage = Decimal(service.provider_commission or 0) if service else Decimal(0)
+    booking_fee = Decimal(service.booking_fee or 0) if service else Decimal(0)
+
+    if tax_percentage > 0:
+        subtotal_before_tax = fare_total / (1 + tax_percentage / Decimal(100))
+    else:
+        subtotal_before_tax = fare_total
+
+    components_excl_booking = subtotal_before_tax - booking_fee
+    return {
+        'gross_fare': _money(fare_total),
+        'tax_amount': _money(fare_total - subtotal_before_tax),
+        'booking_fee': _money(booking_fee),
+        'admin_commission': _money(components_excl_booking * admin_percentage / Decimal(100)),
+        'driver_earning': _money(components_excl_booking * provider_percentage / Decimal(100)),
+        'tax_percentage': tax_percentage,
+        'admin_commission_percentage': admin_percentage,
+        'provider_commission_percentage': provider_percentage,
+    }
+
+
+def record_earnings(booking):
+    """
+    Write the ledger entry for a completed `booking` (a no-op if it already
+    has one) and return it. Call inside the transaction that completes the ride.
+    """
+    entry = EarningsEntry.objects.filter(booking=booking).first()
+    if entry is not None:
+        return entry
+    return EarningsEntry.objects.create(
+        booking=booking,
+        driver_id=booking.driver_id,
+        service_type=booking.service_type,
+        ride_time=booking.scheduled_time or timezone.now(),
+        **split_fare(booking.fare, booking.service_type),
+    )
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from booking.models import Booking
+from payments.ledger import record_earnings
+
+
+class Command(BaseCommand):
+    help = (
+        "Write earnings ledger entries for completed bookings that have none, using "
+        "the current service rates. Run once after deploying the ledger, then rebuild_driver_stats."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        missing = (
+            Booking.objects
+            .filter(status='Completed', driver__isnull=False, earnings_entry__isnull=True)
+            .select_related('service_type')
+            .order_by('booking_id')
+        )
+        batch_size = options['batch_size']
+        count = 0
+        last_id = 0
+        while True:
+            batch = list(missing.filter(booking_id__gt=last_id)[:batch_size])
+            if not batch:
+                break
+            with transaction.atomic():
+                for booking in batch:
+                    record_earnings(booking)
+            count += len(batch)
+            last_id = batch[-1].booking_id
+        self.stdout.write(self.style.SUCCESS(f"Wrote {count} earnings entr{'y' if count == 1 else 'ies'}."))
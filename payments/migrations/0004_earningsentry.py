@@ -0,0 +1,39 @@
+# Generated by Django 5.2.4 on 2026-10-18 17:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0010_riderequest_offered_at'),
+        ('driver', '0007_driverstats'),
+        ('payments', '0003_payment_created_at'),
+        ('services', '0004_remove_fareslab_booking_fee'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EarningsEntry',
+            fields=[
+                ('entry_id', models.AutoField(primary_key=True, serialize=False)),
+                ('ride_time', models.DateTimeField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('gross_fare', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('tax_amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('booking_fee', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('admin_commission', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('driver_earning', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('tax_percentage', models.DecimalField(decimal_places=2, max_digits=5)),
+                ('admin_commission_percentage', models.DecimalField(decimal_places=2, max_digits=5)),
+                ('provider_commission_percentage', models.DecimalField(decimal_places=2, max_digits=5)),
+                ('booking', models.OneToOneField(on_delete=django.db.models.deletion.PROTECT, related_name='earnings_entry', to='booking.booking')),
+                ('driver', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='earnings_entries', to='driver.driver')),
+                ('service_type', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='services.servicetype')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['driver', 'ride_time'], name='payments_ea_driver__0f0eed_idx'), models.Index(fields=['ride_time'], name='payments_ea_ride_ti_754b2c_idx')],
+            },
+        ),
+    ]
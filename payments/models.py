@@ -2,6 +2,8 @@ from django.utils import timezone
 from django.db import models
 from passenger.models import User
 from booking.models import Booking
+from driver.models import Driver
+from services.models import ServiceType
 
 class Payment(models.Model):
     PAYMENT_STATUS_CHOICES = [
@@ -31,4 +33,47 @@ class Payment(models.Model):
     def save(self, *args, **kwargs):
         if self.status == "completed" and self.paid_at is None:
             self.paid_at = timezone.now()
-        super().save(*args, **kwargs)
\ No newline at end of file
+        super().save(*args, **kwargs)
+
+
+class EarningsEntry(models.Model):
+    """
+    How a completed booking's fare was split, written once at ride completion
+    by payments.ledger.record_earnings() with the rates in force at that time.
+    Entries are never updated or deleted, so later tariff edits do not change
+    past earnings.
+    """
+    entry_id = models.AutoField(primary_key=True)
+    booking = models.OneToOneField(Booking, on_delete=models.PROTECT, related_name='earnings_entry')
+    driver = models.ForeignKey(Driver, on_delete=models.PROTECT, related_name='earnings_entries')
+    service_type = models.ForeignKey(ServiceType, on_delete=models.SET_NULL, null=True, blank=True)
+    ride_time = models.DateTimeField()  # booking.scheduled_time; earnings are dated by the ride
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    gross_fare = models.DecimalField(max_digits=10, decimal_places=2)
+    tax_amount = models.DecimalField(max_digits=10, decimal_places=2)
+    booking_fee = models.DecimalField(max_digits=10, decimal_places=2)
+    admin_commission = models.DecimalField(max_digits=10, decimal_places=2)
+    driver_earning = models.DecimalField(max_digits=10, decimal_places=2)
+
+    # Rates used for the split, for auditing
+    tax_percentage = models.DecimalField(max_digits=5, decimal_places=2)
+    admin_commission_percentage = models.DecimalField(max_digits=5, decimal_places=2)
+    provider_commission_percentage = models.DecimalField(max_digits=5, decimal_places=2)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['driver', 'ride_time']),
+            models.Index(fields=['ride_time']),
+        ]
+
+    def __str__(self):
+        return f"Earnings for Booking #{self.booking_id} - {self.driver_earning}"
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError("Earnings entries are append-only.")
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise ValueError("Earnings entries are append-only.")
@@ -3,11 +3,19 @@ from django.contrib import messages
 from .models import PromoCode
 from .forms import PromoCodeForm
 from django.utils.timezone import now
+from adminpanel.listing import apply_filters, apply_search, keyset_page
 
 # View all promo codes
 def promo_dashboard(request):
-    promos = PromoCode.objects.all().order_by('-start_time')
-    return render(request, 'promo/promo_dashboard.html', {'promos': promos, 'now': now()})
+    promos = apply_search(PromoCode.objects.all(), request.GET.get('q'), ['code'], id_field='promo_id')
+    promos = apply_filters(promos, request, {'type': 'type'})
+    page = keyset_page(request, promos, ['-start_time', '-promo_id'])
+    return render(request, 'promo/promo_dashboard.html', {
+        'promos': page.items,
+        'page': page,
+        'now': now(),
+        'filters': [('type', 'All types', PromoCode.PROMO_TYPE_CHOICES)],
+    })
 
 # Add promo code
 def add_promo(request):
@@ -0,0 +1,150 @@
+"""
+Per-driver and per-passenger rating aggregates.
+
+Every Rating written by submit_rating (passenger rates driver) or
+submit_driver_rating (driver rates passenger) is folded into the rated
+party's summary row under a row lock: count, sum, all-time average and an
+exponentially decayed recent average, where each new rating moves the
+recent average RATING_RECENT_WEIGHT of the way towards itself. The driver's
+all-time average is also copied to Driver.rating, which dispatch sorts on.
+Passenger summaries also count completed and passenger-cancelled bookings
+(record_passenger_ride), for the driver's ride request popup.
+`python manage.py backfill_rating_summaries` rebuilds everything from the
+Rating table.
+"""
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Q
+
+from booking.models import Booking
+from driver.models import Driver
+
+from .models import DriverRatingSummary, PassengerRatingSummary, Rating
+
+BATCH_SIZE = 1000
+
+
+def get_recent_weight() -> float:
+    return float(getattr(settings, "RATING_RECENT_WEIGHT", 0.1))
+
+
+def _average(rating_sum, rating_count):
+    if not rating_count:
+        return None
+    return (Decimal(rating_sum) / rating_count).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+
+
+def _target(rating):
+    """(summary model, lookup) of whoever received `rating`, or (None, None)."""
+    if rating.given_by == 'user' and rating.driver_id:
+        return DriverRatingSummary, {'driver_id': rating.driver_id}
+    if rating.given_by == 'driver' and rating.User_id:
+        return PassengerRatingSummary, {'user_id': rating.User_id}
+    return None, None
+
+
+def record_rating(rating, previous=None):
+    """
+    Fold a saved Rating into its summary. `previous` is the old value when an
+    existing rating was edited: the sum is corrected and the recent average
+    nudged by the difference, without counting the rating twice.
+    """
+    model, lookup = _target(rating)
+    if model is None:
+        return None
+    value = int(rating.rating)
+    weight = get_recent_weight()
+    with transaction.atomic():
+        model.objects.get_or_create(**lookup)
+        summary = model.objects.select_for_update().get(**lookup)
+        if previous is None:
+            summary.rating_count += 1
+            summary.rating_sum += value
+            if summary.recent_average is None:
+                summary.recent_average = float(value)
+            else:
+                summary.recent_average += weight * (value - summary.recent_average)
+        else:
+            summary.rating_sum += value - int(previous)
+            if summary.recent_average is not None:
+                # Exact when the edited rating is the latest one (it always is for a first rating)
+                summary.recent_average += (1.0 if summary.rating_count == 1 else weight) * (value - int(previous))
+        summary.average_rating = _average(summary.rating_sum, summary.rating_count)
+        summary.save()
+        if model is DriverRatingSummary:
+            Driver.objects.filter(driver_id=rating.driver_id).update(rating=summary.average_rating)
+    return summary
+
+
+def record_passenger_ride(user_id, cancelled=False):
+    """Count one of a passenger's bookings as completed, or as cancelled by them."""
+    if not user_id:
+        return
+    field = 'cancelled_rides' if cancelled else 'completed_rides'
+    with transaction.atomic():
+        PassengerRatingSummary.objects.get_or_create(user_id=user_id)
+        PassengerRatingSummary.objects.filter(user_id=user_id).update(**{field: F(field) + 1})
+
+
+def _summaries(ratings, subject_field, model, key):
+    """Build unsaved summary rows from (subject id, value) pairs ordered by subject then time."""
+    weight = get_recent_weight()
+    current = None
+    for subject_id, value in ratings.values_list(subject_field, 'rating').order_by(subject_field, 'created_at', 'pk').iterator(chunk_size=BATCH_SIZE):
+        if current is None or getattr(current, key) != subject_id:
+            if current is not None:
+                current.average_rating = _average(current.rating_sum, current.rating_count)
+                yield current
+            current = model(**{key: subject_id}, recent_average=float(value))
+        else:
+            current.recent_average += weight * (value - current.recent_average)
+        current.rating_count += 1
+        current.rating_sum += value
+    if current is not None:
+        current.average_rating = _average(current.rating_sum, current.rating_count)
+        yield current
+
+
+def rebuild_rating_summaries():
+    """Recompute every driver and passenger summary from Rating. Returns (drivers, passengers) rebuilt."""
+    with transaction.atomic():
+        DriverRatingSummary.objects.all().delete()
+        PassengerRatingSummary.objects.all().delete()
+
+        drivers = list(_summaries(
+            Rating.objects.filter(given_by='user', driver__isnull=False),
+            'driver_id', DriverRatingSummary, 'driver_id',
+        ))
+        DriverRatingSummary.objects.bulk_create(drivers, batch_size=BATCH_SIZE)
+        # Drivers with no ratings left keep no stale average
+        Driver.objects.exclude(rating__isnull=True).update(rating=None)
+        Driver.objects.bulk_update(
+            [Driver(driver_id=s.driver_id, rating=s.average_rating) for s in drivers],
+            ['rating'], batch_size=BATCH_SIZE,
+        )
+
+        passengers = {
+            summary.user_id: summary
+            for summary in _summaries(
+                Rating.objects.filter(given_by='driver', User__isnull=False),
+                'User_id', PassengerRatingSummary, 'user_id',
+            )
+        }
+        rides = (
+            Booking.objects
+            .filter(user__isnull=False)
+            .values('user_id')
+            .annotate(
+                completed=Count('booking_id', filter=Q(status='Completed')),
+                cancelled=Count('booking_id', filter=Q(cancelled_by='passenger')),
+            )
+            .filter(Q(completed__gt=0) | Q(cancelled__gt=0))
+        )
+        for row in rides.iterator(chunk_size=BATCH_SIZE):
+            summary = passengers.setdefault(row['user_id'], PassengerRatingSummary(user_id=row['user_id']))
+            summary.completed_rides = row['completed']
+            summary.cancelled_rides = row['cancelled']
+        PassengerRatingSummary.objects.bulk_create(passengers.values(), batch_size=BATCH_SIZE)
+    return len(drivers), len(passengers)
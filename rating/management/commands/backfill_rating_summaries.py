@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from rating.aggregates import rebuild_rating_summaries
+
+
+class Command(BaseCommand):
+    help = "Rebuild the per-driver and per-passenger rating summaries (and Driver.rating) from all Rating rows."
+
+    def handle(self, *args, **options):
+        drivers, passengers = rebuild_rating_summaries()
+        self.stdout.write(self.style.SUCCESS(
+            f"Rating summaries rebuilt for {drivers} driver(s) and {passengers} passenger(s)."
+        ))
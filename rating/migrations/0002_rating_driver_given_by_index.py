@@ -0,0 +1,21 @@
+# Generated by Django 5.2.4 on 2026-10-18 17:31
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0011_booking_riderequest_status_indexes'),
+        ('driver', '0008_driver_matching_index'),
+        ('rating', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='rating',
+            index=models.Index(fields=['driver', 'given_by'], name='rating_rati_driver__b2a252_idx'),
+        ),
+    ]
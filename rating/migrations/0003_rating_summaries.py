@@ -0,0 +1,39 @@
+# Generated by Django 5.2.4 on 2026-10-18 17:45
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('driver', '0009_driver_service_type'),
+        ('passenger', '0003_alter_user_phone'),
+        ('rating', '0002_rating_driver_given_by_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DriverRatingSummary',
+            fields=[
+                ('driver', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='rating_summary', serialize=False, to='driver.driver')),
+                ('rating_count', models.PositiveIntegerField(default=0)),
+                ('rating_sum', models.PositiveIntegerField(default=0)),
+                ('average_rating', models.DecimalField(blank=True, decimal_places=2, max_digits=3, null=True)),
+                ('recent_average', models.FloatField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='PassengerRatingSummary',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='rating_summary', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('rating_count', models.PositiveIntegerField(default=0)),
+                ('rating_sum', models.PositiveIntegerField(default=0)),
+                ('average_rating', models.DecimalField(blank=True, decimal_places=2, max_digits=3, null=True)),
+                ('recent_average', models.FloatField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.4 on 2026-10-18 17:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rating', '0003_rating_summaries'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='passengerratingsummary',
+            name='cancelled_rides',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='passengerratingsummary',
+            name='completed_rides',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
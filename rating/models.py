@@ -32,8 +32,51 @@ class Rating(models.Model):
     class Meta:
         unique_together = ('booking', 'given_by')  # Prevents duplicate ratings for same booking by same entity
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['driver', 'given_by']),
+        ]
     
     def __str__(self):
         return f"{self.rating} star rating for booking #{self.booking.booking_id} by {self.given_by}"
 
 
+
+class DriverRatingSummary(models.Model):
+    """
+    Running aggregate of the ratings passengers gave a driver, kept up to date
+    by rating.aggregates.record_rating() so pages never run Avg() over Rating.
+    """
+    driver = models.OneToOneField(Driver, on_delete=models.CASCADE, primary_key=True, related_name='rating_summary')
+    rating_count = models.PositiveIntegerField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0)
+    average_rating = models.DecimalField(max_digits=3, decimal_places=2, null=True, blank=True)
+    recent_average = models.FloatField(null=True, blank=True)  # exponentially decayed, see RATING_RECENT_WEIGHT
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Driver #{self.driver_id}: {self.average_rating} from {self.rating_count} ratings"
+
+
+class PassengerRatingSummary(models.Model):
+    """
+    A passenger's reputation as drivers see it: running aggregate of the
+    ratings drivers gave them (see DriverRatingSummary) plus completed and
+    passenger-cancelled bookings, read by primary key for ride request popups.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='rating_summary')
+    rating_count = models.PositiveIntegerField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0)
+    average_rating = models.DecimalField(max_digits=3, decimal_places=2, null=True, blank=True)
+    recent_average = models.FloatField(null=True, blank=True)
+    completed_rides = models.PositiveIntegerField(default=0)
+    cancelled_rides = models.PositiveIntegerField(default=0)  # bookings the passenger cancelled
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @property
+    def cancellation_rate(self):
+        """Share of the passenger's finished bookings that they cancelled, or None before the first one."""
+        finished = self.completed_rides + self.cancelled_rides
+        return round(self.cancelled_rides / finished, 2) if finished else None
+
+    def __str__(self):
+        return f"Passenger #{self.user_id}: {self.average_rating} from {self.rating_count} ratings"
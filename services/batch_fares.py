@@ -0,0 +1,169 @@
+"""
+Array-based fare quoting for many trips and every service at once.
+
+Used by the fare comparison API, tariff simulations and load tests. The
+formulas are the ones in services.fare_engine, evaluated with numpy over
+integer fixed-point amounts so results are exact:
+
+- distance is quantised to metres and duration to milli-minutes;
+- rates are held in paisa;
+- a subtotal is therefore an integer number of 1/1000 paisa, and the 5% tax
+  plus rounding up to the next whole rupee is one integer ceil-division.
+"""
+import math
+from dataclasses import dataclass
+from decimal import Decimal, ROUND_HALF_UP
+
+import numpy as np
+from django.conf import settings
+
+from .fare_engine import TAX_RATE, get_snapshot
+
+SCALE = 1000                 # metres per km, milli-minutes per minute
+PAISA_PER_RUPEE = 100
+TAX_PERCENT = int(TAX_RATE * 100)
+# subtotal units (1/1000 paisa) * (100 + tax%) -> whole rupees
+RUPEE_DIVISOR = SCALE * PAISA_PER_RUPEE * 100
+
+RIDE_TYPES = ('daily', 'outstation', 'rental')
+NO_FARE = -1
+
+
+def _paisa(value):
+    return int((Decimal(value or 0) * PAISA_PER_RUPEE).to_integral_value(rounding=ROUND_HALF_UP))
+
+
+def _scaled(value):
+    return int((Decimal(str(value)) * SCALE).to_integral_value(rounding=ROUND_HALF_UP))
+
+
+def _to_scaled_array(values, name, maximum):
+    """
+    Distances/durations -> int64 metres/milli-minutes (missing values count as 0).
+    Raises ValueError for a value that is not a finite number in 0..`maximum`.
+    """
+    floats = []
+    for value in values:
+        number = float(value) if value is not None else 0.0
+        if not math.isfinite(number) or number < 0 or number > maximum:
+            raise ValueError(f"{name} must be a number between 0 and {maximum}, got {value!r}")
+        floats.append(number)
+    return np.rint(np.array(floats, dtype=np.float64) * SCALE).astype(np.int64)
+
+
+def _ceil_div(a, b):
+    return -((-a) // b)
+
+
+@dataclass(frozen=True)
+class BatchQuote:
+    services: tuple          # ServiceTariff per column
+    fares_paisa: np.ndarray  # (trips, services) int64; NO_FARE where the service is not offered
+
+    def as_rupees(self, row):
+        """{service name: Decimal fare} for one trip, skipping services without a fare."""
+        return {
+            service.name: Decimal(int(paisa)) / PAISA_PER_RUPEE
+            for service, paisa in zip(self.services, self.fares_paisa[row])
+            if paisa != NO_FARE
+        }
+
+
+def _with_tax_and_rounding(subtotal):
+    """Subtotals in 1/1000 paisa -> fares in paisa, taxed and rounded up to whole rupees."""
+    rupees = _ceil_div(subtotal * (100 + TAX_PERCENT), RUPEE_DIVISOR)
+    return rupees * PAISA_PER_RUPEE
+
+
+def _daily_fares(service, distance, duration):
+    """Slab fares for one service; the latest-starting slab that covers a distance wins."""
+    base = np.full(distance.shape, _paisa(service.base_fare), dtype=np.int64)
+    per_km = np.full(distance.shape, _paisa(service.price_per_km), dtype=np.int64)
+    per_min = np.full(distance.shape, _paisa(service.price_per_minute), dtype=np.int64)
+
+    unassigned = np.ones(distance.shape, dtype=bool)
+    for slab in reversed(service.slabs):
+        hit = unassigned & (distance >= _scaled(slab.km_from)) & (distance <= _scaled(slab.km_to))
+        base[hit] = _paisa(slab.base_fare)
+        per_km[hit] = _paisa(slab.rate_per_km)
+        per_min[hit] = _paisa(slab.rate_per_minute)
+        unassigned &= ~hit
+
+    subtotal = (base + _paisa(service.booking_fee)) * SCALE + distance * per_km + duration * per_min
+    fares = _with_tax_and_rounding(subtotal)
+    return np.maximum(fares, _paisa(service.min_fare))
+
+
+def _outstation_fares(service, distance, duration):
+    subtotal = (
+        (_paisa(service.base_fare) + _paisa(service.booking_fee)) * SCALE
+        + distance * _paisa(service.price_per_km)
+        + duration * _paisa(service.price_per_minute)
+    )
+    return _with_tax_and_rounding(subtotal)
+
+
+def _rental_fares(snapshot, package_ids, columns, out):
+    for package_id in np.unique(package_ids):
+        package = snapshot.packages_by_id.get(int(package_id))
+        if package is None:
+            continue
+        rows = package_ids == package_id
+        distance = _scaled(package.distance_km)
+        duration = _scaled(package.time_hours * 60)
+        for rental in snapshot.rentals_by_package.get(package.id, ()):
+            subtotal = (
+                (_paisa(rental.base_fare) + _paisa(rental.booking_fee)) * SCALE
+                + distance * _paisa(rental.per_km_rate)
+                + duration * _paisa(rental.per_minute_rate)
+            )
+            out[rows, columns[rental.service.service_id]] = _with_tax_and_rounding(subtotal)
+
+
+def quote_batch(trips, exclude_outstation=(), snapshot=None):
+    """
+    Quote every service for each trip in `trips`, an iterable of
+    (distance_km, duration_min, ride_type) or (distance_km, duration_min,
+    'rental', package_id) tuples. Raises ValueError on an unknown ride type.
+    """
+    snapshot = snapshot or get_snapshot()
+    trips = list(trips)
+    n = len(trips)
+    services = snapshot.services
+    columns = {s.service_id: i for i, s in enumerate(services)}
+    out = np.full((n, len(services)), NO_FARE, dtype=np.int64)
+    if not n:
+        return BatchQuote(services, out)
+
+    codes = {ride_type: i for i, ride_type in enumerate(RIDE_TYPES)}
+    try:
+        kinds = np.fromiter((codes[trip[2] if len(trip) > 2 else 'daily'] for trip in trips), dtype=np.int8, count=n)
+    except KeyError as exc:
+        raise ValueError(f"Unknown ride type: {exc.args[0]}") from None
+    distance = _to_scaled_array(
+        [trip[0] for trip in trips], 'distance_km', getattr(settings, 'BATCH_QUOTE_MAX_DISTANCE_KM', 5000),
+    )
+    duration = _to_scaled_array(
+        [trip[1] for trip in trips], 'duration_min', getattr(settings, 'BATCH_QUOTE_MAX_DURATION_MIN', 6000),
+    )
+    package_ids = np.fromiter(
+        (int(trip[3]) if len(trip) > 3 and trip[3] is not None else -1 for trip in trips),
+        dtype=np.int64,
+        count=n,
+    )
+
+    daily = kinds == 0
+    outstation = kinds == 1
+    for col, service in enumerate(services):
+        if daily.any():
+            out[daily, col] = _daily_fares(service, distance[daily], duration[daily])
+        if outstation.any() and service.name not in exclude_outstation:
+            out[outstation, col] = _outstation_fares(service, distance[outstation], duration[outstation])
+
+    rental = kinds == 2
+    if rental.any():
+        rental_out = np.full((int(rental.sum()), len(services)), NO_FARE, dtype=np.int64)
+        _rental_fares(snapshot, package_ids[rental], columns, rental_out)
+        out[rental] = rental_out
+
+    return BatchQuote(services, out)
@@ -0,0 +1,261 @@
+"""
+In-memory tariff snapshot for fare quotes.
+
+ServiceType, FareSlab, RentalService and RentalPackage rows are loaded once into
+an immutable, versioned TariffSnapshot, so quoting every vehicle type costs no
+database queries. Saving or deleting any of those models bumps a version
+number in the shared cache (see services/signals.py); each process notices the
+new version within FARE_SNAPSHOT_CHECK_SECONDS and reloads.
+"""
+import bisect
+import math
+import threading
+import time
+from dataclasses import dataclass
+from decimal import Decimal
+from types import MappingProxyType
+from typing import Optional
+
+from django.conf import settings
+from django.core.cache import cache
+
+VERSION_KEY = "fare_engine:version"
+TAX_RATE = Decimal('0.05')
+ZERO = Decimal('0')
+
+
+@dataclass(frozen=True)
+class SlabRate:
+    km_from: Decimal
+    km_to: Decimal
+    base_fare: Decimal
+    rate_per_km: Decimal
+    rate_per_minute: Decimal
+
+
+@dataclass(frozen=True)
+class ServiceTariff:
+    service_id: int
+    name: str
+    number_of_seats: Optional[int]
+    base_fare: Decimal
+    price_per_km: Decimal
+    price_per_minute: Decimal
+    booking_fee: Decimal
+    min_fare: Decimal
+    slab_starts: tuple   # sorted km_from values, parallel to `slabs`
+    slabs: tuple
+
+    def slab_for(self, distance):
+        """The slab whose [km_from, km_to] interval contains `distance`, or None."""
+        i = bisect.bisect_right(self.slab_starts, distance)
+        while i > 0:
+            i -= 1
+            if distance <= self.slabs[i].km_to:
+                return self.slabs[i]
+        return None
+
+
+@dataclass(frozen=True)
+class RentalPackageInfo:
+    id: int
+    distance_km: Decimal
+    time_hours: Decimal
+
+    def __str__(self):
+        return f"{self.distance_km} KM / {self.time_hours} Hours"
+
+
+@dataclass(frozen=True)
+class RentalTariff:
+    service: ServiceTariff
+    base_fare: Decimal
+    booking_fee: Decimal
+    per_km_rate: Decimal
+    per_minute_rate: Decimal
+
+
+@dataclass(frozen=True)
+class FareQuote:
+    service: ServiceTariff
+    estimated_price: Decimal
+
+
+@dataclass(frozen=True)
+class TariffSnapshot:
+    version: int
+    services: tuple
+    rental_packages: tuple
+    packages_by_id: MappingProxyType
+    rentals_by_package: MappingProxyType   # package id -> tuple of RentalTariff
+
+
+def _dec(value):
+    return value if value is not None else ZERO
+
+
+def build_snapshot(version=0):
+    """Load all tariff tables (four queries) into a TariffSnapshot."""
+    from .models import FareSlab, RentalPackage, RentalService, ServiceType
+
+    slabs_by_service = {}
+    for slab in FareSlab.objects.order_by('km_from', 'pk'):
+        slabs_by_service.setdefault(slab.service_type_id, []).append(SlabRate(
+            km_from=slab.km_from,
+            km_to=slab.km_to,
+            base_fare=_dec(slab.base_fare),
+            rate_per_km=_dec(slab.rate_per_km),
+            rate_per_minute=_dec(slab.rate_per_minute),
+        ))
+
+    services = []
+    for service in ServiceType.objects.order_by('service_id'):
+        slabs = tuple(slabs_by_service.get(service.service_id, ()))
+        services.append(ServiceTariff(
+            service_id=service.service_id,
+            name=service.name,
+            number_of_seats=service.number_of_seats,
+            base_fare=_dec(service.base_fare),
+            price_per_km=_dec(service.price_per_km),
+            price_per_minute=_dec(service.price_per_minute),
+            booking_fee=_dec(service.booking_fee),
+            min_fare=_dec(service.min_fare),
+            slab_starts=tuple(s.km_from for s in slabs),
+            slabs=slabs,
+        ))
+    services_by_id = {s.service_id: s for s in services}
+
+    packages = tuple(
+        RentalPackageInfo(id=p.id, distance_km=p.distance_km, time_hours=p.time_hours)
+        for p in RentalPackage.objects.order_by('id')
+    )
+
+    rentals = {}
+    for rs in RentalService.objects.order_by('pk'):
+        service = services_by_id.get(rs.service_type_id)
+        if service is None:
+            continue
+        rentals.setdefault(rs.package_id, []).append(RentalTariff(
+            service=service,
+            base_fare=rs.base_fare,
+            booking_fee=rs.booking_fee,
+            per_km_rate=rs.per_km_rate,
+            per_minute_rate=rs.per_minute_rate,
+        ))
+
+    return TariffSnapshot(
+        version=version,
+        services=tuple(services),
+        rental_packages=packages,
+        packages_by_id=MappingProxyType({p.id: p for p in packages}),
+        rentals_by_package=MappingProxyType({k: tuple(v) for k, v in rentals.items()}),
+    )
+
+
+_lock = threading.Lock()
+_snapshot = None
+_checked_at = 0.0
+
+
+def _current_version():
+    return cache.get(VERSION_KEY) or 0
+
+
+def get_snapshot():
+    """The tariff snapshot for this process, reloaded when the shared version moves."""
+    global _snapshot, _checked_at
+    check_every = getattr(settings, 'FARE_SNAPSHOT_CHECK_SECONDS', 5)
+    now = time.monotonic()
+    snapshot = _snapshot
+    if snapshot is not None and now - _checked_at < check_every:
+        return snapshot
+
+    version = _current_version()
+    if snapshot is not None and snapshot.version == version:
+        _checked_at = now
+        return snapshot
+
+    with _lock:
+        if _snapshot is None or _snapshot.version != version:
+            _snapshot = build_snapshot(version)
+        _checked_at = now
+        return _snapshot
+
+
+def invalidate():
+    """Mark the tariff tables as changed for every process."""
+    global _snapshot
+    cache.add(VERSION_KEY, 0, timeout=None)
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, 1, timeout=None)
+    _snapshot = None
+
+
+def _with_tax(subtotal):
+    return Decimal(math.ceil(subtotal + (subtotal * TAX_RATE)))
+
+
+def _surge_charge(service, metered, surge):
+    """Extra charge on the metered part of a fare for the service's surge multiplier, if any."""
+    multiplier = (surge or {}).get((service.name or '').lower())
+    if not multiplier or multiplier <= 1:
+        return ZERO
+    return (metered * (multiplier - 1)).quantize(Decimal('0.01'))
+
+
+def quote_daily(distance, duration_minutes, snapshot=None, surge=None):
+    """
+    Slab-based fares for every service, with each service's minimum fare applied.
+    `surge` maps lowercase service names to multipliers (see services.surge).
+    """
+    snapshot = snapshot or get_snapshot()
+    quotes = []
+    for service in snapshot.services:
+        slab = service.slab_for(distance)
+        if slab:
+            base_fare, per_km_rate, per_minute_rate = slab.base_fare, slab.rate_per_km, slab.rate_per_minute
+        else:
+            base_fare, per_km_rate, per_minute_rate = service.base_fare, service.price_per_km, service.price_per_minute
+
+        metered = base_fare + (distance * per_km_rate) + (duration_minutes * per_minute_rate)
+        subtotal = metered + service.booking_fee + _surge_charge(service, metered, surge)
+        estimated_price = _with_tax(subtotal)
+        if estimated_price < service.min_fare:
+            estimated_price = service.min_fare
+        quotes.append(FareQuote(service, estimated_price))
+    return quotes
+
+
+def quote_outstation(distance, duration_minutes, exclude_names=(), snapshot=None, surge=None):
+    """Flat per-km/per-minute fares for every service not in `exclude_names`."""
+    snapshot = snapshot or get_snapshot()
+    quotes = []
+    for service in snapshot.services:
+        if service.name in exclude_names:
+            continue
+        metered = service.base_fare + (distance * service.price_per_km) + (duration_minutes * service.price_per_minute)
+        subtotal = metered + service.booking_fee + _surge_charge(service, metered, surge)
+        quotes.append(FareQuote(service, _with_tax(subtotal)))
+    return quotes
+
+
+def quote_rental(package_id, snapshot=None):
+    """Fares for every service offering rental package `package_id` (empty if unknown)."""
+    snapshot = snapshot or get_snapshot()
+    package = snapshot.packages_by_id.get(package_id)
+    if package is None:
+        return []
+    distance = package.distance_km
+    duration_minutes = package.time_hours * Decimal(60)
+    quotes = []
+    for rental in snapshot.rentals_by_package.get(package_id, ()):
+        subtotal = (
+            rental.base_fare +
+            rental.booking_fee +
+            (distance * rental.per_km_rate) +
+            (duration_minutes * rental.per_minute_rate)
+        )
+        quotes.append(FareQuote(rental.service, _with_tax(subtotal)))
+    return quotes
@@ -0,0 +1,39 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from services.surge import compute_surge_table, load_published_table, publish_surge_table
+
+
+class Command(BaseCommand):
+    help = "Recompute surge multipliers per zone and service type on a fixed cadence."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Run a single update and exit (for cron).')
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=getattr(settings, 'SURGE_INTERVAL_SECONDS', 30),
+            help='Seconds between updates.',
+        )
+
+    def handle(self, *args, **options):
+        previous = {}
+        for (row, col), services in load_published_table().items():
+            for service, multiplier in services.items():
+                previous[(row, col, service)] = multiplier
+
+        try:
+            while True:
+                started = time.monotonic()
+                close_old_connections()
+                previous = compute_surge_table(previous)
+                publish_surge_table(previous)
+                self.stdout.write(f"Surge updated: {len(previous)} zone/service pair(s) above 1.0x.")
+                if options['once']:
+                    return
+                time.sleep(max(options['interval'] - (time.monotonic() - started), 0))
+        except KeyboardInterrupt:
+            self.stdout.write("Surge updates stopped.")
@@ -0,0 +1,15 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import fare_engine
+from .models import FareSlab, RentalPackage, RentalService, ServiceType
+
+
+@receiver([post_save, post_delete], sender=ServiceType)
+@receiver([post_save, post_delete], sender=FareSlab)
+@receiver([post_save, post_delete], sender=RentalService)
+@receiver([post_save, post_delete], sender=RentalPackage)
+def invalidate_fare_snapshot(sender, **kwargs):
+    # Bump the version only once the change is visible to other processes
+    transaction.on_commit(fare_engine.invalidate)
@@ -0,0 +1,164 @@
+"""
+Surge multipliers per zone and service type.
+
+compute_surge_table() compares open ride requests created within the last
+SURGE_WINDOW_SECONDS against drivers currently available in each zone (a
+SURGE_ZONE_CELL_DEG grid cell). The compute_surge management command runs it
+on a fixed cadence and stores the result in the shared cache. Quotes read the
+multipliers through get_multipliers(), which is a dict lookup on a
+per-process copy of the table; nothing is counted at quote time.
+"""
+import threading
+import time
+from datetime import timedelta
+from decimal import ROUND_CEILING, ROUND_FLOOR, ROUND_HALF_UP, Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, F, Value
+from django.db.models.functions import Floor, Lower
+from django.utils import timezone
+
+from dispatch.geo import cell_for
+
+TABLE_KEY = "surge:table"
+ONE = Decimal('1')
+STEP = Decimal('0.1')
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def get_zone_size_deg() -> float:
+    return float(_setting('SURGE_ZONE_CELL_DEG', 0.05))
+
+
+def zone_for(lat, lng):
+    return cell_for(lat, lng, get_zone_size_deg())
+
+
+def target_multiplier(demand, supply):
+    """Multiplier for `demand` open requests against `supply` available drivers, in 0.1 steps."""
+    if demand < _setting('SURGE_MIN_REQUESTS', 3):
+        return ONE
+    ratio = Decimal(demand) / Decimal(max(supply, 1))
+    excess = max(ratio - Decimal(str(_setting('SURGE_RATIO_THRESHOLD', 1.0))), Decimal('0'))
+    multiplier = ONE + excess * Decimal(str(_setting('SURGE_SENSITIVITY', 0.5)))
+    multiplier = min(multiplier, Decimal(str(_setting('SURGE_MAX_MULTIPLIER', 2.5))))
+    return (multiplier / STEP).to_integral_value(rounding=ROUND_HALF_UP) * STEP
+
+
+def _demand_by_zone(now, size):
+    from booking.models import RideRequest
+
+    rows = (
+        RideRequest.objects
+        .filter(status='Requested', created_at__gte=now - timedelta(seconds=_setting('SURGE_WINDOW_SECONDS', 600)))
+        .annotate(
+            zone_row=Floor(F('pickup_latitude') / Value(size)),
+            zone_col=Floor(F('pickup_longitude') / Value(size)),
+            service=Lower('service_type__name'),
+        )
+        .values('zone_row', 'zone_col', 'service')
+        .annotate(n=Count('id'))
+    )
+    return {(int(r['zone_row']), int(r['zone_col']), r['service']): r['n'] for r in rows}
+
+
+def _supply_by_zone(now, size):
+    from driver.models import Driver
+
+    rows = (
+        Driver.objects
+        .filter(
+            availability=True,
+            status='Active',
+            is_deleted=False,
+            current_latitude__isnull=False,
+            location_updated_at__gte=now - timedelta(seconds=_setting('SURGE_SUPPLY_FRESH_SECONDS', 300)),
+        )
+        .annotate(
+            zone_row=Floor(F('current_latitude') / Value(size)),
+            zone_col=Floor(F('current_longitude') / Value(size)),
+            service=Lower('service_type__name'),
+        )
+        .values('zone_row', 'zone_col', 'service')
+        .annotate(n=Count('driver_id'))
+    )
+    return {(int(r['zone_row']), int(r['zone_col']), r['service']): r['n'] for r in rows}
+
+
+def compute_surge_table(previous=None, now=None):
+    """
+    One surge update: two grouped queries, then each zone's multiplier moves
+    SURGE_SMOOTHING of the way towards its target so prices do not flap.
+    Only zones above 1.0 are kept.
+    """
+    now = now or timezone.now()
+    size = Decimal(str(get_zone_size_deg()))
+    alpha = Decimal(str(_setting('SURGE_SMOOTHING', 0.5)))
+    demand = _demand_by_zone(now, size)
+    supply = _supply_by_zone(now, size)
+    previous = previous or {}
+
+    table = {}
+    for key in set(demand) | set(previous):
+        target = target_multiplier(demand.get(key, 0), supply.get(key, 0))
+        current = previous.get(key, ONE)
+        smoothed = current + (target - current) * alpha
+        # Round towards the target, otherwise a half step rounds back and the zone never settles
+        rounding = ROUND_CEILING if target > current else ROUND_FLOOR
+        smoothed = (smoothed / STEP).to_integral_value(rounding=rounding) * STEP
+        if smoothed > ONE:
+            table[key] = smoothed
+    return table
+
+
+def publish_surge_table(table):
+    """Store `table` for quoting, keyed by zone so a lookup is a single dict access."""
+    zones = {}
+    for (row, col, service), multiplier in table.items():
+        zones.setdefault((row, col), {})[service] = multiplier
+    cache.set(
+        TABLE_KEY,
+        {'computed_at': time.time(), 'zones': zones},
+        timeout=_setting('SURGE_INTERVAL_SECONDS', 30) * 5,
+    )
+
+
+def load_published_table():
+    entry = cache.get(TABLE_KEY)
+    return entry['zones'] if entry else {}
+
+
+_lock = threading.Lock()
+_zones = {}
+_loaded_at = 0.0
+
+
+def _current_zones():
+    global _zones, _loaded_at
+    now = time.monotonic()
+    if now - _loaded_at >= _setting('SURGE_REFRESH_SECONDS', 5):
+        with _lock:
+            if now - _loaded_at >= _setting('SURGE_REFRESH_SECONDS', 5):
+                _zones = load_published_table()
+                _loaded_at = now
+    return _zones
+
+
+def get_multipliers(lat, lng):
+    """
+    {lowercase service name: multiplier} for a pickup point; services without
+    surge are absent (multiplier 1). Returns {} when the point is unknown.
+    """
+    if lat in (None, '') or lng in (None, ''):
+        return {}
+    zones = _current_zones()
+    if not zones:
+        return {}
+    try:
+        return zones.get(zone_for(lat, lng), {})
+    except (TypeError, ValueError):
+        return {}
@@ -1,3 +1,19 @@
+from decimal import Decimal
+
 from django.test import TestCase
 
-# Create your tests here.
+from services.surge import compute_surge_table
+
+
+class SurgeDecayTests(TestCase):
+    def test_surge_decays_back_to_no_entry(self):
+        key = (399, 1475, 'sedan')
+        table = {key: Decimal('1.5')}
+        seen = []
+        for _ in range(10):
+            table = compute_surge_table(previous=table)
+            if key not in table:
+                break
+            seen.append(table[key])
+        self.assertNotIn(key, table)
+        self.assertEqual(seen, sorted(seen, reverse=True))
@@ -16,4 +16,7 @@ urlpatterns = [
     path('rental/services/add/', views.add_rental_service, name='add_rental_service'),
     path('rental/services/edit/<int:pk>/', views.edit_rental_service, name='edit_rental_service'),
     path('rental/services/delete/<int:pk>/', views.delete_rental_service, name='delete_rental_service'),
+
+    # Fare quotes
+    path('api/quotes/', views.api_batch_quotes, name='api_batch_quotes'),
 ]
\ No newline at end of file
@@ -1,5 +1,11 @@
+import json
+
+from django.conf import settings
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
 from .models import RentalPackage, RentalService
 from .forms import RentalPackageForm, RentalServiceForm
 
@@ -89,3 +95,45 @@ def delete_rental_service(request, pk):
         messages.success(request, "Rental service deleted successfully.")
         return redirect('rental_dashboard')
     return render(request, 'adminpanel/confirm_delete_service.html', {'object': service})
+
+
+@csrf_exempt  # read-only computation, also called by load-test and simulation scripts
+@require_POST
+def api_batch_quotes(request):
+    """
+    Quote every service for many trips at once.
+    Body: {"trips": [{"distance_km": 7.3, "duration_min": 15, "ride_type": "daily"},
+                     {"ride_type": "rental", "package_id": 2}, ...]}
+    Response fares are in paisa, one row per trip and one column per service;
+    null where the service does not offer that trip.
+    """
+    from passenger.ride_rules import get_outstation_disallowed
+    from .batch_fares import NO_FARE, quote_batch
+
+    try:
+        payload = json.loads(request.body or b'{}')
+        if not isinstance(payload, dict):
+            raise ValueError('body must be a JSON object')
+        raw_trips = payload.get('trips') or []
+        if not isinstance(raw_trips, list):
+            raise ValueError('trips must be a list')
+        max_trips = getattr(settings, 'BATCH_QUOTE_MAX_TRIPS', 1000)
+        if len(raw_trips) > max_trips:
+            return JsonResponse({'success': False, 'error': f'At most {max_trips} trips per request.'}, status=400)
+        trips = [
+            (t.get('distance_km'), t.get('duration_min'), t.get('ride_type', 'daily'), t.get('package_id'))
+            for t in raw_trips
+        ]
+        result = quote_batch(trips, exclude_outstation=get_outstation_disallowed())
+    except (ValueError, TypeError, AttributeError) as e:
+        return JsonResponse({'success': False, 'error': f'Invalid trips: {e}'}, status=400)
+
+    fares = [
+        [None if paisa == NO_FARE else paisa for paisa in row]
+        for row in result.fares_paisa.tolist()
+    ]
+    return JsonResponse({
+        'success': True,
+        'services': [service.name for service in result.services],
+        'fares_paisa': fares,
+    })